@@ -1,17 +1,17 @@
 import sys
 import os
-import json
 import traceback
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                            QPushButton, QLabel, QListWidget, QStackedWidget, QFrame,
                            QLineEdit, QProgressBar, QScrollArea, QSplitter, QToolButton,
                            QMessageBox, QDialog)
-from PyQt5.QtCore import Qt, QSize, QPropertyAnimation, QEasingCurve, QUrl
+from PyQt5.QtCore import Qt, QSize, QPropertyAnimation, QEasingCurve, QUrl, QThread, pyqtSignal
 from PyQt5.QtGui import QIcon, QPixmap, QPalette, QColor, QFont, QDesktopServices
 from utils.logger import Logger
 from UI.UI_Settings import SettingsPage
 from UI.UI_ProjectManagement import ProjectManagement
 from utils.path_utils import get_resource_path
+from utils.project_catalog import ProjectCatalog
 
 class SidebarButton(QPushButton):
     def __init__(self, text, icon_path=None, parent=None):
@@ -321,6 +321,27 @@ class ProjectCard(QFrame):
                 """)
                 error_box.exec_()
 
+class ProjectScanThread(QThread):
+    """后台对比项目目录的修改时间，只重新读取有变化的项目并更新索引"""
+    scan_finished = pyqtSignal(str, bool)  # 项目根目录, 索引是否有变化
+
+    def __init__(self, base_path, logger, parent=None):
+        super().__init__(parent)
+        self.base_path = base_path
+        self.logger = logger
+
+    def run(self):
+        changed = False
+        catalog = ProjectCatalog()
+        try:
+            catalog.connect()
+            changed = catalog.revalidate(self.base_path, self.logger)
+        except Exception as e:
+            self.logger.error(f"[主窗口] 更新项目索引失败: {str(e)}")
+        finally:
+            catalog.disconnect()
+        self.scan_finished.emit(self.base_path, changed)
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -345,6 +366,9 @@ class MainWindow(QMainWindow):
         self.settings_page = None
         self.project_wizard = None
         self.projects_data = []  # 存储项目数据
+        self.project_catalog = None  # 项目索引（SQLite）
+        self.scan_thread = None
+        self.rescan_pending = False
         
         self.initUI()
         self.logger.info("主窗口初始化完成")
@@ -797,11 +821,9 @@ class MainWindow(QMainWindow):
             QMessageBox.critical(self, "错误", f"新建项目弹窗异常: {str(e)}")
             
     def refresh_project_list(self):
-        """刷新项目列表"""
+        """刷新项目列表：先从索引显示，再在后台检查有变化的项目"""
         try:
             self.logger.info("[主窗口] 开始刷新项目列表")
-            # 清空现有项目数据
-            self.projects_data = []
             # 获取项目根目录
             if not self.settings_page:
                 self.settings_page = SettingsPage()
@@ -809,57 +831,39 @@ class MainWindow(QMainWindow):
             self.logger.info(f"[主窗口] 项目根目录: {base_path}")
             if not base_path or not os.path.exists(base_path):
                 self.logger.warning("[主窗口] 项目路径不存在")
+                self.projects_data = []
+                self.update_project_cards()
                 return
-            # 获取所有项目文件夹
-            for folder_name in os.listdir(base_path):
-                folder_path = os.path.join(base_path, folder_name)
-                if not os.path.isdir(folder_path):
-                    continue
-                config_folder = os.path.join(folder_path, f"{folder_name}_config")
-                info_file = os.path.join(config_folder, "project_info.json")
-                if os.path.exists(info_file):
-                    try:
-                        with open(info_file, 'r', encoding='utf-8') as f:
-                            project_info = json.load(f)
-                            project_info['progress'] = self.calculate_project_progress(folder_path)
-                            self.projects_data.append(project_info)
-                    except Exception as e:
-                        self.logger.error(f"[主窗口] 读取项目信息失败: {str(e)}")
-                        continue
-            self.projects_data.sort(key=lambda x: x.get('create_date', ''), reverse=True)
-            self.update_project_cards()
-            self.logger.info("[主窗口] 项目列表已刷新")
+            self.load_project_catalog(base_path)
+            if self.scan_thread and self.scan_thread.isRunning():
+                # 正在扫描时只记下，扫描结束后再检查一次
+                self.rescan_pending = True
+                return
+            self.scan_thread = ProjectScanThread(base_path, self.logger, self)
+            self.scan_thread.scan_finished.connect(self.on_project_scan_finished)
+            self.scan_thread.start()
         except Exception as e:
             tb = traceback.format_exc()
             self.logger.error(f"[主窗口] 刷新项目列表失败: {str(e)}\n{tb}")
             QMessageBox.warning(self, "错误", f"刷新项目列表失败: {str(e)}")
 
-    def calculate_project_progress(self, project_path):
-        """计算项目进度"""
-        try:
-            progress = 0
-            total_steps = 3  # 总步骤数
-            
-            # 检查image文件夹
-            image_folder = os.path.join(project_path, os.path.basename(project_path) + "_image")
-            if os.path.exists(image_folder) and os.listdir(image_folder):
-                progress += 1
-            
-            # 检查config文件夹
-            config_folder = os.path.join(project_path, os.path.basename(project_path) + "_config")
-            if os.path.exists(config_folder) and len(os.listdir(config_folder)) > 1:  # 不只包含project_info.json
-                progress += 1
-            
-            # 检查Defectmatrix文件夹
-            defect_folder = os.path.join(project_path, os.path.basename(project_path) + "_Defectmatrix")
-            if os.path.exists(defect_folder) and os.listdir(defect_folder):
-                progress += 1
-            
-            return int((progress / total_steps) * 100)
-            
-        except Exception as e:
-            self.logger.error(f"计算项目进度失败: {str(e)}")
-            return 0
+    def load_project_catalog(self, base_path):
+        """从索引读取项目列表并更新卡片"""
+        if self.project_catalog is None:
+            self.project_catalog = ProjectCatalog().connect()
+        self.projects_data = self.project_catalog.projects(base_path)
+        self.update_project_cards()
+        self.logger.info(f"[主窗口] 项目列表已从索引加载，共 {len(self.projects_data)} 个项目")
+
+    def on_project_scan_finished(self, base_path, changed):
+        """后台扫描结束，索引有变化时重新加载"""
+        if self.rescan_pending:
+            self.rescan_pending = False
+            self.refresh_project_list()
+            return
+        if changed and base_path == self.settings_page.get_project_path():
+            self.load_project_catalog(base_path)
+            self.logger.info("[主窗口] 项目列表已刷新")
 
     def update_project_cards(self, search_text=""):
         """更新项目卡片显示"""
@@ -901,6 +905,17 @@ class MainWindow(QMainWindow):
         
         return card
 
+    def closeEvent(self, event):
+        """停止后台导入和扫描，关闭项目索引"""
+        if self.poc_generator:
+            self.poc_generator.shutdown()
+        if self.scan_thread:
+            self.scan_thread.wait()
+        if self.project_catalog:
+            self.project_catalog.disconnect()
+            self.project_catalog = None
+        super().closeEvent(event)
+
     def center_window(self):
         """将窗口居中显示"""
         screen_geometry = QApplication.desktop().screenGeometry()
@@ -1,11 +1,19 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget, 
                              QListWidgetItem, QPushButton, QLabel, QFileDialog,
-                             QScrollArea, QMessageBox, QInputDialog, QFrame)
+                             QListView, QMessageBox, QFrame, QProgressBar)
 from PyQt5.QtCore import Qt, QSize
-from PyQt5.QtGui import QIcon, QPixmap
 import os
 import json
 import shutil
+from core.poc.image_index import CACHE_DIR_NAME
+from core.poc.thumbnail_service import ThumbnailService
+from core.poc.image_list_model import ImageListModel
+from core.poc.image_ingest import IngestWorker, BlobStore, station_import_jobs
+
+BLOB_DIR_NAME = 'blobs'  # 按内容去重的工位图片存储
+
+PREVIEW_ICON_SIZE = QSize(240, 180)  # 工位图片缩略图尺寸
+PREVIEW_GRID_SIZE = QSize(260, 220)  # 缩略图格子大小（含文件名）
 
 class ImageUploader(QWidget):
     def __init__(self, project_path, parent=None):
@@ -13,7 +21,13 @@ class ImageUploader(QWidget):
         self.project_path = project_path
         self.current_station = None
         self.station_images = {}  # 存储工位和图片的对应关系
+        self.thumbnails = None  # 项目缩略图服务，预览不再解码整张原图
+        self.thumbnails_dir = None
+        self.ingest_worker = None  # 后台导入图片的线程
+        self.blob_store = None
+        self.blob_store_dir = None
         self.initUI()
+        self.setAcceptDrops(True)
         
     def initUI(self):
         layout = QHBoxLayout(self)
@@ -101,34 +115,40 @@ class ImageUploader(QWidget):
         """)
         middle_layout.addWidget(preview_label)
         
-        # 预览区
-        self.preview_scroll = QScrollArea()
-        self.preview_scroll.setWidgetResizable(True)
-        self.preview_scroll.setStyleSheet("""
-            QScrollArea {
+        # 预览区：图标模式的虚拟列表，只为可见的格子请求缩略图
+        self.preview_model = ImageListModel(self)
+        self.preview_grid = QListView()
+        self.preview_grid.setModel(self.preview_model)
+        self.preview_grid.setViewMode(QListView.IconMode)
+        self.preview_grid.setResizeMode(QListView.Adjust)
+        self.preview_grid.setMovement(QListView.Static)
+        self.preview_grid.setUniformItemSizes(True)
+        self.preview_grid.setIconSize(PREVIEW_ICON_SIZE)
+        self.preview_grid.setGridSize(PREVIEW_GRID_SIZE)
+        self.preview_grid.setStyleSheet("""
+            QListView {
                 border: 1px solid #e8e8e8;
                 border-radius: 4px;
                 background: white;
             }
         """)
-        
-        self.preview_widget = QWidget()
-        self.preview_layout = QVBoxLayout(self.preview_widget)
-        self.preview_layout.setAlignment(Qt.AlignCenter)
+        self.preview_grid.hide()
         
         # 添加引导文字
-        self.guide_label = QLabel("上传实验测试时对应工位的工位布局图片")
+        self.guide_label = QLabel("上传实验测试时对应工位的工位布局图片\n可直接拖入图片或文件夹，文件夹按目录名归入工位")
         self.guide_label.setStyleSheet("""
             QLabel {
                 color: #8c8c8c;
                 font-size: 14px;
+                border: 1px solid #e8e8e8;
+                border-radius: 4px;
+                background: white;
             }
         """)
         self.guide_label.setAlignment(Qt.AlignCenter)
-        self.preview_layout.addWidget(self.guide_label)
         
-        self.preview_scroll.setWidget(self.preview_widget)
-        middle_layout.addWidget(self.preview_scroll)
+        middle_layout.addWidget(self.guide_label, stretch=1)
+        middle_layout.addWidget(self.preview_grid, stretch=1)
         
         # 右侧功能区
         right_widget = QWidget()
@@ -223,8 +243,36 @@ class ImageUploader(QWidget):
         self.finish_btn.clicked.connect(self.saveStationImages)
         self.finish_btn.setEnabled(False)
         
+        # 导入进度（导入期间显示）
+        self.ingest_progress = QProgressBar()
+        self.ingest_progress.setTextVisible(True)
+        self.ingest_progress.hide()
+        self.ingest_label = QLabel()
+        self.ingest_label.setWordWrap(True)
+        self.ingest_label.setStyleSheet("color: #8c8c8c; font-size: 12px;")
+        self.ingest_label.hide()
+        self.cancel_ingest_btn = QPushButton("取消导入")
+        self.cancel_ingest_btn.setStyleSheet("""
+            QPushButton {
+                background: white;
+                color: #595959;
+                padding: 8px;
+                border-radius: 4px;
+                border: 1px solid #d9d9d9;
+            }
+            QPushButton:hover {
+                color: #40a9ff;
+                border-color: #40a9ff;
+            }
+        """)
+        self.cancel_ingest_btn.clicked.connect(self.cancelIngest)
+        self.cancel_ingest_btn.hide()
+
         button_layout.addWidget(self.upload_btn)
         button_layout.addWidget(self.delete_btn)
+        button_layout.addWidget(self.ingest_progress)
+        button_layout.addWidget(self.ingest_label)
+        button_layout.addWidget(self.cancel_ingest_btn)
         button_layout.addStretch()
         button_layout.addWidget(self.finish_btn)
         
@@ -252,7 +300,7 @@ class ImageUploader(QWidget):
         """工位选择变化时的处理"""
         if current:
             self.current_station = current.text()
-            self.upload_btn.setEnabled(True)
+            self.upload_btn.setEnabled(not self.isIngesting())
             # 显示当前工位的图片
             self.showStationImages(self.current_station)
         else:
@@ -269,79 +317,171 @@ class ImageUploader(QWidget):
             self,
             "选择图片",
             "",
-            "图片文件 (*.png *.jpg *.jpeg *.bmp)"
+            "图片文件 (*.png *.jpg *.jpeg *.bmp *.tif *.tiff)"
         )
         
         if files:
-            # 确保存储目录存在
-            station_dir = os.path.join(self.project_path, "station_images", self.current_station)
-            os.makedirs(station_dir, exist_ok=True)
-            
-            # 复制图片到项目目录
-            for file_path in files:
-                file_name = os.path.basename(file_path)
-                target_path = os.path.join(station_dir, file_name)
-                shutil.copy2(file_path, target_path)
-                
-                # 更新存储的图片信息
-                if self.current_station not in self.station_images:
-                    self.station_images[self.current_station] = []
-                self.station_images[self.current_station].append(target_path)
-            
-            # 更新预览
-            self.showStationImages(self.current_station)
+            self.importPaths(files)
+
+    def dragEnterEvent(self, event):
+        """接受从资源管理器拖入的文件和文件夹"""
+        if event.mimeData().hasUrls() and any(url.isLocalFile() for url in event.mimeData().urls()):
+            event.acceptProposedAction()
+
+    def dragMoveEvent(self, event):
+        self.dragEnterEvent(event)
+
+    def dropEvent(self, event):
+        """拖入的文件导入当前工位，文件夹按目录名归入工位"""
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if not paths:
+            return
+        event.acceptProposedAction()
+        if not self.current_station and not all(os.path.isdir(path) for path in paths):
+            # 单独的文件只能导入选中的工位，文件夹仍按目录名归入工位
+            QMessageBox.warning(self, "警告", "请先选择工位，单独拖入的图片会导入当前选中的工位")
+            paths = [path for path in paths if os.path.isdir(path)]
+            if not paths:
+                return
+        self.importPaths(paths)
+
+    def importPaths(self, paths):
+        """把文件/文件夹交给后台导入，目录树在导入过程中逐层遍历"""
+        if not self.project_path:
+            QMessageBox.warning(self, "警告", "请先选择项目路径！")
+            return
+        if self.isIngesting():
+            QMessageBox.warning(self, "警告", "图片正在导入，请等待当前导入完成")
+            return
+        stations = [self.station_list.item(row).text() for row in range(self.station_list.count())]
+        jobs = station_import_jobs(paths, os.path.join(self.project_path, "station_images"),
+                                   self.current_station, stations)
+        self.startIngest(jobs)
+
+    def isIngesting(self):
+        return self.ingest_worker is not None and self.ingest_worker.isRunning()
+
+    def startIngest(self, jobs):
+        """启动后台导入，界面保持响应"""
+        self.ingest_worker = IngestWorker(jobs, blob_store=self.getBlobStore())
+        self.ingest_worker.progress.connect(self.onIngestProgress)
+        self.ingest_worker.file_done.connect(self.onIngestFileDone)
+        self.ingest_worker.ingest_finished.connect(self.onIngestFinished)
+        self.upload_btn.setEnabled(False)
+        self.ingest_progress.setRange(0, 0)  # 遍历完成前总数未知
+        self.ingest_label.setText("正在导入图片...")
+        self.cancel_ingest_btn.setEnabled(True)
+        for widget in (self.ingest_progress, self.ingest_label, self.cancel_ingest_btn):
+            widget.show()
+        self.ingest_worker.start()
+
+    def getBlobStore(self):
+        """返回当前项目的内容存储，项目路径变化时重新加载"""
+        blob_dir = os.path.join(self.project_path, CACHE_DIR_NAME, BLOB_DIR_NAME)
+        if self.blob_store is None or self.blob_store_dir != blob_dir:
+            self.blob_store = BlobStore(blob_dir).load()
+            self.blob_store_dir = blob_dir
+        return self.blob_store
+
+    def cancelIngest(self):
+        """取消导入：已复制完成的图片保留，未完成的不留下临时文件"""
+        if self.isIngesting():
+            self.ingest_worker.cancel()
+            self.cancel_ingest_btn.setEnabled(False)
+            self.ingest_label.setText("正在取消...")
+
+    def onIngestProgress(self, done, total, copied_bytes, total_bytes):
+        if total:
+            self.ingest_progress.setRange(0, total)
+            self.ingest_progress.setValue(done)
+            self.ingest_label.setText(
+                f"已导入 {done}/{total} 张，{copied_bytes / 1048576:.0f}/{total_bytes / 1048576:.0f} MB")
+        else:
+            self.ingest_label.setText(f"已导入 {done} 张，{copied_bytes / 1048576:.0f} MB（正在扫描文件夹...）")
+
+    def onIngestFileDone(self, source, target, station):
+        """单张图片复制完成后加入工位图片列表，按目录名新建的工位加入工位列表"""
+        if station not in self.station_images and not self.station_list.findItems(station, Qt.MatchExactly):
+            self.station_list.addItem(QListWidgetItem(station))
+        images = self.station_images.setdefault(station, [])
+        if self.thumbnails is not None:
+            self.thumbnails.invalidate(target)  # 重新导入时覆盖了已有的图片
+        if target not in images:
+            images.append(target)
+            if station == self.current_station:
+                # 已导入的图片立即出现在预览中
+                self.preview_model.append_keys([os.path.basename(target)])
+                self.preview_grid.show()
+                self.guide_label.hide()
+
+    def onIngestFinished(self, done, failed, cancelled):
+        for widget in (self.ingest_progress, self.ingest_label, self.cancel_ingest_btn):
+            widget.hide()
+        self.ingest_worker.wait()
+        reused = self.ingest_worker.reused
+        self.ingest_worker = None
+        self.upload_btn.setEnabled(self.current_station is not None)
+        if any(self.station_images.values()):
             self.finish_btn.setEnabled(True)
-            self.delete_btn.setEnabled(True)
+        # 更新预览
+        if self.current_station:
+            self.showStationImages(self.current_station)
+        if reused:
+            print(f"Linked {reused} duplicate images without copying")
+        if failed:
+            QMessageBox.warning(self, "导入失败", f"{failed} 张图片导入失败，已导入 {done} 张")
+        elif cancelled:
+            QMessageBox.information(self, "已取消", f"导入已取消，已导入 {done} 张")
             
     def showStationImages(self, station):
-        """显示工位的图片"""
-        # 先从布局中移除引导标签（但不删除它）
-        self.preview_layout.removeWidget(self.guide_label)
-        
-        # 清除现有的预览
-        while self.preview_layout.count():
-            item = self.preview_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-                
-        # 如果有该工位的图片，显示它们
-        if station in self.station_images and self.station_images[station]:
-            for image_path in self.station_images[station]:
-                # 创建图片预览
-                preview = QLabel()
-                pixmap = QPixmap(image_path)
-                scaled_pixmap = pixmap.scaled(
-                    QSize(600, 400),  # 增大预览图片尺寸
-                    Qt.KeepAspectRatio,
-                    Qt.SmoothTransformation
-                )
-                preview.setPixmap(scaled_pixmap)
-                preview.setStyleSheet("""
-                    QLabel {
-                        border: 1px solid #e8e8e8;
-                        border-radius: 4px;
-                        padding: 4px;
-                        margin: 4px;
-                        background: white;
-                    }
-                """)
-                preview.setAlignment(Qt.AlignCenter)
-                self.preview_layout.addWidget(preview)
-            
-            self.guide_label.hide()
-            self.delete_btn.setEnabled(True)
-        else:
-            # 显示引导文字
-            self.guide_label.show()
-            self.delete_btn.setEnabled(False)
-            self.preview_layout.addWidget(self.guide_label)
-            
-        self.preview_layout.addStretch()
-        
+        """显示工位的图片（切换工位只替换模型数据，缩略图按需异步加载）"""
+        images = self.station_images.get(station) or []
+        station_dir = os.path.join(self.project_path, "station_images", station)
+        thumbnails = self.getThumbnailService()
+        thumbnails.cancel()
+        self.preview_model.set_thumbnails(thumbnails, station_dir, PREVIEW_ICON_SIZE.width())
+        self.preview_model.set_keys(os.path.relpath(path, station_dir) for path in images)
+
+        # 没有图片时显示引导文字
+        self.preview_grid.setVisible(bool(images))
+        self.guide_label.setVisible(not images)
+        self.delete_btn.setEnabled(bool(images))
+        
+    def getThumbnailService(self):
+        """返回当前项目的缩略图服务，项目路径变化时重新创建"""
+        cache_dir = os.path.join(self.project_path, CACHE_DIR_NAME)
+        if self.thumbnails is None or self.thumbnails_dir != cache_dir:
+            if self.thumbnails is not None:
+                self.thumbnails.shutdown()
+            self.thumbnails = ThumbnailService(cache_dir, self)
+            self.thumbnails_dir = cache_dir
+        return self.thumbnails
+
+    def shutdown(self):
+        """关闭前取消并等待导入线程（已导入的图片保留），保存缩略图缓存索引"""
+        if self.ingest_worker is not None:
+            # 线程结束时不再回调界面
+            self.ingest_worker.blockSignals(True)
+            self.ingest_worker.cancel()
+            self.ingest_worker.wait()
+            self.ingest_worker = None
+        if self.thumbnails is not None:
+            self.preview_model.set_thumbnails(None, None, PREVIEW_ICON_SIZE.width())
+            self.thumbnails.shutdown()
+            self.thumbnails = None
+            self.thumbnails_dir = None
+
+    def closeEvent(self, event):
+        self.shutdown()
+        super().closeEvent(event)
+
     def deleteSelectedImages(self):
         """删除当前工位的所有图片"""
         if not self.current_station or self.current_station not in self.station_images:
             return
+        if self.isIngesting():
+            QMessageBox.warning(self, "警告", "图片正在导入，请等待导入完成或取消导入后再删除")
+            return
             
         reply = QMessageBox.question(
             self,
@@ -356,6 +496,8 @@ class ImageUploader(QWidget):
             station_dir = os.path.join(self.project_path, "station_images", self.current_station)
             if os.path.exists(station_dir):
                 shutil.rmtree(station_dir)
+            # 删除不再被任何工位引用的内容
+            self.getBlobStore().remove_station(self.current_station)
             
             # 清除存储的信息
             self.station_images.pop(self.current_station, None)
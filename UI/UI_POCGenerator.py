@@ -1026,6 +1026,10 @@ class POCGenerator(QWidget):
         self.project_path = ""
         self.initUI()
 
+    def shutdown(self):
+        """主窗口关闭时停止各步骤的后台任务"""
+        self.image_upload.shutdown()
+
     def initUI(self):
         layout = QVBoxLayout(self)
         
@@ -1120,6 +1124,8 @@ class POCGenerator(QWidget):
                 
     def on_ppt_window_closed(self, event):
         """PPT生成器窗口关闭时的处理"""
+        # 停止后台PPT生成
+        self.ppt_window.shutdown()
         # 显示主窗口
         if self.parent is not None:
             self.parent.showNormal()
@@ -11,6 +11,7 @@ from utils.logger import Logger
 from PyQt5.QtWidgets import QProgressBar
 from pathlib import Path
 from utils.path_utils import get_resource_path
+from utils.project_catalog import project_progress
 
 CACHE_PATH = os.path.join(str(Path.home()), '.vsa', 'data', 'projects_cache.json')
 
@@ -447,26 +448,7 @@ class ProjectManagement(QWidget):
     def calculate_project_progress(self, project_path):
         """计算项目进度"""
         try:
-            progress = 0
-            total_steps = 3  # 总步骤数
-            
-            # 检查image文件夹
-            image_folder = os.path.join(project_path, os.path.basename(project_path) + "_image")
-            if os.path.exists(image_folder) and os.listdir(image_folder):
-                progress += 1
-            
-            # 检查config文件夹
-            config_folder = os.path.join(project_path, os.path.basename(project_path) + "_config")
-            if os.path.exists(config_folder) and len(os.listdir(config_folder)) > 1:  # 不只包含project_info.json
-                progress += 1
-            
-            # 检查Defectmatrix文件夹
-            defect_folder = os.path.join(project_path, os.path.basename(project_path) + "_Defectmatrix")
-            if os.path.exists(defect_folder) and os.listdir(defect_folder):
-                progress += 1
-            
-            return int((progress / total_steps) * 100)
-            
+            return project_progress(project_path)
         except Exception as e:
             self.logger.error(f"计算项目进度失败: {str(e)}")
             return 0
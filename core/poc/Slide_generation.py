@@ -1,19 +1,39 @@
 import sys
 import os
 from pathlib import Path
-from PIL import Image
-from pptx import Presentation
-from pptx.util import Inches, Pt
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QFileDialog, QListWidget, QPushButton, QLabel, QTextEdit,
-                             QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QGraphicsRectItem,
-                             QSplitter, QMessageBox)
-from PyQt5.QtCore import Qt, QRectF, QPoint
-from PyQt5.QtGui import QPixmap, QImage, QPainter, QColor, QPen
-from datetime import datetime
+                             QFileDialog, QListView, QPushButton, QLabel, QTextEdit,
+                             QGraphicsView, QGraphicsScene, QGraphicsRectItem,
+                             QSplitter, QMessageBox, QProgressBar, QComboBox, QCheckBox)
+from PyQt5.QtCore import Qt, QRect, QRectF, QPoint, QSize, QThread, QTimer, pyqtSignal
+from PyQt5.QtGui import QPixmap, QImageReader, QPainter, QColor, QPen
 import subprocess
-import json
+import copy
+import time
+import tempfile
 from utils.path_utils import get_resource_path
+from core.poc.image_index import ImageIndex
+from core.poc.image_watcher import ImageFolderWatcher
+from core.poc.image_list_model import ImageListModel
+from core.poc.image_cache import ImageDecodeCache, DEFAULT_PREFETCH
+from core.poc.crop_service import CropService
+from core.poc.crop_cache import CropCacheWriter
+from core.poc.cache_store import CacheStore, CROP_DIR_NAME
+from core.poc.annotation_store import annotation_record
+from core.poc.annotation_db import AnnotationDB, ANNOTATION_DB_NAME
+from core.poc.thumbnail_service import ThumbnailService
+from core.poc.tile_pyramid import (TilePyramid, TiledImageItem, TileLoader, needs_tiling, prune_tile_cache,
+                                    TILE_DIR_NAME)
+from core.poc.report_engine import (ReportEngine, GenerationCancelled, DEFAULT_COMMENT, merge_crop_records,
+                                    DEFAULT_CHECKPOINT_INTERVAL,
+                                    default_output_path, MANIFEST_FILE_NAME, PREPARED_DIR_NAME,
+                                    SHARD_MANIFEST_DIR_NAME, SPLIT_NONE, SPLIT_FOLDER, SPLIT_COUNT)
+
+LIST_ICON_SIZE = 40  # 图片列表缩略图尺寸
+RECORD_FLUSH_DELAY_MS = 1000  # 停止编辑1秒后再把标注变化写入数据库
+ZOOM_STEP = 1.25  # 滚轮每格的缩放倍数
+MAX_ZOOM = 8.0  # 最大放大到原图像素的8倍
+RESIZE_DEBOUNCE_MS = 100  # 窗口大小停止变化后再重新布局
 
 
 class ImageProcessor(QGraphicsView):
@@ -23,7 +43,8 @@ class ImageProcessor(QGraphicsView):
         self.setScene(self.scene)
         self.crop_rect = None
         self.start_pos = None
-        self.current_pixmap = None
+        self.current_pixmap = None  # 屏幕分辨率的显示图
+        self.source_size = None  # 原图尺寸，场景坐标即原图像素坐标
         self.cropped_pixmap = None
         self.current_image_path = None
         self.pixmap_item = None
@@ -35,6 +56,24 @@ class ImageProcessor(QGraphicsView):
         self.crop_completed = None
         self.crop_area = None
         self.scale_factor = 1.0
+        # 后台解码和LRU缓存，翻页时直接命中预取结果；只按屏幕分辨率解码
+        self.decode_cache = ImageDecodeCache(self, max_size=self.screen_decode_size())
+        self.decode_cache.image_ready.connect(self.on_image_decoded)
+        # 超大图片按瓦片金字塔显示，瓦片缓存在tile_cache_dir
+        self.tile_loader = TileLoader(self)
+        self.tile_cache_dir = None
+        # 裁剪区域在后台从原图读取
+        self.crop_service = CropService(self)
+        self.crop_service.crop_ready.connect(self.on_crop_ready)
+        # 滚轮缩放、中键/右键拖动平移
+        self.user_zoomed = False
+        self.pan_pos = None
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        # 拖动窗口大小时合并resize事件，停止后再重新适配
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(RESIZE_DEBOUNCE_MS)
+        self.resize_timer.timeout.connect(self.on_resize_settled)
         
         # 设置场景背景
         self.setStyleSheet("""
@@ -44,12 +83,24 @@ class ImageProcessor(QGraphicsView):
             }
         """)
 
+    @staticmethod
+    def screen_decode_size():
+        """解码尺寸上限：主屏幕的物理像素尺寸（视图不会比屏幕更大）"""
+        screen = QApplication.primaryScreen()
+        if screen is None:
+            return None
+        ratio = screen.devicePixelRatio()
+        size = screen.size()
+        return QSize(int(size.width() * ratio), int(size.height() * ratio))
+
     def resizeEvent(self, event):
-        """窗口大小改变事件"""
+        """窗口大小改变事件：只重新计算视图变换，不触发裁剪回调和保存"""
         super().resizeEvent(event)
-        self.adjust_image()
-        if self.cropped_pixmap and self.crop_completed:
-            self.crop_completed()  # 调用回调函数更新裁剪视图
+        self.resize_timer.start()
+
+    def on_resize_settled(self):
+        if not self.user_zoomed:
+            self.adjust_image()
 
     def load_image(self, path):
         """加载图片"""
@@ -61,27 +112,71 @@ class ImageProcessor(QGraphicsView):
             self.current_image_path = path
             self.cropped_pixmap = None
             self.crop_area = None
+            self.current_pixmap = None
+            self.source_size = None
+            self.pixmap_item = None
+            self.user_zoomed = False
+            self.tile_loader.cancel()
+
+            # 超大图片使用分块显示
+            if needs_tiling(QImageReader(str(path)).size()):
+                self.show_tiled(path)
+                return
             
-            # 加载图片
-            self.current_pixmap = QPixmap(str(path))
-            if not self.current_pixmap.isNull():
-                self.pixmap_item = self.scene.addPixmap(self.current_pixmap)
-                self.adjust_image()
-                print(f"Image loaded successfully: {path}")
-            else:
-                print(f"Failed to load image: {path}")
+            # 缓存命中时立即显示，否则在后台解码完成后显示
+            image = self.decode_cache.request(path)
+            if image is not None:
+                self.show_image(image)
         except Exception as e:
             print(f"Error loading image: {str(e)}")
 
+    def on_image_decoded(self, path, image):
+        """后台解码完成"""
+        if str(path) == str(self.current_image_path):
+            self.show_image(image)
+
+    def show_image(self, decoded):
+        """显示解码后的图片"""
+        path = self.current_image_path
+        if not decoded.isNull():
+            self.current_pixmap = QPixmap.fromImage(decoded.image)
+            self.source_size = decoded.source_size
+            self.pixmap_item = self.scene.addPixmap(self.current_pixmap)
+            # 缩小解码的图片放大回原图尺寸，场景坐标始终对应原图像素
+            self.pixmap_item.setTransformationMode(Qt.SmoothTransformation)
+            self.pixmap_item.setScale(decoded.scale)
+            self.adjust_image()
+            print(f"Image loaded successfully: {path}")
+        else:
+            print(f"Failed to load image: {path}")
+
+    def show_tiled(self, path):
+        """以瓦片金字塔显示超大图片"""
+        try:
+            cache_dir = self.tile_cache_dir or Path(tempfile.gettempdir()) / 'vsa_tiles'
+            pyramid = TilePyramid(path, cache_dir)
+            self.source_size = pyramid.size
+            self.pixmap_item = TiledImageItem(pyramid, self.tile_loader)
+            self.scene.addItem(self.pixmap_item)
+            self.adjust_image()
+            print(f"Image loaded as tiles: {path}, size={pyramid.size}, levels={pyramid.max_level + 1}")
+        except Exception as e:
+            print(f"Error loading tiled image: {str(e)}")
+
+    def prefetch(self, paths):
+        """后台预解码相邻的图片（超大图片按需加载瓦片，不预取）"""
+        self.decode_cache.prefetch([path for path in paths
+                                    if not needs_tiling(QImageReader(str(path)).size())])
+
     def adjust_image(self):
         """调整图片大小和位置"""
-        if not self.current_pixmap or self.current_pixmap.isNull():
+        if not self.source_size or not self.pixmap_item:
             return
             
         try:
-            # 获取视图和图片的尺寸
+            # 获取视图和原图的尺寸
             view_rect = self.viewport().rect()
-            pixmap_rect = self.current_pixmap.rect()
+            pixmap_rect = QRect(QPoint(0, 0), self.source_size)
             
             # 计算缩放比例
             scale_w = view_rect.width() / pixmap_rect.width()
@@ -102,8 +197,28 @@ class ImageProcessor(QGraphicsView):
         except Exception as e:
             print(f"Error adjusting image: {str(e)}")
 
+    def wheelEvent(self, event):
+        """滚轮缩放（以鼠标位置为中心）"""
+        if not self.pixmap_item or not event.angleDelta().y():
+            return
+        factor = ZOOM_STEP ** (event.angleDelta().y() / 120)
+        fit_scale = min(self.viewport().width() / self.source_size.width(),
+                        self.viewport().height() / self.source_size.height())
+        target = min(max(self.scale_factor * factor, fit_scale), max(MAX_ZOOM, fit_scale))
+        if target == self.scale_factor:
+            return
+        self.scale(target / self.scale_factor, target / self.scale_factor)
+        self.scale_factor = target
+        # 缩小回适应窗口大小时恢复自动适应
+        self.user_zoomed = target > fit_scale
+
     def mousePressEvent(self, event):
         """鼠标按下事件"""
+        if event.button() in (Qt.MiddleButton, Qt.RightButton) and self.pixmap_item:
+            # 中键/右键拖动平移
+            self.pan_pos = event.pos()
+            self.setCursor(Qt.ClosedHandCursor)
+            return
         if event.button() == Qt.LeftButton and self.pixmap_item:
             try:
                 # 获取场景坐标
@@ -128,6 +243,12 @@ class ImageProcessor(QGraphicsView):
 
     def mouseMoveEvent(self, event):
         """鼠标移动事件"""
+        if self.pan_pos is not None:
+            delta = event.pos() - self.pan_pos
+            self.pan_pos = event.pos()
+            self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() - delta.x())
+            self.verticalScrollBar().setValue(self.verticalScrollBar().value() - delta.y())
+            return
         if event.buttons() & Qt.LeftButton and self.start_pos and self.crop_rect:
             try:
                 # 获取当前位置
@@ -143,6 +264,10 @@ class ImageProcessor(QGraphicsView):
 
     def mouseReleaseEvent(self, event):
         """鼠标释放事件"""
+        if self.pan_pos is not None and event.button() in (Qt.MiddleButton, Qt.RightButton):
+            self.pan_pos = None
+            self.unsetCursor()
+            return
         if event.button() == Qt.LeftButton and self.start_pos and self.crop_rect:
             try:
                 # 获取结束位置
@@ -150,8 +275,8 @@ class ImageProcessor(QGraphicsView):
                 rect = QRectF(self.start_pos, end_pos).normalized()
                 
                 # 确保裁剪区域在图片范围内
-                if self.current_pixmap:
-                    img_rect = QRectF(self.current_pixmap.rect())
+                if self.source_size:
+                    img_rect = QRectF(0, 0, self.source_size.width(), self.source_size.height())
                     actual_rect = rect.intersected(img_rect)
                     
                     if not actual_rect.isEmpty():
@@ -163,25 +288,46 @@ class ImageProcessor(QGraphicsView):
                             int(actual_rect.height())
                         )
                         
-                        # 创建裁剪后的图片
-                        cropped = self.current_pixmap.copy(
-                            int(actual_rect.x()),
-                            int(actual_rect.y()),
-                            int(actual_rect.width()),
-                            int(actual_rect.height())
-                        )
-                        self.cropped_pixmap = cropped
-                        
-                        print(f"Crop completed: area={self.crop_area}, size={cropped.size()}")
-                        
-                        # 调用回调函数更新预览
-                        if self.crop_completed:
-                            self.crop_completed()
+                        # 在后台只从原图读取裁剪区域的全分辨率像素
+                        pyramid = getattr(self.pixmap_item, 'pyramid', None)
+                        self.crop_service.request(self.current_image_path, self.crop_area, pyramid)
                 
                 self.start_pos = None
             except Exception as e:
                 print(f"Error in mouse release: {str(e)}")
 
+    def restore_crop(self, crop_area, cache_path=None):
+        """恢复已保存的裁剪区域：显示选框，并从缓存文件或原图取得裁剪图"""
+        self.crop_area = tuple(int(v) for v in crop_area)
+        self.crop_rect = QGraphicsRectItem(QRectF(*self.crop_area))
+        pen = QPen(QColor(255, 0, 0))
+        pen.setWidth(2)
+        self.crop_rect.setPen(pen)
+        self.crop_rect.setZValue(1)
+        self.scene.addItem(self.crop_rect)
+        if cache_path:
+            self.cropped_pixmap = QPixmap(str(cache_path))
+            if not self.cropped_pixmap.isNull():
+                if self.crop_completed:
+                    self.crop_completed()
+                return
+        pyramid = getattr(self.pixmap_item, 'pyramid', None)
+        self.crop_service.request(self.current_image_path, self.crop_area, pyramid)
+
+    def on_crop_ready(self, path, crop_area, image):
+        """后台裁剪完成"""
+        if str(path) != str(self.current_image_path) or crop_area != self.crop_area:
+            return
+        if image.isNull():
+            print(f"Failed to read crop: area={crop_area}")
+            return
+        self.cropped_pixmap = QPixmap.fromImage(image)
+        print(f"Crop completed: area={self.crop_area}, size={self.cropped_pixmap.size()}")
+
+        # 调用回调函数更新预览
+        if self.crop_completed:
+            self.crop_completed()
+
 
 class DetailViewer(QLabel):
     def __init__(self):
@@ -195,6 +341,10 @@ class DetailViewer(QLabel):
             }
         """)
         self._current_pixmap = None
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(RESIZE_DEBOUNCE_MS)
+        self.resize_timer.timeout.connect(self.rescale)
 
     def clear(self):
         """清除图片"""
@@ -207,14 +357,7 @@ class DetailViewer(QLabel):
         try:
             if pixmap and not pixmap.isNull():
                 self._current_pixmap = pixmap
-                # 计算缩放后的大小
-                available_size = self.size()
-                scaled_pixmap = pixmap.scaled(
-                    available_size,
-                    Qt.KeepAspectRatio,
-                    Qt.SmoothTransformation
-                )
-                super().setPixmap(scaled_pixmap)
+                self.rescale()
                 print(f"Detail view updated with image size: {pixmap.size()}")
             else:
                 print("Warning: Received null or invalid pixmap")
@@ -222,11 +365,79 @@ class DetailViewer(QLabel):
         except Exception as e:
             print(f"Error updating detail view: {str(e)}")
 
+    def rescale(self):
+        """按当前控件大小重新缩放显示的裁剪图"""
+        if self._current_pixmap:
+            super().setPixmap(self._current_pixmap.scaled(
+                self.size(),
+                Qt.KeepAspectRatio,
+                Qt.SmoothTransformation
+            ))
+
     def resizeEvent(self, event):
-        """处理窗口大小改变事件"""
+        """处理窗口大小改变事件：停止拖动后再重新缩放"""
         super().resizeEvent(event)
-        if self._current_pixmap:
-            self.update_image(self._current_pixmap)
+        self.resize_timer.start()
+
+
+class ReportWorker(QThread):
+    """后台生成PPT，逐张报告进度，支持取消和检查点续传"""
+    prepare_progress = pyqtSignal(int, int)  # 已预处理, 总数
+    slide_progress = pyqtSignal(int, int, float)  # 已生成, 总数, 张/秒
+    generation_finished = pyqtSignal(str)
+    generation_failed = pyqtSignal(str)
+    generation_cancelled = pyqtSignal(str)
+
+    def __init__(self, engine, image_data, output_path, manifest_path=None,
+                 split_mode=SPLIT_NONE, manifest_dir=None):
+        super().__init__()
+        self.engine = engine
+        self.image_data = image_data
+        self.output_path = output_path  # 分片模式下为输出目录
+        self.manifest_path = manifest_path
+        self.split_mode = split_mode
+        self.manifest_dir = manifest_dir  # 分片模式下各分片的清单目录
+        self._cancelled = False
+        self._start_time = None
+
+    def cancel(self):
+        """请求取消，当前幻灯片完成后保存检查点并退出"""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def on_slide_done(self, done, total):
+        elapsed = max(time.monotonic() - self._start_time, 1e-6)
+        self.slide_progress.emit(done, total, done / elapsed)
+
+    def run(self):
+        self._start_time = time.monotonic()
+        try:
+            if self.split_mode == SPLIT_NONE:
+                output_path = self.engine.generate(
+                    self.image_data, self.output_path,
+                    progress_callback=self.on_slide_done,
+                    manifest_path=self.manifest_path,
+                    prepare_callback=self.prepare_progress.emit,
+                    cancel_check=self.is_cancelled
+                )
+            else:
+                output_path = self.engine.generate_sharded(
+                    self.image_data, self.output_path, mode=self.split_mode,
+                    progress_callback=self.on_slide_done,
+                    manifest_dir=self.manifest_dir,
+                    prepare_callback=self.prepare_progress.emit,
+                    cancel_check=self.is_cancelled
+                )
+            # 清理本次报告不再引用的预处理图片，预处理目录不随项目无限增长
+            self.engine.prune_prepared(self.image_data)
+            self.generation_finished.emit(str(output_path))
+        except GenerationCancelled as e:
+            self.generation_cancelled.emit(str(e))
+        except Exception as e:
+            print(f"Error generating PPT: {str(e)}")
+            self.generation_failed.emit(str(e))
 
 
 class PPTGeneratorApp(QMainWindow):
@@ -235,8 +446,20 @@ class PPTGeneratorApp(QMainWindow):
         self.init_ui()
         self.image_data = {}
         self.current_image = None
-        self.default_comment = "评估结论：1.成像清晰，检测无风险；2.可以通过控制阀值完成允收"
+        self.default_comment = DEFAULT_COMMENT
         self.cache_dir = None  # 缓存目录
+        self.report_worker = None  # 后台PPT生成线程
+        self.image_index = None  # 项目图片索引
+        self.image_watcher = None  # 项目目录监视器
+        self.crop_writer = None  # 后台裁剪图缓存写入
+        self.crop_store = None  # 持久化的裁剪图缓存（按大小限制LRU淘汰）
+        self.thumbnail_service = None  # 项目级缩略图服务
+        self.annotations = None  # 标注数据库（按图片相对路径查询）
+        # 标注编辑只修改内存，停止输入后批量写盘
+        self.records_timer = QTimer(self)
+        self.records_timer.setSingleShot(True)
+        self.records_timer.setInterval(RECORD_FLUSH_DELAY_MS)
+        self.records_timer.timeout.connect(self.flush_records)
         
         # 设置图片处理器的回调
         self.image_processor.crop_completed = self.update_detail_view
@@ -289,10 +512,21 @@ class PPTGeneratorApp(QMainWindow):
             }
         """)
         
-        self.image_list = QListWidget()
+        # 图片列表使用模型/视图，行按需分批加载
+        self.image_list_model = ImageListModel(self)
+        self.image_list = QListView()
+        self.image_list.setModel(self.image_list_model)
+        self.image_list.setUniformItemSizes(True)
+        self.image_list.setIconSize(QSize(LIST_ICON_SIZE, LIST_ICON_SIZE))
+
+        # 实时监视：文件夹中新增/删除/重命名的图片直接反映到列表，无需重新扫描
+        self.watch_check = QCheckBox("实时监视文件夹")
+        self.watch_check.setChecked(True)
+        self.watch_check.toggled.connect(self.on_watch_toggled)
         
         left_layout.addWidget(file_list_label)
         left_layout.addWidget(self.btn_load)
+        left_layout.addWidget(self.watch_check)
         left_layout.addWidget(self.image_list)
 
         # 右侧主要内容区域
@@ -331,9 +565,17 @@ class PPTGeneratorApp(QMainWindow):
             }
         """)
         
+        # 输出方式：单个PPT或按缺陷文件夹/张数拆分为多个PPT
+        self.output_mode = QComboBox()
+        self.output_mode.addItem("单个PPT", SPLIT_NONE)
+        self.output_mode.addItem("按缺陷文件夹拆分", SPLIT_FOLDER)
+        self.output_mode.addItem("每200张拆分", SPLIT_COUNT)
+        self.output_mode.setFixedHeight(35)
+        
         # 将组件添加到标题布局中
         title_layout.addWidget(title_label)
         title_layout.addWidget(self.title_edit, stretch=1)  # 让标题框占据更多空间
+        title_layout.addWidget(self.output_mode)
         title_layout.addWidget(self.btn_generate)
 
         # 图片显示区域的水平分割器
@@ -403,6 +645,16 @@ class PPTGeneratorApp(QMainWindow):
         
         self.setCentralWidget(main_widget)
 
+        # 状态栏：PPT生成进度和取消按钮
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setFixedWidth(240)
+        self.progress_bar.hide()
+        self.btn_cancel = QPushButton("取消生成")
+        self.btn_cancel.clicked.connect(self.cancel_generation)
+        self.btn_cancel.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.statusBar().addPermanentWidget(self.btn_cancel)
+
         # 设置整体样式
         self.setStyleSheet("""
             QMainWindow {
@@ -416,7 +668,7 @@ class PPTGeneratorApp(QMainWindow):
             QPushButton:hover {
                 background-color: #e0e0e0;
             }
-            QListWidget {
+            QListView {
                 border: 1px solid #cccccc;
                 border-radius: 35px;
             }
@@ -428,93 +680,218 @@ class PPTGeneratorApp(QMainWindow):
         """)
 
         # 添加信号连接
-        self.image_list.currentItemChanged.connect(self.select_image)
+        self.image_list.selectionModel().currentChanged.connect(self.select_image)
 
     def load_folders(self):
         folders = QFileDialog.getExistingDirectory(self, "选择包含图片的文件夹")
         if folders:
+            # 切换项目前写出上一个项目尚未保存的裁剪图、标注和裁剪图缓存索引
+            self.flush_crop_cache()
+            self.stop_crop_writer()
+            self.close_records()
+            if self.crop_store:
+                self.crop_store.save()
             self.project_root = Path(folders)
             # 创建缓存目录
             self.cache_dir = self.project_root / '.vsa_cache'
             self.cache_dir.mkdir(exist_ok=True)
-            # 创建或加载JSON记录文件
             self.record_file = self.cache_dir / 'crop_records.json'
-            self.load_records()
+            self.annotations = AnnotationDB(self.cache_dir / ANNOTATION_DB_NAME).connect()
+            self.image_processor.tile_cache_dir = self.cache_dir / TILE_DIR_NAME
+            prune_tile_cache(self.image_processor.tile_cache_dir)
+            # 裁剪图缓存跨会话保留，打开项目时检查完整性
+            self.crop_store = CacheStore(self.cache_dir / CROP_DIR_NAME).load()
+            self.start_thumbnail_service()
+            self.start_crop_writer()
             self.scan_images(self.project_root)
 
+    def start_thumbnail_service(self):
+        """为当前项目创建缩略图服务，列表只为可见的行请求缩略图"""
+        self.stop_thumbnail_service()
+        self.thumbnail_service = ThumbnailService(self.cache_dir, self)
+        self.image_list_model.set_thumbnails(self.thumbnail_service, self.project_root, LIST_ICON_SIZE)
+
+    def stop_thumbnail_service(self):
+        if self.thumbnail_service:
+            self.image_list_model.set_thumbnails(None, None, LIST_ICON_SIZE)
+            self.thumbnail_service.shutdown()
+            self.thumbnail_service = None
+
+    def start_crop_writer(self):
+        """为当前项目启动裁剪图缓存写入线程"""
+        self.stop_crop_writer()
+        self.crop_writer = CropCacheWriter(self.cache_dir)
+        self.crop_writer.crop_saved.connect(self.on_crop_saved)
+        self.crop_writer.start()
+
+    def stop_crop_writer(self):
+        """写完剩余的裁剪图并停止写入线程"""
+        if self.crop_writer:
+            self.crop_writer.stop()
+            self.crop_writer = None
+
     def load_records(self):
-        """加载已有的裁剪记录"""
+        """第一次打开旧项目时把crop_records.json导入标注数据库；其余标注在使用时按路径读取"""
         try:
-            if self.record_file.exists():
-                with open(self.record_file, 'r', encoding='utf-8') as f:
-                    records = json.load(f)
-                    # 更新现有记录
-                    for img_name, data in records.items():
-                        if img_name in self.image_data:
-                            self.image_data[img_name].update(data)
+            imported = self.annotations.migrate(self.record_file)
+            if imported:
+                print(f"Imported {imported} records into {ANNOTATION_DB_NAME}")
         except Exception as e:
             print(f"Error loading records: {str(e)}")
 
-    def save_records(self):
-        """保存记录到JSON文件"""
+    def apply_annotation(self, key):
+        """把一张图片的标注合并到image_data，返回该图片的数据"""
+        data = self.image_data.get(key)
+        if data is None or self.annotations is None:
+            return data
+        record = self.annotations.lookup(key, self.image_data)
+        if record:
+            data.update(record)
+            # 已被淘汰或删除的裁剪图在使用时按crop_area重新生成
+            if data.get('cache_path') and not os.path.exists(data['cache_path']):
+                data['cache_path'] = None
+        return data
+
+    def save_records(self, key):
+        """记录一张图片的标注变化：只修改内存，停止编辑后由定时器批量写入数据库"""
+        if self.annotations is None or not key:
+            return
+        data = self.image_data.get(key)
+        saved = self.annotations.get(key)
+        if data is None:
+            if saved is None:
+                return
+            self.annotations.delete(key)
+        else:
+            record = annotation_record(data, self.default_comment)
+            if saved == record:
+                return
+            self.annotations.put(key, record)
+        self.records_timer.start()
+
+    def flush_records(self):
+        """把标注变化写入数据库"""
         try:
-            if self.cache_dir and self.record_file:
-                records = {}
-                for img_name, data in self.image_data.items():
-                    records[img_name] = {
-                        'crop_area': data.get('crop_area'),
-                        'comment': data.get('comment', self.default_comment),
-                        'folder': data.get('folder', ''),
-                        'folder_name': data.get('folder_name', ''),
-                        'cache_path': data.get('cache_path')
-                    }
-                with open(self.record_file, 'w', encoding='utf-8') as f:
-                    json.dump(records, f, indent=2, ensure_ascii=False)
-                print("Records saved successfully")
+            if self.annotations:
+                self.annotations.flush()
         except Exception as e:
             print(f"Error saving records: {str(e)}")
 
+    def close_records(self):
+        """写出全部标注变化并关闭数据库（关闭窗口或切换项目时调用）"""
+        self.records_timer.stop()
+        try:
+            if self.annotations:
+                self.annotations.close()
+        except Exception as e:
+            print(f"Error saving records: {str(e)}")
+        self.annotations = None
+
     def scan_images(self, root_path):
         """扫描项目路径下的所有图片"""
         try:
             # 清除现有数据
+            self.stop_watching()
+            self.current_image = None  # 清空编辑框时不再写回上一个项目的图片
             self.image_data.clear()
-            self.image_list.clear()
+            self.image_list_model.set_keys([])
             self.image_processor.scene.clear()
             self.detail_view.clear()
             self.comment_edit.clear()
 
-            # 支持的图片格式
-            image_extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
-            
-            # 递归扫描所有图片
-            for file_path in Path(root_path).rglob('*'):
-                if file_path.suffix.lower() in image_extensions:
-                    file_name = file_path.name
-                    folder_name = file_path.parent.name
-                    
-                    # 存储图片信息，使用绝对路径
-                    abs_path = str(file_path.absolute())
-                    self.image_data[file_name] = {
-                        'full_path': abs_path,
-                        'folder': folder_name,  # 默认使用文件夹名称
-                        'folder_name': folder_name,  # 保存原始文件夹名称
-                        'comment': self.default_comment,
-                        'crop_area': None
-                    }
-                    
-                    # 添加到列表
-                    self.image_list.addItem(file_name)
+            # 通过持久化的图片索引扫描（只重新列出有变化的目录），并合并已有的裁剪记录
+            self.image_index = ImageIndex(root_path).load()
+            self.image_index.refresh()
+            self.image_index.save()
+            self.image_data = self.image_index.image_data(self.default_comment)
+            self.load_records()
+            self.image_list_model.set_keys(self.image_data.keys())
             
             # 如果找到图片，选择第一张
-            if self.image_list.count() > 0:
-                self.image_list.setCurrentRow(0)
+            self.image_list_model.ensure_loaded(0)
+            if self.image_list_model.rowCount() > 0:
+                self.image_list.setCurrentIndex(self.image_list_model.index(0))
+
+            if self.watch_check.isChecked():
+                self.start_watching()
                 
             return True
         except Exception as e:
             print(f"Error scanning images: {str(e)}")
             return False
 
+    def start_watching(self):
+        """开始监视项目目录"""
+        if self.image_index and not self.image_watcher:
+            self.image_watcher = ImageFolderWatcher(self.image_index, self)
+            self.image_watcher.images_changed.connect(self.apply_image_changes)
+            self.image_watcher.start()
+
+    def stop_watching(self):
+        """停止监视项目目录"""
+        if self.image_watcher:
+            self.image_watcher.stop()
+            self.image_watcher.deleteLater()
+            self.image_watcher = None
+
+    def on_watch_toggled(self, checked):
+        if checked:
+            # 重新开启时先补上关闭期间的变化
+            if self.image_index:
+                self.apply_image_changes(self.image_index.refresh())
+                self.image_index.save()
+            self.start_watching()
+        else:
+            self.stop_watching()
+
+    def apply_image_changes(self, changes):
+        """把一批新增/删除/重命名的图片应用到image_data和图片列表"""
+        if not changes:
+            return
+        for rel_path in changes.removed:
+            self.image_data.pop(rel_path, None)
+        self.image_list_model.remove_keys(changes.removed)
+        self.image_list_model.invalidate_thumbnails(changes.modified)
+
+        for old_path, new_path in changes.renamed:
+            self.apply_annotation(old_path)
+            data = self.image_data.pop(old_path, None)
+            entry = self.image_index.image_entry(new_path, self.default_comment)
+            if data:
+                # 保留已有的标题、评估意见和裁剪区域；标题未修改过时跟随新文件夹名称
+                if data.get('folder') == data.get('folder_name'):
+                    data['folder'] = entry['folder']
+                data['full_path'] = entry['full_path']
+                data['folder_name'] = entry['folder_name']
+                entry = data
+            self.image_data[new_path] = entry
+            self.image_list_model.rename_key(old_path, new_path)
+            if self.current_image == old_path:
+                self.current_image = new_path
+
+        # 新增图片追加到列表末尾，不打乱当前的浏览位置
+        added = [rel_path for rel_path in changes.added if rel_path not in self.image_data]
+        for rel_path in added:
+            self.image_data[rel_path] = self.image_index.image_entry(rel_path, self.default_comment)
+        self.image_list_model.append_keys(added)
+
+        if self.current_image and self.current_image not in self.image_data:
+            # 当前图片已被删除
+            self.current_image = None
+            self.image_processor.scene.clear()
+            self.detail_view.clear()
+        elif self.current_image in changes.modified:
+            # 当前图片被覆盖，重新加载
+            self.select_image(self.image_list.currentIndex())
+
+        # 被删除图片的标注保留在数据库中（图片恢复后仍可使用），只迁移重命名的记录
+        for old_path, new_path in changes.renamed:
+            self.save_records(old_path)
+            self.save_records(new_path)
+        self.statusBar().showMessage(
+            f"图片变化：新增 {len(changes.added)}，删除 {len(changes.removed)}，"
+            f"重命名 {len(changes.renamed)}", 3000)
+
     def update_detail_view(self):
         """更新细节视图并缓存裁剪图片"""
         try:
@@ -524,20 +901,18 @@ class PPTGeneratorApp(QMainWindow):
                     # 更新预览
                     self.detail_view.update_image(cropped)
                     
-                    # 保存裁剪图到缓存
-                    if self.current_image and self.cache_dir:
-                        cache_name = f"crop_{self.current_image}"
-                        cache_path = self.cache_dir / cache_name
-                        cropped.save(str(cache_path))
-                        
-                        # 更新记录
-                        if self.current_image in self.image_data:
-                            self.image_data[self.current_image]['cache_path'] = str(cache_path)
-                            self.image_data[self.current_image]['crop_area'] = self.image_processor.crop_area
-                            # 保存记录到JSON
-                            self.save_records()
+                    # 裁剪区域变化时交给后台线程写入缓存，写完后再记录cache_path
+                    crop_area = self.image_processor.crop_area
+                    if self.current_image in self.image_data and self.crop_writer and crop_area:
+                        data = self.image_data[self.current_image]
+                        saved_area = tuple(data['crop_area']) if data.get('crop_area') else None
+                        if saved_area != tuple(crop_area) or not data.get('cache_path'):
+                            data['crop_area'] = crop_area
+                            self.crop_writer.put(self.project_root, self.current_image, data['full_path'],
+                                                 crop_area, cropped.toImage())
+                            self.save_records(self.current_image)
                             
-                    print(f"Updated and cached detail view: {cropped.size()}")
+                    print(f"Updated detail view: {cropped.size()}")
                 else:
                     print("Warning: Cropped pixmap is null")
             else:
@@ -545,26 +920,45 @@ class PPTGeneratorApp(QMainWindow):
         except Exception as e:
             print(f"Error updating detail view: {str(e)}")
 
+    def on_crop_saved(self, project, key, crop_area, cache_path):
+        """裁剪图写入缓存后更新记录（期间已重新裁剪或已切换项目时忽略）"""
+        if project != str(self.project_root):
+            # 切换项目前提交的裁剪，结果在切换之后才送达，不能写入新项目的记录
+            return
+        data = self.image_data.get(key)
+        if data and data.get('crop_area') and tuple(data['crop_area']) == tuple(crop_area):
+            if data.get('cache_path') != cache_path:
+                data['cache_path'] = cache_path
+                self.save_records(key)
+            if self.crop_store:
+                self.crop_store.add(cache_path)
+
+    def flush_crop_cache(self):
+        """立即写出尚未写入的裁剪图（生成PPT前调用）"""
+        if self.crop_writer:
+            for project, key, crop_area, cache_path in self.crop_writer.flush():
+                self.on_crop_saved(project, key, crop_area, cache_path)
+
     def on_title_changed(self):
         """标题文本变化时的处理"""
         if self.current_image:
             self.image_data[self.current_image]['folder'] = self.title_edit.toPlainText()
-            self.save_records()
+            self.save_records(self.current_image)
 
     def on_comment_changed(self):
         """评估意见文本变化时的处理"""
         if self.current_image:
             self.image_data[self.current_image]['comment'] = self.comment_edit.toPlainText()
-            self.save_records()
+            self.save_records(self.current_image)
 
-    def select_image(self, item):
+    def select_image(self, index):
         """选择图片时的处理"""
-        if item:
-            file_name = item.text()
+        if index.isValid():
+            file_name = self.image_list_model.key(index.row())
             if file_name in self.image_data:
                 try:
                     self.current_image = file_name
-                    img_info = self.image_data[file_name]
+                    img_info = self.apply_annotation(file_name)
                     
                     # 加载图片
                     self.image_processor.load_image(img_info['full_path'])
@@ -580,22 +974,45 @@ class PPTGeneratorApp(QMainWindow):
                     
                     # 清除细节视图
                     self.detail_view.clear()
+
+                    # 恢复已保存的裁剪：缓存命中直接显示，缓存丢失时从原图重新读取
+                    if img_info.get('crop_area'):
+                        cache_path = img_info.get('cache_path')
+                        if cache_path and os.path.exists(cache_path):
+                            if self.crop_store:
+                                self.crop_store.touch(cache_path)
+                        else:
+                            cache_path = None
+                        self.image_processor.restore_crop(img_info['crop_area'], cache_path)
+
+                    # 预取列表中前后相邻的图片
+                    self.prefetch_neighbours(index.row())
                     
                     print(f"Loading image: {img_info['full_path']}")
                 except Exception as e:
                     print(f"Error selecting image: {str(e)}")
 
+    def prefetch_neighbours(self, row, count=DEFAULT_PREFETCH):
+        """按与当前行的距离由近到远预取前后各count张图片"""
+        paths = []
+        for offset in range(1, count + 1):
+            for neighbour in (row + offset, row - offset):
+                key = self.image_list_model.key(neighbour)
+                if key in self.image_data:
+                    paths.append(self.image_data[key]['full_path'])
+        self.image_processor.prefetch(paths)
+
     def on_title_changed(self):
         """标题文本变化时的处理"""
         if self.current_image:
             self.image_data[self.current_image]['folder'] = self.title_edit.toPlainText()
-            self.save_records()
+            self.save_records(self.current_image)
 
     def on_comment_changed(self):
         """评估意见文本变化时的处理"""
         if self.current_image:
             self.image_data[self.current_image]['comment'] = self.comment_edit.toPlainText()
-            self.save_records()
+            self.save_records(self.current_image)
 
     def generate_ppt(self):
         """生成PPT，使用缓存的裁剪图片"""
@@ -610,117 +1027,117 @@ class PPTGeneratorApp(QMainWindow):
             QMessageBox.warning(self, "警告", "请先选择项目文件夹！")
             return
 
-        try:
-            prs = Presentation(template_path)
-            slide_width = prs.slide_width
-            slide_height = prs.slide_height
-
-            # 处理每张图片
-            for img_name, data in self.image_data.items():
-                # 创建新幻灯片
-                slide = prs.slides.add_slide(prs.slide_layouts[10])
-
-                # 添加标题
-                if slide.shapes.title is None:
-                    title = slide.shapes.add_textbox(
-                        Inches(2.3), Inches(0.5),
-                        slide_width - Inches(3), Inches(0.5)
-                    )
-                    title.text_frame.text = data['folder']
-                    # 设置标题字体大小和加粗
-                    title.text_frame.paragraphs[0].font.size = Pt(28)  # 增加字体大小
-                    title.text_frame.paragraphs[0].font.bold = False    # 设置为粗体
-                else:
-                    slide.shapes.title.text = data['folder']
-                    # 设置标题字体大小和加粗
-                    slide.shapes.title.text_frame.paragraphs[0].font.size = Pt(28)  # 增加字体大小
-                    slide.shapes.title.text_frame.paragraphs[0].font.bold = True    # 设置为粗体
+        if self.report_worker and self.report_worker.isRunning():
+            return
 
-                try:
-                    # 添加原图
-                    with Image.open(data['full_path']) as img:
-                        img_width, img_height = img.size
-                        target_height = Inches(3)
-                        target_width = target_height * (img_width / img_height)
-                        left = Inches(0.5)
-                        top = Inches(1.8)
-                        
-                        slide.shapes.add_picture(
-                            data['full_path'],
-                            left, top,
-                            height=target_height
-                        )
+        # 确保最近的裁剪和标注已写入磁盘，并把全部标注合并到生成数据中
+        self.flush_crop_cache()
+        self.flush_records()
+        if self.annotations:
+            merge_crop_records(self.image_data, self.annotations.all_records())
 
-                    # 添加裁剪图
-                    cache_path = data.get('cache_path')
-                    if cache_path and os.path.exists(cache_path):
-                        with Image.open(cache_path) as cropped:
-                            crop_width, crop_height = cropped.size
-                            crop_target_height = Inches(3)  # 调整为3英寸，与原图一致
-                            crop_target_width = crop_target_height * (crop_width / crop_height)
-                            crop_left = slide_width - crop_target_width - Inches(1.5)
-                            crop_top = top
-                            
-                            slide.shapes.add_picture(
-                                cache_path,
-                                crop_left, crop_top,
-                                height=crop_target_height
-                            )
-
-                    # 添加评估意见
-                    comment_added = False
-                    for shape in slide.shapes:
-                        if shape.has_text_frame and shape.text_frame.text == "评估意见":
-                            shape.text_frame.text = data['comment']
-                            comment_added = True
-                            break
-                    
-                    if not comment_added:
-                        comment_box = slide.shapes.add_textbox(
-                            Inches(0.5), Inches(5.2),
-                            slide_width - Inches(1), Inches(0.3)
-                        )
-                        comment_box.text_frame.text = data['comment']
+        # 增量生成：只重建图片、裁剪或文字发生变化的幻灯片；中断后从检查点继续
+        engine = ReportEngine(template_path, self.default_comment,
+                              prep_dir=self.cache_dir / PREPARED_DIR_NAME,
+                              checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+                              crop_dir=self.cache_dir / CROP_DIR_NAME)
+        split_mode = self.output_mode.currentData()
+        output_path = default_output_path(self.project_root)
+        if split_mode != SPLIT_NONE:
+            output_path = output_path.with_suffix('')  # 分片输出到同名目录
+        self.report_worker = ReportWorker(
+            engine,
+            copy.deepcopy(self.image_data),  # 生成期间允许继续编辑，使用数据快照
+            output_path,
+            manifest_path=self.cache_dir / MANIFEST_FILE_NAME,
+            split_mode=split_mode,
+            manifest_dir=self.cache_dir / SHARD_MANIFEST_DIR_NAME
+        )
+        self.report_worker.prepare_progress.connect(self.on_prepare_progress)
+        self.report_worker.slide_progress.connect(self.on_slide_progress)
+        self.report_worker.generation_finished.connect(self.on_generation_finished)
+        self.report_worker.generation_failed.connect(self.on_generation_failed)
+        self.report_worker.generation_cancelled.connect(self.on_generation_cancelled)
 
-                except Exception as e:
-                    print(f"Error processing {img_name}: {str(e)}")
-                    continue
-
-            # 生成输出文件名
-            project_name = self.project_root.name
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = f"{project_name}_Report_{timestamp}.pptx"
-            output_path = self.project_root / output_filename
-
-            # 保存PPT
-            prs.save(str(output_path))
-            self.statusBar().showMessage(f"PPT生成完成！保存至：{output_path}", 5000)
-            
-            # 询问是否打开文件
-            reply = QMessageBox.question(self, '完成', 
-                                       f'PPT已生成到：\n{output_path}\n\n是否立即打开？',
-                                       QMessageBox.Yes | QMessageBox.No)
-            
-            if reply == QMessageBox.Yes:
-                if sys.platform == 'win32':
-                    os.startfile(str(output_path))
-                elif sys.platform == 'darwin':
-                    subprocess.run(['open', str(output_path)])
-                else:
-                    subprocess.run(['xdg-open', str(output_path)])
+        self.btn_generate.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.btn_cancel.setEnabled(True)
+        self.btn_cancel.show()
+        self.statusBar().showMessage("正在准备生成PPT...")
+        self.report_worker.start()
 
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"生成PPT时发生错误：\n{str(e)}")
-            print(f"Error generating PPT: {str(e)}")
+    def on_prepare_progress(self, done, total):
+        """图片预处理进度"""
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+        self.statusBar().showMessage(f"正在预处理图片 {done}/{total}")
+
+    def on_slide_progress(self, done, total, rate):
+        """幻灯片生成进度"""
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+        self.statusBar().showMessage(f"正在生成幻灯片 {done}/{total}（{rate:.1f} 张/秒）")
+
+    def cancel_generation(self):
+        """取消PPT生成"""
+        if self.report_worker and self.report_worker.isRunning():
+            self.report_worker.cancel()
+            self.btn_cancel.setEnabled(False)
+            self.statusBar().showMessage("正在取消，保存检查点...")
+
+    def reset_generation_ui(self):
+        self.btn_generate.setEnabled(True)
+        self.progress_bar.hide()
+        self.btn_cancel.hide()
+
+    def on_generation_finished(self, output_path):
+        """PPT生成完成"""
+        self.reset_generation_ui()
+        self.statusBar().showMessage(f"PPT生成完成！保存至：{output_path}", 5000)
+
+        # 询问是否打开文件
+        reply = QMessageBox.question(self, '完成', 
+                                   f'PPT已生成到：\n{output_path}\n\n是否立即打开？',
+                                   QMessageBox.Yes | QMessageBox.No)
+        
+        if reply == QMessageBox.Yes:
+            if sys.platform == 'win32':
+                os.startfile(output_path)
+            elif sys.platform == 'darwin':
+                subprocess.run(['open', output_path])
+            else:
+                subprocess.run(['xdg-open', output_path])
+
+    def on_generation_failed(self, message):
+        """PPT生成失败"""
+        self.reset_generation_ui()
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "错误", f"生成PPT时发生错误：\n{message}")
+
+    def on_generation_cancelled(self, message):
+        """PPT生成已取消，下次生成时从检查点继续"""
+        self.reset_generation_ui()
+        self.statusBar().showMessage(message, 5000)
+
+    def shutdown(self):
+        """关闭窗口前停止后台生成（已完成部分保存为检查点）和目录监视"""
+        self.stop_watching()
+        self.stop_crop_writer()
+        self.close_records()
+        if self.crop_store:
+            self.crop_store.save()
+        self.stop_thumbnail_service()
+        self.image_processor.decode_cache.shutdown()
+        self.image_processor.tile_loader.shutdown()
+        self.image_processor.crop_service.shutdown()
+        if self.report_worker and self.report_worker.isRunning():
+            self.report_worker.cancel()
+            self.report_worker.wait()
 
     def closeEvent(self, event):
-        """程序关闭时清理缓存"""
-        try:
-            if hasattr(self, 'cache_dir') and self.cache_dir.exists():
-                import shutil
-                shutil.rmtree(self.cache_dir)
-        except Exception as e:
-            print(f"Error cleaning cache: {str(e)}")
+        """程序关闭时停止后台任务并保存缓存索引（缓存保留供下次打开项目使用）"""
+        self.shutdown()
         event.accept()
 
 
@@ -0,0 +1,167 @@
+"""
+图片标注的SQLite存储
+
+每个项目一个.vsa_cache/annotations.db（WAL模式），一行对应一张图片的标注，
+主键为图片相对路径，并按缺陷文件夹建立索引。打开项目时不再读取全部记录，
+选中图片时按路径查询；编辑先记录在内存中，空闲时在一个事务里逐行写入，
+不再整体重写文件。旧项目第一次打开时把crop_records.json（及日志）中的记录
+按原来的键全部导入（包括当时不存在的图片），与图片的匹配在读取时进行。
+"""
+import os
+import json
+import sqlite3
+from pathlib import Path
+
+from .annotation_store import load_legacy_records
+
+ANNOTATION_DB_NAME = 'annotations.db'
+SCHEMA_VERSION = 1  # PRAGMA user_version，0表示尚未从JSON记录导入
+
+
+def record_row(key, record):
+    """标注记录 -> 数据库行"""
+    crop_area = record.get('crop_area')
+    return (key, record.get('folder_name') or '', record.get('folder') or '', record.get('comment'),
+            json.dumps([int(v) for v in crop_area]) if crop_area else None, record.get('cache_path'))
+
+
+def row_record(row):
+    """数据库行 -> 标注记录（与annotation_record的字段一致）"""
+    folder_name, title, comment, crop_area, cache_path = row
+    return {
+        'crop_area': json.loads(crop_area) if crop_area else None,
+        'comment': comment,
+        'folder': title,
+        'folder_name': folder_name,
+        'cache_path': cache_path
+    }
+
+
+class AnnotationDB:
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.connection = None
+        self.pending = {}  # {图片键: 标注记录或None（删除）}，尚未写入数据库
+
+    def connect(self):
+        """连接数据库并初始化表结构"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.db_path))
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS annotations (
+                    path TEXT PRIMARY KEY,
+                    folder_name TEXT NOT NULL DEFAULT '',
+                    title TEXT NOT NULL DEFAULT '',
+                    comment TEXT,
+                    crop_area TEXT,
+                    cache_path TEXT
+                )
+            ''')
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS idx_annotations_folder ON annotations(folder_name)')
+        return self
+
+    def needs_migration(self):
+        """是否还没有导入旧的JSON记录"""
+        return self.connection.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION
+
+    def migrate(self, record_file):
+        """第一次打开旧项目时导入crop_records.json中的全部记录，返回导入的条数（只执行一次）"""
+        if not self.needs_migration():
+            return 0
+        records = load_legacy_records(record_file)
+        self.import_records(records.items())
+        return len(records)
+
+    def import_records(self, items):
+        """在一个事务中导入 (图片键, 标注记录)，并标记为已导入"""
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?)',
+                (record_row(key, record) for key, record in items))
+            self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def get(self, key):
+        """按相对路径查询一张图片的标注，没有记录时返回None"""
+        if key in self.pending:
+            return self.pending[key]
+        row = self.connection.execute(
+            'SELECT folder_name, title, comment, crop_area, cache_path FROM annotations WHERE path = ?',
+            (key,)).fetchone()
+        return row_record(row) if row else None
+
+    def lookup(self, key, image_keys):
+        """查询图片的标注；没有记录时使用旧版本以文件名为键的记录（文件名在image_keys中唯一时）"""
+        record = self.get(key)
+        if record is not None:
+            return record
+        name = os.path.basename(key)
+        if name == key:
+            return None
+        record = self.get(name)
+        if record is None or sum(1 for other in image_keys if os.path.basename(other) == name) != 1:
+            return None
+        return record
+
+    def put(self, key, record):
+        """更新一条记录（只修改内存，不写盘）"""
+        self.pending[key] = record
+
+    def delete(self, key):
+        self.put(key, None)
+
+    @property
+    def dirty(self):
+        return bool(self.pending)
+
+    def items(self):
+        """遍历全部 (图片键, 标注记录)，包含尚未写入的修改"""
+        rows = self.connection.execute(
+            'SELECT path, folder_name, title, comment, crop_area, cache_path FROM annotations')
+        for row in rows:
+            if row[0] not in self.pending:
+                yield row[0], row_record(row[1:])
+        for key, record in list(self.pending.items()):
+            if record is not None:
+                yield key, record
+
+    def all_records(self):
+        return dict(self.items())
+
+    def paths_with_crops(self, folder_name=None):
+        """已设置裁剪区域的图片，可按缺陷文件夹筛选"""
+        self.flush()
+        if folder_name is None:
+            rows = self.connection.execute(
+                'SELECT path FROM annotations WHERE crop_area IS NOT NULL ORDER BY path')
+        else:
+            rows = self.connection.execute(
+                'SELECT path FROM annotations WHERE folder_name = ? AND crop_area IS NOT NULL ORDER BY path',
+                (folder_name,))
+        return [row[0] for row in rows]
+
+    def flush(self):
+        """在一个事务中写入尚未保存的修改（每张图片一行）"""
+        if not self.pending:
+            return
+        pending = self.pending
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?)',
+                (record_row(key, record) for key, record in pending.items() if record is not None))
+            self.connection.executemany(
+                'DELETE FROM annotations WHERE path = ?',
+                ((key,) for key, record in pending.items() if record is None))
+        self.pending = {}
+
+    def close(self):
+        """写出全部修改并关闭连接"""
+        if self.connection:
+            try:
+                self.flush()
+            finally:
+                self.connection.close()
+                self.connection = None
@@ -0,0 +1,46 @@
+"""
+旧版本的图片标注记录
+
+标注现在保存在每个项目的annotations.db中（见annotation_db）。旧版本把标注
+写在crop_records.json快照中，并把尚未合并的编辑追加到日志文件
+crop_records.json.journal（每行一条JSON）。这里只负责读取这两个文件，供第一次
+打开旧项目时导入以及尚未导入的项目生成报告使用。
+"""
+import json
+from pathlib import Path
+
+JOURNAL_SUFFIX = '.journal'
+
+
+def annotation_record(data, default_comment):
+    """从image_data条目中提取需要持久化的标注字段"""
+    return {
+        'crop_area': list(data['crop_area']) if data.get('crop_area') else None,
+        'comment': data.get('comment', default_comment),
+        'folder': data.get('folder', ''),
+        'folder_name': data.get('folder_name', ''),
+        'cache_path': data.get('cache_path')
+    }
+
+
+def load_legacy_records(record_file):
+    """读取快照并重放日志，返回 {图片键: 标注记录}，文件不存在时返回空字典"""
+    record_file = Path(record_file)
+    journal_path = record_file.with_name(record_file.name + JOURNAL_SUFFIX)
+    records = {}
+    if record_file.exists():
+        with open(record_file, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+    if journal_path.exists():
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 崩溃时写了一半的最后一行
+                    break
+                if entry['record'] is None:
+                    records.pop(entry['key'], None)
+                else:
+                    records[entry['key']] = entry['record']
+    return records
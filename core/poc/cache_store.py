@@ -0,0 +1,178 @@
+"""
+持久化的裁剪图/缩略图缓存
+
+缓存目录中的文件由cache_index.json记录大小和最近使用时间，总大小超出预算时
+按LRU淘汰。打开项目时做一次完整性检查：清理中断留下的临时文件，删除截断的
+图片，把索引中缺失的文件移出索引、把未登记的文件补进索引。
+裁剪图被淘汰或丢失时，可以根据crop_area从原图重新生成（materialize_crop）。
+"""
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+from PIL import Image
+
+from .deck_manifest import file_sha1
+
+CROP_DIR_NAME = 'crops'
+CACHE_INDEX_NAME = 'cache_index.json'
+CACHE_INDEX_VERSION = 1
+DEFAULT_CROP_CACHE_MB = 1024
+CACHE_FILE_EXTENSIONS = ('.png', '.jpg')
+
+
+def source_signature(path):
+    """原图签名：绝对路径、修改时间和文件大小，原图被覆盖后签名随之变化"""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+def crop_file_name(source_digest, crop_area):
+    """由原图内容哈希和裁剪区域生成缓存文件名"""
+    key = f"{source_digest}|{','.join(str(int(v)) for v in crop_area)}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest() + '.png'
+
+
+def is_intact(path):
+    """检查图片文件是否完整：PNG检查文件头和IEND块，JPEG检查SOI/EOI标记"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(8)
+            f.seek(-12, os.SEEK_END)
+            tail = f.read(12)
+    except OSError:
+        return False
+    suffix = Path(path).suffix.lower()
+    if suffix == '.png':
+        return head == b'\x89PNG\r\n\x1a\n' and tail[4:8] == b'IEND'
+    if suffix == '.jpg':
+        return head[:2] == b'\xff\xd8' and tail[-2:] == b'\xff\xd9'
+    return True
+
+
+def materialize_crop(source, crop_area, crop_dir, source_digest=None):
+    """根据crop_area从原图重新生成裁剪图，已存在时直接返回缓存路径"""
+    source_digest = source_digest or file_sha1(source)
+    path = Path(crop_dir) / crop_file_name(source_digest, crop_area)
+    if path.exists():
+        return str(path)
+    x, y, w, h = (int(v) for v in crop_area)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with Image.open(source) as img:
+        cropped = img.crop((x, y, min(x + w, img.width), min(y + h, img.height)))
+        if cropped.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+            cropped = cropped.convert('RGB')
+        tmp_path = path.with_name(path.name + '.tmp')
+        cropped.save(tmp_path, 'PNG')
+    os.replace(tmp_path, path)
+    return str(path)
+
+
+class CacheStore:
+    def __init__(self, root, max_bytes=DEFAULT_CROP_CACHE_MB * 1024 * 1024):
+        self.root = Path(root)
+        self.index_path = self.root / CACHE_INDEX_NAME
+        self.max_bytes = max_bytes
+        self.entries = {}  # {文件名: [大小, 最近使用时间]}
+        self.total = 0  # 已登记文件的总大小
+        self.dirty = False
+
+    def load(self):
+        """读取索引并做完整性检查"""
+        entries = {}
+        try:
+            if self.index_path.exists():
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == CACHE_INDEX_VERSION:
+                    entries = data.get('entries', {})
+        except Exception as e:
+            print(f"Error loading cache index: {str(e)}")
+        self.entries = {}
+        self.root.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name == CACHE_INDEX_NAME:
+                    continue
+                if entry.name.endswith('.tmp'):
+                    # 写入中断留下的临时文件
+                    self.remove_file(entry.path)
+                    continue
+                if os.path.splitext(entry.name)[1].lower() not in CACHE_FILE_EXTENSIONS:
+                    continue
+                size = entry.stat().st_size
+                known = entries.get(entry.name)
+                if not is_intact(entry.path):
+                    print(f"Removing corrupted cache file: {entry.name}")
+                    self.remove_file(entry.path)
+                    continue
+                # 索引之外的文件按当前时间登记
+                self.entries[entry.name] = [size, known[1] if known and known[0] == size else now]
+        self.total = sum(size for size, _ in self.entries.values())
+        self.dirty = self.entries != entries
+        self.evict()
+        return self
+
+    def save(self):
+        """原子写入索引文件"""
+        if not self.dirty:
+            return
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix('.json.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_INDEX_VERSION, 'entries': self.entries}, f)
+            os.replace(tmp_path, self.index_path)
+            self.dirty = False
+        except Exception as e:
+            print(f"Error saving cache index: {str(e)}")
+
+    def path(self, name):
+        return self.root / name
+
+    def contains(self, path):
+        """path是否为本缓存中仍然存在的文件"""
+        path = Path(path)
+        return path.parent == self.root and path.name in self.entries and path.exists()
+
+    def touch(self, path):
+        """标记为最近使用"""
+        name = Path(path).name
+        if name in self.entries:
+            self.entries[name][1] = time.time()
+            self.dirty = True
+
+    def add(self, path):
+        """登记新写入的文件，超出预算时淘汰最久未使用的文件"""
+        path = Path(path)
+        try:
+            size = path.stat().st_size
+        except OSError:
+            return
+        old = self.entries.get(path.name)
+        self.total += size - (old[0] if old else 0)
+        self.entries[path.name] = [size, time.time()]
+        self.dirty = True
+        self.evict(keep=path.name)
+
+    def evict(self, keep=None):
+        if self.total <= self.max_bytes:
+            return
+        for name, (size, _) in sorted(self.entries.items(), key=lambda item: item[1][1]):
+            if self.total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            self.remove_file(self.root / name)
+            del self.entries[name]
+            self.total -= size
+            self.dirty = True
+
+    @staticmethod
+    def remove_file(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Error removing cache file {path}: {str(e)}")
@@ -0,0 +1,109 @@
+"""
+裁剪图缓存写入
+
+裁剪图按 (原图内容哈希, crop_area) 命名保存在.vsa_cache/crops下，不同文件夹的
+同名图片不会互相覆盖，相同裁剪直接复用已有文件。写入在后台线程中进行：
+同一张图片短时间内的多次裁剪只写最后一次，文件先写临时文件再重命名。
+每个任务带有所属项目的根目录，切换项目后才送达的结果可以按项目丢弃。
+"""
+import os
+import time
+import threading
+from pathlib import Path
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from .deck_manifest import file_sha1
+from .cache_store import crop_file_name, CROP_DIR_NAME
+
+COALESCE_SECONDS = 0.3  # 合并连续裁剪的等待时间
+
+
+class CropCacheWriter(QThread):
+    crop_saved = pyqtSignal(str, str, object, str)  # 项目根目录, 图片键, crop_area, 缓存文件路径
+
+    def __init__(self, cache_dir, coalesce_seconds=COALESCE_SECONDS):
+        super().__init__()
+        self.crop_dir = Path(cache_dir) / CROP_DIR_NAME
+        self.coalesce_seconds = coalesce_seconds
+        self.pending = {}  # {(项目根目录, 图片键): (原图路径, crop_area, QImage)}，只保留最后一次裁剪
+        self.digests = {}  # {(路径, 大小, 修改时间): sha1}
+        self.busy = False
+        self._stopping = False
+        self._cond = threading.Condition()
+
+    def put(self, project, key, source, crop_area, image):
+        """提交project项目中的裁剪图，立即返回；写入完成后发出crop_saved"""
+        with self._cond:
+            self.pending[(str(project), key)] = (str(source), tuple(crop_area), image)
+            self._cond.notify_all()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self.pending and not self._stopping:
+                    self._cond.wait()
+                if self._stopping and not self.pending:
+                    return
+            # 等待连续拖动结束，期间的新裁剪覆盖旧的
+            if not self._stopping:
+                time.sleep(self.coalesce_seconds)
+            with self._cond:
+                items = self.pending
+                self.pending = {}
+                self.busy = True
+            try:
+                for (project, key), (source, crop_area, image) in items.items():
+                    path = self.write(source, crop_area, image)
+                    if path:
+                        self.crop_saved.emit(project, key, crop_area, path)
+            finally:
+                with self._cond:
+                    self.busy = False
+                    self._cond.notify_all()
+
+    def flush(self):
+        """在调用线程中立即写出所有待写入的裁剪图，返回 [(项目根目录, 图片键, crop_area, 缓存文件路径)]"""
+        with self._cond:
+            while self.busy:
+                self._cond.wait()
+            items = self.pending
+            self.pending = {}
+        results = []
+        for (project, key), (source, crop_area, image) in items.items():
+            path = self.write(source, crop_area, image)
+            if path:
+                results.append((project, key, crop_area, path))
+        return results
+
+    def stop(self):
+        """写完剩余的裁剪图后退出线程"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self.wait()
+
+    def source_digest(self, source):
+        """原图内容哈希，按大小和修改时间缓存"""
+        stat = os.stat(source)
+        key = (source, stat.st_size, stat.st_mtime_ns)
+        digest = self.digests.get(key)
+        if digest is None:
+            digest = file_sha1(source)
+            self.digests[key] = digest
+        return digest
+
+    def write(self, source, crop_area, image):
+        """写入裁剪图，已存在相同内容的缓存时直接复用"""
+        try:
+            path = self.crop_dir / crop_file_name(self.source_digest(source), crop_area)
+            if not path.exists():
+                self.crop_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(path.name + '.tmp')
+                if not image.save(str(tmp_path), 'PNG'):
+                    print(f"Error writing crop cache: {tmp_path}")
+                    return None
+                os.replace(tmp_path, path)
+            return str(path)
+        except OSError as e:
+            print(f"Error writing crop cache: {str(e)}")
+            return None
@@ -0,0 +1,129 @@
+"""
+裁剪服务
+
+在后台线程中只读取原图中裁剪区域的像素，crop_area 与界面一致，为原图坐标
+(x, y, w, h)：
+- JPEG：QImageReader区域解码（libjpeg按扫描行裁剪/跳过，不生成整图位图）
+- 已生成瓦片金字塔的超大无损图片（PNG/TIFF/BMP等）：直接拼接0级瓦片
+- 其他格式：整图解码后截取
+同一张图片连续拖动多次时只处理最后一次请求。
+"""
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QRect, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader, QPainter
+
+
+def read_region(path, rect):
+    """按原图坐标读取区域的全分辨率图像（QRect，超出原图的部分会被裁掉）"""
+    reader = QImageReader(str(path))
+    source_size = reader.size()
+    if source_size.isValid():
+        rect = rect.intersected(QRect(0, 0, source_size.width(), source_size.height()))
+    if rect.isEmpty():
+        return QImage()
+    reader.setClipRect(rect)
+    image = reader.read()
+    if image.isNull():
+        # 不支持区域读取的格式退回到整图解码
+        image = QImage(str(path))
+        if not image.isNull():
+            image = image.copy(rect)
+    return image
+
+
+def compose_from_tiles(pyramid, rect):
+    """用金字塔0级瓦片拼出区域图像，瓦片缺失时返回空图"""
+    rect = rect.intersected(QRect(0, 0, pyramid.size.width(), pyramid.size.height()))
+    if rect.isEmpty():
+        return QImage()
+    span = pyramid.tile_span(0)
+    result = None
+    painter = None
+    try:
+        for ty in range(rect.top() // span, rect.bottom() // span + 1):
+            for tx in range(rect.left() // span, rect.right() // span + 1):
+                tile = QImage(str(pyramid.tile_path(0, tx, ty)))
+                if tile.isNull():
+                    return QImage()
+                if result is None:
+                    result = QImage(rect.size(), tile.format())
+                    painter = QPainter(result)
+                    painter.setCompositionMode(QPainter.CompositionMode_Source)
+                tile_rect = pyramid.tile_rect(0, tx, ty)
+                part = tile_rect.intersected(rect)
+                painter.drawImage(part.topLeft() - rect.topLeft(), tile,
+                                  part.translated(-tile_rect.topLeft()))
+    finally:
+        if painter is not None:
+            painter.end()
+    return result if result is not None else QImage()
+
+
+def read_crop(path, crop_area, pyramid=None):
+    """读取裁剪区域；无损瓦片已生成时直接从瓦片拼接"""
+    rect = QRect(*crop_area)
+    if pyramid is not None and not pyramid.region_decode and pyramid.is_complete():
+        image = compose_from_tiles(pyramid, rect)
+        if not image.isNull():
+            return image
+    return read_region(path, rect)
+
+
+class CropSignals(QObject):
+    done = pyqtSignal(object, object)  # (路径, crop_area), QImage
+
+
+class CropTask(QRunnable):
+    def __init__(self, service, path, crop_area, pyramid):
+        super().__init__()
+        self.service = service
+        self.path = path
+        self.crop_area = crop_area
+        self.pyramid = pyramid
+        self.signals = service.signals
+
+    def run(self):
+        key = (self.path, self.crop_area)
+        # 已有更新的请求时放弃
+        if not self.service.is_latest(key):
+            self.signals.done.emit(key, None)
+            return
+        try:
+            image = read_crop(self.path, self.crop_area, self.pyramid)
+        except Exception as e:
+            print(f"Error reading crop: {str(e)}")
+            image = QImage()
+        self.signals.done.emit(key, image)
+
+
+class CropService(QObject):
+    crop_ready = pyqtSignal(str, object, object)  # 路径, crop_area, QImage
+
+    def __init__(self, parent=None, max_threads=2):
+        super().__init__(parent)
+        self.latest = {}  # {路径: 最后一次请求的crop_area}
+        self.closed = False
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.signals = CropSignals()
+        self.signals.done.connect(self.on_done)
+
+    def is_latest(self, key):
+        return not self.closed and self.latest.get(key[0]) == key[1]
+
+    def request(self, path, crop_area, pyramid=None):
+        """后台读取裁剪区域，完成后发出crop_ready"""
+        path = str(path)
+        crop_area = tuple(crop_area)
+        self.latest[path] = crop_area
+        self.pool.start(CropTask(self, path, crop_area, pyramid))
+
+    def on_done(self, key, image):
+        if image is None or self.closed or not self.is_latest(key):
+            return
+        del self.latest[key[0]]
+        self.crop_ready.emit(key[0], key[1], image)
+
+    def shutdown(self):
+        self.closed = True
+        self.pool.clear()
+        self.pool.waitForDone()
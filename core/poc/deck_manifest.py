@@ -0,0 +1,104 @@
+"""
+PPT增量生成清单
+
+记录上一次生成的PPT中每张幻灯片来自哪张图片、裁剪区域、标题和评估意见，
+下次生成时只重建输入发生变化的幻灯片。
+"""
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha1(path):
+    """计算文件内容的SHA1"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DeckManifest:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.deck_path = None  # 上一次生成的PPT
+        self.template = None
+        self.policy = None
+        self.files = {}  # {文件路径: {'size', 'mtime_ns', 'sha1'}}
+        self.slides = {}  # {图片键: 幻灯片记录}
+
+    @classmethod
+    def load(cls, path):
+        """读取清单，文件不存在或版本不匹配时返回空清单"""
+        manifest = cls(path)
+        try:
+            if manifest.path.exists():
+                with open(manifest.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    manifest.deck_path = data.get('deck_path')
+                    manifest.template = data.get('template')
+                    manifest.policy = data.get('policy')
+                    manifest.files = data.get('files', {})
+                    manifest.slides = data.get('slides', {})
+        except Exception as e:
+            print(f"Error loading deck manifest: {str(e)}")
+        return manifest
+
+    def save(self):
+        """原子写入清单文件"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'version': MANIFEST_VERSION,
+            'deck_path': self.deck_path,
+            'template': self.template,
+            'policy': self.policy,
+            'files': self.files,
+            'slides': self.slides
+        }
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def is_compatible(self, template, policy):
+        """上一次的PPT是否可以作为本次增量生成的基础"""
+        return (self.deck_path is not None and os.path.exists(self.deck_path)
+                and self.template == template and self.policy == policy)
+
+    def update_digests(self, paths, max_workers=None):
+        """更新文件内容哈希；大小和修改时间未变的文件直接复用已记录的哈希"""
+        paths = list(dict.fromkeys(paths))
+        self.files = {path: self.files[path] for path in paths if path in self.files}
+        stale = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self.files.pop(path, None)
+                continue
+            entry = self.files.get(path)
+            if (entry and entry.get('size') == stat.st_size
+                    and entry.get('mtime_ns') == stat.st_mtime_ns):
+                continue
+            stale.append((path, stat))
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                digests = executor.map(file_sha1, [path for path, _ in stale])
+                for (path, stat), sha1 in zip(stale, digests):
+                    self.files[path] = {
+                        'size': stat.st_size,
+                        'mtime_ns': stat.st_mtime_ns,
+                        'sha1': sha1
+                    }
+
+    def digest(self, path):
+        """返回文件的内容哈希，未知文件返回None"""
+        entry = self.files.get(path) if path else None
+        return entry['sha1'] if entry else None
@@ -0,0 +1,174 @@
+"""
+图片解码缓存
+
+在QThreadPool中后台解码图片（QImage可以在非GUI线程创建），结果放入按内存
+预算（MB）限制的LRU缓存；浏览时预取当前图片前后若干张，翻页时直接命中缓存。
+图片只按屏幕分辨率解码（QImageReader.setScaledSize，JPEG解码时直接按DCT缩放），
+裁剪区域的全分辨率像素由crop_service从原图读取。
+"""
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QSize, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+DEFAULT_BUDGET_MB = 512
+DEFAULT_PREFETCH = 3  # 预取当前图片前后各N张
+CURRENT_PRIORITY = 1  # 当前图片优先于预取任务解码
+
+
+@dataclass
+class DecodedImage:
+    image: QImage = None  # 显示用的（可能已缩小的）图片
+    source_size: QSize = None  # 原图尺寸
+
+    def isNull(self):
+        return self.image is None or self.image.isNull()
+
+    @property
+    def scale(self):
+        """原图像素 / 显示图像素"""
+        if self.isNull():
+            return 1.0
+        return self.source_size.width() / self.image.width()
+
+
+def decode_image(path, max_size=None):
+    """解码图片；原图超过max_size时按比例缩小解码"""
+    reader = QImageReader(str(path))
+    source_size = reader.size()
+    if max_size is not None and source_size.isValid() and (
+            source_size.width() > max_size.width() or source_size.height() > max_size.height()):
+        reader.setScaledSize(source_size.scaled(max_size, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        print(f"Failed to decode image: {path} ({reader.errorString()})")
+    elif not source_size.isValid():
+        source_size = image.size()
+    return DecodedImage(image=image, source_size=source_size)
+
+
+def cache_key(path):
+    """缓存键：路径、大小和修改时间，文件被覆盖后自动失效"""
+    try:
+        stat = os.stat(path)
+        return (str(path), stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        return None
+
+
+class DecodeSignals(QObject):
+    decoded = pyqtSignal(object, object)  # 缓存键, DecodedImage
+
+
+class DecodeTask(QRunnable):
+    def __init__(self, cache, key):
+        super().__init__()
+        self.cache = cache
+        self.key = key
+        self.signals = cache.signals
+
+    def run(self):
+        # 开始解码前已移出预取窗口的任务直接放弃
+        if not self.cache.is_wanted(self.key):
+            self.signals.decoded.emit(self.key, None)
+            return
+        self.signals.decoded.emit(self.key, decode_image(self.key[0], self.cache.max_size))
+
+
+class ImageDecodeCache(QObject):
+    image_ready = pyqtSignal(str, object)  # 路径, DecodedImage（解码失败时为空图）
+
+    def __init__(self, parent=None, budget_mb=DEFAULT_BUDGET_MB, max_threads=None, max_size=None):
+        super().__init__(parent)
+        self.max_size = max_size  # 解码尺寸上限（通常为屏幕分辨率），None表示全分辨率
+        self.budget = budget_mb * 1024 * 1024
+        self.used = 0
+        self.images = OrderedDict()  # {缓存键: DecodedImage}，末尾为最近使用
+        self.pending = set()  # 正在解码的缓存键
+        self.wanted = set()  # 当前图片和预取窗口内的缓存键
+        self.current_key = None
+        self.closed = False
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads or max(2, min(4, os.cpu_count() or 1)))
+        self.signals = DecodeSignals()
+        self.signals.decoded.connect(self.on_decoded)
+
+    def is_wanted(self, key):
+        return not self.closed and key in self.wanted
+
+    def get(self, path):
+        """命中时返回DecodedImage并标记为最近使用，否则返回None"""
+        key = cache_key(path)
+        image = self.images.get(key) if key else None
+        if image is not None:
+            self.images.move_to_end(key)
+        return image
+
+    def request(self, path):
+        """请求当前图片：命中缓存时直接返回，否则优先解码并在完成后发出image_ready"""
+        key = cache_key(path)
+        self.current_key = key
+        if key is None:
+            return None
+        self.wanted.add(key)
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+            return image
+        self.schedule(key, CURRENT_PRIORITY)
+        return None
+
+    def prefetch(self, paths):
+        """设置预取窗口：解码窗口内尚未缓存的图片，放弃窗口外尚未开始的任务"""
+        keys = [key for key in (cache_key(path) for path in paths) if key]
+        self.wanted = set(keys)
+        if self.current_key:
+            self.wanted.add(self.current_key)
+        for key in keys:
+            if key in self.images:
+                continue
+            # 预取不能挤掉当前图片：预算只够当前图片时不再预取
+            if self.used >= self.budget:
+                break
+            self.schedule(key, 0)
+
+    def schedule(self, key, priority):
+        if key in self.pending or self.closed:
+            return
+        self.pending.add(key)
+        self.pool.start(DecodeTask(self, key), priority)
+
+    def on_decoded(self, key, image):
+        self.pending.discard(key)
+        if image is None or self.closed:
+            return
+        if not image.isNull() and key in self.wanted:
+            self.images[key] = image
+            self.images.move_to_end(key)
+            self.used += image.image.sizeInBytes()
+            self.evict()
+        if key == self.current_key:
+            self.image_ready.emit(key[0], image)
+
+    def evict(self):
+        """超出预算时淘汰最久未使用的图片，当前图片始终保留"""
+        for key in list(self.images):
+            if self.used <= self.budget:
+                break
+            if key == self.current_key:
+                continue
+            self.used -= self.images.pop(key).image.sizeInBytes()
+
+    def clear(self):
+        self.images.clear()
+        self.used = 0
+        self.wanted = set()
+        self.current_key = None
+
+    def shutdown(self):
+        """丢弃尚未开始的任务并等待正在解码的任务结束"""
+        self.closed = True
+        self.pool.clear()
+        self.pool.waitForDone()
+        self.clear()
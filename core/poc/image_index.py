@@ -0,0 +1,226 @@
+"""
+项目图片索引
+
+用并行的os.scandir遍历项目目录（按扩展名过滤、跳过.vsa_cache等缓存目录），
+以相对路径为键记录图片的大小和修改时间，并持久化到.vsa_cache/image_index.json。
+再次打开项目时，只重新列出修改时间发生变化的目录。
+"""
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff')
+CACHE_DIR_NAME = '.vsa_cache'
+INDEX_FILE_NAME = 'image_index.json'
+INDEX_VERSION = 1
+
+
+class IndexChanges:
+    """一次刷新得到的变化（相对路径列表）"""
+
+    def __init__(self, added=None, removed=None, modified=None, renamed=None):
+        self.added = added or []
+        self.removed = removed or []
+        self.modified = modified or []
+        self.renamed = renamed or []  # [(旧相对路径, 新相对路径)]
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified or self.renamed)
+
+
+class ImageIndex:
+    def __init__(self, root_path, index_path=None):
+        self.root = Path(root_path).absolute()
+        self.index_path = Path(index_path) if index_path else self.root / CACHE_DIR_NAME / INDEX_FILE_NAME
+        # {相对目录: {'mtime_ns': 目录修改时间, 'files': {文件名: [大小, 修改时间]}, 'subdirs': [子目录名]}}
+        self.dirs = {}
+
+    def load(self):
+        """读取持久化的索引，失败时从空索引开始"""
+        try:
+            if self.index_path.exists():
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == INDEX_VERSION and data.get('root') == str(self.root):
+                    self.dirs = data.get('dirs', {})
+        except Exception as e:
+            print(f"Error loading image index: {str(e)}")
+            self.dirs = {}
+        return self
+
+    def save(self):
+        """原子写入索引文件"""
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix('.json.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'root': str(self.root), 'dirs': self.dirs},
+                          f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            print(f"Error saving image index: {str(e)}")
+
+    def scan_dir(self, rel_dir, old_record=None):
+        """扫描单个目录；目录修改时间未变时直接复用旧记录
+
+        返回 (相对目录, 目录记录, 状态)，状态为'ok'、'missing'（目录不存在）或
+        'error'（暂时无法读取），后两种情况目录记录为None。
+        """
+        dir_path = self.root / rel_dir if rel_dir else self.root
+        try:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+            if old_record and old_record.get('mtime_ns') == mtime_ns:
+                return rel_dir, old_record, 'ok'
+
+            files = {}
+            subdirs = []
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        # 跳过裁剪图/预处理缓存以及其他隐藏目录
+                        if entry.name != CACHE_DIR_NAME and not entry.name.startswith('.'):
+                            subdirs.append(entry.name)
+                    elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            # 扫描过程中被删除的文件
+                            continue
+                        files[entry.name] = [stat.st_size, stat.st_mtime_ns]
+            return rel_dir, {'mtime_ns': mtime_ns, 'files': files, 'subdirs': sorted(subdirs)}, 'ok'
+        except FileNotFoundError:
+            return rel_dir, None, 'missing'
+        except OSError as e:
+            print(f"Error scanning {dir_path}: {str(e)}")
+            return rel_dir, None, 'error'
+
+    def confirmed_missing(self, rel_dir):
+        """通过列出上层目录确认目录确实已被删除（根目录无法确认）"""
+        if not rel_dir:
+            return False
+        parent, _, name = rel_dir.rpartition('/')
+        try:
+            return name not in os.listdir(self.root / parent if parent else self.root)
+        except OSError:
+            return False
+
+    def refresh(self, rel_dirs=None, max_workers=None):
+        """并行遍历目录树并更新索引，返回IndexChanges
+
+        rel_dirs指定时只从这些目录（及其子目录）开始刷新，且这些目录本身总是重新列出
+        （目录内文件被原地修改时目录修改时间不变）。无法读取的目录保留旧记录和
+        子目录；只有上层目录扫描成功、确认不存在的目录才会被移除。
+        """
+        old_dirs = self.dirs
+        if rel_dirs is None:
+            new_dirs = {}
+            pending = ['']
+            forced = set()
+        else:
+            tops = {rel for rel in rel_dirs if rel in old_dirs or rel == ''}
+            # 已被上层目录包含的目录无需单独刷新
+            pending = sorted(rel for rel in tops
+                             if not any(other != rel and is_under(rel, other) for other in tops))
+            forced = set(pending)
+            # 需要刷新的子树先移除，其余目录原样保留
+            new_dirs = {rel: record for rel, record in old_dirs.items()
+                        if not any(is_under(rel, top) for top in pending)}
+
+        def scan(rel):
+            return self.scan_dir(rel, None if rel in forced else old_dirs.get(rel))
+
+        scanned = set()  # 本次成功列出的目录
+        workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # 逐层并行扫描
+            while pending:
+                results = executor.map(scan, pending)
+                pending = []
+                for rel_dir, record, state in results:
+                    if state == 'ok':
+                        scanned.add(rel_dir)
+                    else:
+                        parent = rel_dir.rpartition('/')[0]
+                        if state == 'missing' and rel_dir and (
+                                parent in scanned or (rel_dir in forced and self.confirmed_missing(rel_dir))):
+                            continue
+                        # 网络盘断开、权限等暂时性错误或无法确认已删除：保留旧记录和子目录，不报告变化
+                        record = old_dirs.get(rel_dir)
+                    if record is None:
+                        continue
+                    new_dirs[rel_dir] = record
+                    pending.extend(join_rel(rel_dir, name) for name in record['subdirs'])
+
+        self.dirs = new_dirs
+        return diff_files(flatten(old_dirs), flatten(new_dirs))
+
+    def files(self):
+        """返回 {相对路径: [大小, 修改时间]}，按相对路径排序"""
+        return dict(sorted(flatten(self.dirs).items()))
+
+    def full_path(self, rel_path):
+        return str(self.root / rel_path)
+
+    def image_data(self, default_comment):
+        """生成以相对路径为键的image_data"""
+        image_data = {}
+        for rel_path in self.files():
+            image_data[rel_path] = self.image_entry(rel_path, default_comment)
+        return image_data
+
+    def image_entry(self, rel_path, default_comment):
+        """单张图片的image_data记录"""
+        parent = os.path.dirname(rel_path)
+        folder_name = os.path.basename(parent) if parent else self.root.name
+        return {
+            'full_path': self.full_path(rel_path),
+            'folder': folder_name,  # 默认使用文件夹名称
+            'folder_name': folder_name,  # 保存原始文件夹名称
+            'comment': default_comment,
+            'crop_area': None
+        }
+
+
+def join_rel(rel_dir, name):
+    return f"{rel_dir}/{name}" if rel_dir else name
+
+
+def is_under(rel_path, top):
+    """rel_path是否位于top目录之下（包括top本身）"""
+    return top == '' or rel_path == top or rel_path.startswith(top + '/')
+
+
+def flatten(dirs):
+    """把目录记录展开为 {相对路径: [大小, 修改时间]}"""
+    files = {}
+    for rel_dir, record in dirs.items():
+        for name, stat in record['files'].items():
+            files[join_rel(rel_dir, name)] = stat
+    return files
+
+
+def diff_files(old_files, new_files):
+    """对比新旧文件表；大小和修改时间相同的一删一增视为重命名/移动"""
+    changes = IndexChanges()
+    for rel_path, stat in new_files.items():
+        if rel_path not in old_files:
+            changes.added.append(rel_path)
+        elif old_files[rel_path] != stat:
+            changes.modified.append(rel_path)
+    changes.removed = [rel_path for rel_path in old_files if rel_path not in new_files]
+
+    removed_by_stat = {}
+    for rel_path in changes.removed:
+        removed_by_stat.setdefault(tuple(old_files[rel_path]), []).append(rel_path)
+    added = []
+    for rel_path in changes.added:
+        candidates = removed_by_stat.get(tuple(new_files[rel_path]))
+        if candidates and len(candidates) == 1:
+            changes.renamed.append((candidates.pop(), rel_path))
+        else:
+            added.append(rel_path)
+    renamed_from = {old for old, _ in changes.renamed}
+    changes.added = sorted(added)
+    changes.removed = sorted(rel for rel in changes.removed if rel not in renamed_from)
+    return changes
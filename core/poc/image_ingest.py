@@ -0,0 +1,418 @@
+"""
+图片批量导入
+
+从U盘/NAS导入几千张图片时，复制在后台线程中进行，界面不再卡住：
+- 有限大小的线程池并行复制，多个文件同时读写以跑满磁盘/网络带宽
+- Linux上优先使用os.copy_file_range/os.sendfile在内核中复制，其他平台使用8MB缓冲区
+- 先写入.part临时文件，完成后再重命名，取消或失败时不留下半个文件
+- 报告单个文件和整体进度，支持随时取消
+
+指定BlobStore时按内容去重：复制的同时计算哈希，每份内容在项目中只读取和保存
+一次。工位目录中的文件是它的reflink（写时复制，不占额外空间）或独立副本，不使用
+硬链接，修改某个工位中的图片不会影响其他工位和已保存的内容。同一批图片再次上传
+到其他工位时不再从U盘/NAS读取。
+
+拖入的文件夹用生成器逐层遍历，边遍历边复制，导入几十GB的采图目录不需要
+预先列出全部文件。
+"""
+import os
+import json
+import time
+import errno
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError, FIRST_COMPLETED, wait
+from pathlib import Path
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from .cache_store import source_signature
+from .image_index import IMAGE_EXTENSIONS, CACHE_DIR_NAME
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024  # 每次复制的字节数，也是进度和取消检查的粒度
+DEFAULT_INGEST_WORKERS = 4  # 并行复制的文件数
+PROGRESS_INTERVAL = 0.1  # 整体进度的最短发送间隔（秒）
+PART_SUFFIX = '.part'
+BLOB_MANIFEST_NAME = 'manifest.json'
+FICLONE = 0x40049409  # Linux reflink ioctl（btrfs/xfs等支持写时复制的文件系统）
+
+# 内核复制不可用（跨文件系统、旧内核、不支持的文件系统）时退回到缓冲区复制
+FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+
+
+class IngestCancelled(Exception):
+    pass
+
+
+def kernel_copy(fsrc, fdst, size, progress, cancel_event):
+    """用copy_file_range/sendfile在内核中复制，都不可用时返回False"""
+    in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+    for name in ('copy_file_range', 'sendfile'):
+        copy = getattr(os, name, None)
+        if copy is None:
+            continue
+        copied = 0
+        try:
+            while copied < size:
+                if cancel_event.is_set():
+                    raise IngestCancelled()
+                count = min(COPY_CHUNK_SIZE, size - copied)
+                if name == 'copy_file_range':
+                    sent = copy(in_fd, out_fd, count)
+                else:
+                    sent = copy(out_fd, in_fd, copied, count)
+                if sent == 0:
+                    break
+                copied += sent
+                progress(copied)
+            return True
+        except OSError as e:
+            if copied or e.errno not in FALLBACK_ERRNOS:
+                raise
+    return False
+
+
+def buffered_copy(fsrc, fdst, progress, cancel_event):
+    buffer = bytearray(COPY_CHUNK_SIZE)
+    view = memoryview(buffer)
+    copied = 0
+    while True:
+        if cancel_event.is_set():
+            raise IngestCancelled()
+        count = fsrc.readinto(buffer)
+        if not count:
+            break
+        fdst.write(view[:count])
+        copied += count
+        progress(copied)
+
+
+def copy_file(source, target, progress=None, cancel_event=None):
+    """复制一个文件（保留修改时间等元数据），返回复制的字节数"""
+    progress = progress or (lambda copied: None)
+    cancel_event = cancel_event or threading.Event()
+    size = os.path.getsize(source)
+    part_path = target + PART_SUFFIX
+    try:
+        with open(source, 'rb') as fsrc, open(part_path, 'wb') as fdst:
+            if not (size and kernel_copy(fsrc, fdst, size, progress, cancel_event)):
+                buffered_copy(fsrc, fdst, progress, cancel_event)
+        shutil.copystat(source, part_path)
+        os.replace(part_path, target)
+    except BaseException:
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        raise
+    return size
+
+
+def reflink(source, target):
+    """创建写时复制的副本，文件系统不支持时返回False"""
+    if fcntl is None:
+        return False
+    try:
+        with open(source, 'rb') as fsrc, open(target, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except OSError:
+        try:
+            os.remove(target)
+        except OSError:
+            pass
+        return False
+
+
+def same_stat(path, other):
+    """两个文件的大小和修改时间是否相同（任一不存在时为False）"""
+    try:
+        stat, other_stat = os.stat(path), os.stat(other)
+    except OSError:
+        return False
+    return (stat.st_size, stat.st_mtime_ns) == (other_stat.st_size, other_stat.st_mtime_ns)
+
+
+def link_file(source, target, cancel_event=None):
+    """把source放到target：优先reflink，文件系统不支持时用copy_file复制；两者都与source互相独立"""
+    part_path = target + PART_SUFFIX
+    if os.path.exists(part_path):
+        os.remove(part_path)
+    if reflink(source, part_path):
+        shutil.copystat(source, part_path)
+        os.replace(part_path, target)
+    else:
+        copy_file(source, target, cancel_event=cancel_event)
+
+
+class BlobStore:
+    """项目内按内容寻址的图片存储，manifest记录每个工位的文件对应的内容哈希"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.manifest_path = self.root / BLOB_MANIFEST_NAME
+        self.stations = {}  # {工位: {文件名: 内容哈希}}
+        self.sources = {}  # {源文件签名: 内容哈希}，重复导入同一文件时不再读取
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            if self.manifest_path.exists():
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.stations = data.get('stations', {})
+                self.sources = data.get('sources', {})
+        except Exception as e:
+            print(f"Error loading blob manifest: {str(e)}")
+        return self
+
+    def save(self):
+        """原子写入manifest"""
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                data = {'stations': self.stations, 'sources': self.sources}
+                tmp_path = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.manifest_path)
+        except Exception as e:
+            print(f"Error saving blob manifest: {str(e)}")
+
+    def blob_path(self, digest, suffix):
+        return self.root / digest[:2] / (digest + suffix.lower())
+
+    def ingest(self, source, target, station, progress=None, cancel_event=None):
+        """导入一个文件到工位目录，返回 (内容哈希, 是否复用了已有内容)"""
+        progress = progress or (lambda copied: None)
+        cancel_event = cancel_event or threading.Event()
+        suffix = os.path.splitext(source)[1]
+        signature = source_signature(source)
+        with self._lock:
+            digest = self.sources.get(signature)
+        blob = self.blob_path(digest, suffix) if digest else None
+        reused = blob is not None and blob.exists()
+        if not reused:
+            digest, blob, reused = self.store(source, suffix, progress, cancel_event)
+        else:
+            progress(os.path.getsize(source))
+        name = os.path.basename(target)
+        with self._lock:
+            placed = self.stations.get(station, {}).get(name) == digest
+        # 同一内容已经放到该工位且文件未被修改时不再复制
+        if not (placed and same_stat(target, blob)):
+            link_file(str(blob), target, cancel_event)
+        with self._lock:
+            self.sources[signature] = digest
+            self.stations.setdefault(station, {})[name] = digest
+        return digest, reused
+
+    def store(self, source, suffix, progress, cancel_event):
+        """边复制边计算哈希，内容已存在时丢弃副本"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        part_path = self.root / f"{threading.get_ident()}{PART_SUFFIX}"
+        sha1 = hashlib.sha1()
+        buffer = bytearray(COPY_CHUNK_SIZE)
+        view = memoryview(buffer)
+        copied = 0
+        try:
+            with open(source, 'rb') as fsrc, open(part_path, 'wb') as fdst:
+                while True:
+                    if cancel_event.is_set():
+                        raise IngestCancelled()
+                    count = fsrc.readinto(buffer)
+                    if not count:
+                        break
+                    sha1.update(view[:count])
+                    fdst.write(view[:count])
+                    copied += count
+                    progress(copied)
+            digest = sha1.hexdigest()
+            blob = self.blob_path(digest, suffix)
+            if blob.exists():
+                os.remove(part_path)
+                return digest, blob, True
+            shutil.copystat(source, part_path)
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(part_path, blob)
+            return digest, blob, False
+        except BaseException:
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            raise
+
+    def remove_station(self, station):
+        """移除工位的记录，并删除不再被任何工位引用的内容"""
+        with self._lock:
+            self.stations.pop(station, None)
+            referenced = {digest for files in self.stations.values() for digest in files.values()}
+            self.sources = {sig: digest for sig, digest in self.sources.items() if digest in referenced}
+        if self.root.exists():
+            for blob in self.root.glob('??/*'):
+                if blob.stem not in referenced:
+                    try:
+                        os.remove(blob)
+                    except OSError as e:
+                        print(f"Error removing blob {blob}: {str(e)}")
+        self.save()
+
+
+def walk_images(path):
+    """惰性遍历目录树中的图片文件（跳过隐藏目录和缓存目录）"""
+    stack = [path]
+    while stack:
+        dir_path = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"Error scanning {dir_path}: {str(e)}")
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name != CACHE_DIR_NAME and not entry.name.startswith('.'):
+                    subdirs.append(entry.path)
+            elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                yield entry.path
+        stack.extend(reversed(subdirs))
+
+
+def station_import_jobs(paths, stations_root, default_station, stations):
+    """把拖入的文件/文件夹映射到工位，惰性生成 (源路径, 目标路径, 工位)
+
+    单独的文件导入default_station；文件夹中的图片按目录名归入工位：从图片所在目录
+    向上找与已有工位同名的目录，找不到时使用图片所在目录的名称。工位目录下更深层
+    的图片以子目录名为前缀，同一批中重名的文件加序号，避免互相覆盖。
+    """
+    stations = set(stations)
+    used = set()
+
+    def unique_target(station, name):
+        target = os.path.join(stations_root, station, name)
+        stem, ext = os.path.splitext(target)
+        index = 1
+        while target in used:
+            target = f"{stem}_{index}{ext}"
+            index += 1
+        used.add(target)
+        return target
+
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            base = os.path.dirname(path)
+            for source in walk_images(path):
+                parts = os.path.relpath(source, base).split(os.sep)
+                dirs = parts[:-1]
+                anchor = next((i for i in range(len(dirs) - 1, -1, -1) if dirs[i] in stations),
+                              len(dirs) - 1)
+                station = dirs[anchor]
+                yield source, unique_target(station, '_'.join(parts[anchor + 1:])), station
+        elif default_station and os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+            yield path, unique_target(default_station, os.path.basename(path)), default_station
+
+
+class IngestWorker(QThread):
+    """在后台并行复制 (源路径, 目标路径[, 工位])
+
+    jobs可以是生成器：边遍历边复制，同时在途的文件数有上限，不需要预先列出全部文件。
+    """
+    file_progress = pyqtSignal(str, object, object)  # 源路径, 已复制字节, 文件大小
+    progress = pyqtSignal(int, int, object, object)  # 已完成文件数, 总文件数（仍在遍历时为0）, 已复制字节, 已发现的总字节
+    file_done = pyqtSignal(str, str, str)  # 源路径, 目标路径, 工位
+    file_failed = pyqtSignal(str, str)  # 源路径, 错误信息
+    ingest_finished = pyqtSignal(int, int, bool)  # 成功数, 失败数, 是否被取消
+
+    def __init__(self, jobs, max_workers=DEFAULT_INGEST_WORKERS, blob_store=None, station=None):
+        super().__init__()
+        self.jobs = jobs
+        self.max_workers = max_workers
+        self.blob_store = blob_store  # 指定时按内容去重导入
+        self.station = station  # jobs中未指定工位时使用
+        self.reused = 0  # 内容已存在、直接链接的文件数
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._copied = 0  # 已复制字节
+        self._total_bytes = 0  # 已发现文件的总字节
+        self._last_emit = 0.0
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        jobs = iter(self.jobs)
+        discovered = done = failed = 0
+        exhausted = False
+
+        def report(force=False):
+            now = time.monotonic()
+            if force or now - self._last_emit >= PROGRESS_INTERVAL:
+                self._last_emit = now
+                with self._lock:
+                    copied, total_bytes = self._copied, self._total_bytes
+                self.progress.emit(done + failed, discovered if exhausted else 0, copied, total_bytes)
+
+        def copy_job(source, target, station):
+            size = os.path.getsize(source)
+            last = 0
+            with self._lock:
+                self._total_bytes += size
+
+            def on_progress(copied):
+                nonlocal last
+                with self._lock:
+                    self._copied += copied - last
+                last = copied
+                self.file_progress.emit(source, copied, size)
+                report()
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if self.blob_store is None:
+                return copy_file(source, target, on_progress, self._cancel)
+            _, reused = self.blob_store.ingest(source, target, station, on_progress, self._cancel)
+            if reused:
+                with self._lock:
+                    self.reused += 1
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = {}  # {future: (源路径, 目标路径, 工位)}
+            while True:
+                # 在途任务不超过线程数的两倍，遍历随复制进度推进
+                while not exhausted and not self._cancel.is_set() and len(in_flight) < self.max_workers * 2:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                        break
+                    source, target, *rest = job
+                    station = rest[0] if rest else self.station
+                    discovered += 1
+                    in_flight[executor.submit(copy_job, source, target, station)] = (source, target, station)
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    source, target, station = in_flight.pop(future)
+                    try:
+                        future.result()
+                        done += 1
+                        self.file_done.emit(source, target, station)
+                    except (IngestCancelled, CancelledError):
+                        pass
+                    except Exception as e:
+                        failed += 1
+                        print(f"Error importing {source}: {str(e)}")
+                        self.file_failed.emit(source, str(e))
+                if self._cancel.is_set():
+                    for pending in in_flight:
+                        pending.cancel()
+                report(force=True)
+        if self.blob_store is not None:
+            self.blob_store.save()
+        self.ingest_finished.emit(done, failed, self._cancel.is_set())
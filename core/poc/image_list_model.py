@@ -0,0 +1,162 @@
+"""
+图片列表模型
+
+以相对路径数组为后端的QAbstractListModel：不为每张图片创建列表项，
+data()按需返回显示文本，行通过fetchMore分批暴露给视图，
+十万张图片的项目也能立即打开。设置缩略图服务后，只为视图实际绘制的行
+请求缩略图。
+"""
+from pathlib import Path
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+from PyQt5.QtGui import QIcon, QPixmap
+
+FETCH_BATCH_SIZE = 1000  # 每次fetchMore暴露的行数
+
+
+class ImageListModel(QAbstractListModel):
+    def __init__(self, parent=None, batch_size=FETCH_BATCH_SIZE):
+        super().__init__(parent)
+        self.batch_size = batch_size
+        self.keys = []  # 图片相对路径
+        self.loaded = 0  # 已暴露给视图的行数
+        self._rows = None  # {相对路径: 行号}，按需重建
+        self.thumbnails = None  # ThumbnailService
+        self.root = None  # 图片根目录，相对路径相对于该目录
+        self.icon_size = 0
+        self.placeholder = None  # 缩略图生成前的占位图，保证行高一致
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.loaded:
+            return None
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self.keys[index.row()]
+        if role == Qt.DecorationRole and self.thumbnails is not None:
+            image = self.thumbnails.request(str(self.root / self.keys[index.row()]), self.icon_size)
+            if image is None or image.isNull():
+                return self.placeholder
+            return QIcon(QPixmap.fromImage(image))
+        return None
+
+    def set_thumbnails(self, service, root, icon_size):
+        """为列表项显示缩略图，service为None时只显示文字"""
+        if self.thumbnails is not None:
+            self.thumbnails.thumbnail_ready.disconnect(self.on_thumbnail_ready)
+        self.thumbnails = service
+        self.root = Path(root) if root else None
+        self.icon_size = icon_size
+        placeholder = QPixmap(icon_size, icon_size)
+        placeholder.fill(Qt.transparent)
+        self.placeholder = QIcon(placeholder)
+        if service is not None:
+            service.thumbnail_ready.connect(self.on_thumbnail_ready)
+
+    def on_thumbnail_ready(self, path, size, image):
+        if image is None or image.isNull():
+            return
+        try:
+            key = Path(path).relative_to(self.root).as_posix()
+        except ValueError:
+            return
+        row = self.row_of(key)
+        if 0 <= row < self.loaded:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def invalidate_thumbnails(self, keys):
+        """图片被覆盖后丢弃旧缩略图，已暴露的行重新请求"""
+        if self.thumbnails is None:
+            return
+        for key in keys:
+            self.thumbnails.invalidate(self.root / key)
+            row = self.row_of(key)
+            if 0 <= row < self.loaded:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < len(self.keys)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.batch_size, len(self.keys) - self.loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def set_keys(self, keys):
+        """整体替换图片列表"""
+        self.beginResetModel()
+        self.keys = list(keys)
+        self.loaded = 0
+        self._rows = None
+        self.endResetModel()
+
+    def key(self, row):
+        """返回指定行的相对路径"""
+        if 0 <= row < len(self.keys):
+            return self.keys[row]
+        return None
+
+    def row_of(self, key):
+        """返回相对路径所在的行，不存在时返回-1"""
+        if self._rows is None:
+            self._rows = {k: row for row, k in enumerate(self.keys)}
+        return self._rows.get(key, -1)
+
+    def ensure_loaded(self, row):
+        """确保指定行已暴露给视图（用于跳转到尚未加载的行）"""
+        while row >= self.loaded and self.canFetchMore():
+            self.fetchMore()
+
+    def append_keys(self, keys):
+        """在末尾追加图片；尚未加载完时只追加到数组，由fetchMore暴露"""
+        keys = [k for k in keys if self.row_of(k) < 0]
+        if not keys:
+            return
+        start = len(self.keys)
+        if self.loaded == start:
+            self.beginInsertRows(QModelIndex(), start, start + len(keys) - 1)
+            self.keys.extend(keys)
+            self.loaded += len(keys)
+            self.endInsertRows()
+        else:
+            self.keys.extend(keys)
+        for offset, k in enumerate(keys):
+            self._rows[k] = start + offset
+
+    def remove_keys(self, keys):
+        """删除一批图片，连续的行合并为一次删除"""
+        rows = sorted((self.row_of(k) for k in keys), reverse=True)
+        rows = [row for row in rows if row >= 0]
+        while rows:
+            last = first = rows.pop(0)
+            while rows and rows[0] == first - 1:
+                first = rows.pop(0)
+            if first < self.loaded:
+                visible_last = min(last, self.loaded - 1)
+                self.beginRemoveRows(QModelIndex(), first, visible_last)
+                del self.keys[first:last + 1]
+                self.loaded -= visible_last - first + 1
+                self.endRemoveRows()
+            else:
+                del self.keys[first:last + 1]
+        self._rows = None
+
+    def rename_key(self, old_key, new_key):
+        """重命名图片，保持所在行不变"""
+        row = self.row_of(old_key)
+        if row < 0:
+            self.append_keys([new_key])
+            return
+        self.keys[row] = new_key
+        del self._rows[old_key]
+        self._rows[new_key] = row
+        if row < self.loaded:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
@@ -0,0 +1,166 @@
+"""
+PPT图片预处理
+
+在组装幻灯片之前，用进程池并行读取原图/裁剪图的尺寸，并按嵌入策略把图片
+缩小到幻灯片实际显示的分辨率（高3英寸）后重新压缩，使报告生成随CPU核数
+扩展，同时避免把几十MB的原图原样塞进PPT。
+"""
+import os
+import hashlib
+import multiprocessing
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from PIL import Image
+
+from .cache_store import source_signature
+
+DISPLAY_HEIGHT_INCHES = 3  # 幻灯片中图片的显示高度
+DEFAULT_TARGET_DPI = 220
+
+
+@dataclass
+class EmbedPolicy:
+    target_dpi: int = DEFAULT_TARGET_DPI
+    image_format: str = 'JPEG'  # 原图压缩格式：JPEG（有损）或 PNG（无损）
+    quality: int = 85  # JPEG压缩质量
+    lossless_crops: bool = True  # 裁剪图使用无损PNG，保留缺陷细节
+
+    @property
+    def max_height(self):
+        """幻灯片显示高度对应的像素数"""
+        return target_height_px(self.target_dpi)
+
+    def signature(self):
+        """策略签名，参与缓存文件命名"""
+        return f"{self.target_dpi}|{self.image_format}|{self.quality}|{self.lossless_crops}"
+
+
+@dataclass
+class PreparedImage:
+    source: str = ""
+    path: str = ""  # 实际嵌入PPT的文件（无需处理时即为原文件）
+    size: tuple = (0, 0)  # 原图尺寸 (宽, 高)
+    error: str = ""
+
+
+def target_height_px(dpi=DEFAULT_TARGET_DPI, height_inches=DISPLAY_HEIGHT_INCHES):
+    """计算幻灯片显示高度对应的像素数"""
+    return int(round(dpi * height_inches))
+
+
+def prepared_name(source, signature):
+    """根据源文件路径、修改时间、大小和嵌入策略生成稳定的缓存文件名（与缩略图缓存使用同一签名）"""
+    key = f"{source_signature(source)}|{signature}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def output_format(source_format, policy, lossless):
+    """确定嵌入格式：无损时保留PNG（JPEG源不再转成更大的PNG），否则按策略压缩"""
+    if lossless or policy.image_format == 'PNG':
+        return 'JPEG' if source_format == 'JPEG' else 'PNG'
+    return 'JPEG'
+
+
+def to_saveable(img, fmt):
+    """转换为目标格式可保存的色彩模式，JPEG的透明通道合成到白底"""
+    if fmt == 'JPEG':
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel('A'))
+            return background
+        if img.mode not in ('RGB', 'L'):
+            return img.convert('L' if img.mode.startswith('I') else 'RGB')
+    elif img.mode.startswith('I') or img.mode == 'F':
+        return img.convert('L')
+    return img
+
+
+def prepare_image(source, output_dir, policy, lossless=False):
+    """读取图片尺寸，按嵌入策略缩小并重新压缩后保存到output_dir"""
+    try:
+        with Image.open(source) as img:
+            size = img.size
+            max_height = policy.max_height
+            fmt = output_format(img.format, policy, lossless)
+            # 已经足够小且格式一致时直接嵌入原文件
+            if img.height <= max_height and img.format == fmt:
+                return PreparedImage(source=source, path=source, size=size)
+
+            suffix = '.jpg' if fmt == 'JPEG' else '.png'
+            signature = f"{policy.signature()}|{lossless}"
+            output_path = Path(output_dir) / (prepared_name(source, signature) + suffix)
+            if not output_path.exists():
+                if img.height > max_height:
+                    target_width = max(1, int(round(img.width * max_height / img.height)))
+                    # thumbnail会对JPEG使用draft模式，只解码需要的分辨率
+                    img.thumbnail((target_width, max_height), Image.LANCZOS)
+                out = to_saveable(img, fmt)
+                tmp_path = output_path.with_suffix(suffix + '.tmp')
+                if fmt == 'JPEG':
+                    quality = 95 if lossless else policy.quality
+                    out.save(tmp_path, 'JPEG', quality=quality, optimize=True)
+                else:
+                    out.save(tmp_path, 'PNG')
+                os.replace(tmp_path, output_path)
+            return PreparedImage(source=source, path=str(output_path), size=size)
+    except Exception as e:
+        return PreparedImage(source=source, path=source, error=str(e))
+
+
+def prune_prepared(output_dir, jobs, policy):
+    """删除jobs不再引用的预处理图片（原图已变化或删除、嵌入策略已改变），返回删除的数量"""
+    keep = set()
+    for source, lossless in jobs:
+        try:
+            keep.add(prepared_name(source, f"{policy.signature()}|{lossless}"))
+        except OSError:
+            continue
+    removed = 0
+    try:
+        with os.scandir(output_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.split('.', 1)[0] not in keep:
+                    os.remove(entry.path)
+                    removed += 1
+    except OSError as e:
+        print(f"Error pruning prepared images: {str(e)}")
+    return removed
+
+
+def prepare_images(jobs, output_dir, policy, max_workers=None,
+                   progress_callback=None, cancel_check=None):
+    """并行预处理多张图片
+
+    jobs为 (源路径, 是否无损) 序列，返回 {源路径: PreparedImage}。
+    progress_callback(done, total) 每完成一张调用一次；cancel_check() 返回True时
+    取消尚未开始的任务并立即返回已完成的部分。
+    """
+    jobs = list(dict(jobs).items())  # 去重并保持顺序
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    results = {}
+    if len(jobs) < 2 or max_workers == 1:
+        for done, (src, lossless) in enumerate(jobs, start=1):
+            results[src] = prepare_image(src, output_dir, policy, lossless)
+            if progress_callback:
+                progress_callback(done, len(jobs))
+            if cancel_check and cancel_check():
+                break
+        return results
+
+    # 调用方是带有解码/缩略图线程池的GUI进程，fork可能复制其他线程持有的锁导致死锁，统一使用spawn
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [executor.submit(prepare_image, src, output_dir, policy, lossless)
+                   for src, lossless in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            item = future.result()
+            results[item.source] = item
+            if progress_callback:
+                progress_callback(done, len(jobs))
+            if cancel_check and cancel_check():
+                for pending in futures:
+                    pending.cancel()
+                break
+    return results
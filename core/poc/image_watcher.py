@@ -0,0 +1,107 @@
+"""
+项目图片目录监视
+
+用QFileSystemWatcher（Linux下基于inotify）监视索引中的所有目录，目录发生变化时
+只刷新这些目录，并把一段时间内的变化合并成一批发出；监视不可用或目录过多
+（超出系统监视数量限制）时退化为定时轮询。
+"""
+from PyQt5.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+
+from .image_index import is_under
+
+COALESCE_MS = 500  # 合并变化的时间窗口
+POLL_INTERVAL_MS = 5000  # 轮询模式下的刷新间隔
+
+
+class ImageFolderWatcher(QObject):
+    images_changed = pyqtSignal(object)  # IndexChanges
+
+    def __init__(self, image_index, parent=None, coalesce_ms=COALESCE_MS,
+                 poll_interval_ms=POLL_INTERVAL_MS):
+        super().__init__(parent)
+        self.image_index = image_index
+        self.dirty_dirs = set()
+        self.index_dirty = False  # 索引有未保存的变化
+        self.polling = False
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(coalesce_ms)
+        self.flush_timer.timeout.connect(self.flush)
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(poll_interval_ms)
+        self.poll_timer.timeout.connect(self.poll)
+
+    def start(self):
+        """开始监视索引中的全部目录"""
+        self.sync_watched_dirs()
+
+    def stop(self):
+        """停止监视，并保存索引的未保存变化"""
+        self.flush_timer.stop()
+        self.poll_timer.stop()
+        watched = self.watcher.directories()
+        if watched:
+            self.watcher.removePaths(watched)
+        if self.index_dirty:
+            self.image_index.save()
+            self.index_dirty = False
+
+    def sync_watched_dirs(self):
+        """让监视列表与索引中的目录保持一致"""
+        wanted = {self.image_index.full_path(rel) if rel else str(self.image_index.root)
+                  for rel in self.image_index.dirs}
+        watched = set(self.watcher.directories())
+        stale = watched - wanted
+        if stale:
+            self.watcher.removePaths(list(stale))
+        new_paths = wanted - watched
+        if new_paths:
+            failed = self.watcher.addPaths(sorted(new_paths))
+            if failed:
+                self.start_polling()
+
+    def start_polling(self):
+        """监视不可用时改为定时轮询（启动时或之后新建的目录无法监视时）"""
+        self.polling = True
+        if not self.poll_timer.isActive():
+            print("File system watcher unavailable, falling back to polling")
+            self.poll_timer.start()
+
+    def rel_dir(self, path):
+        """把监视器报告的绝对路径转换为索引中的相对目录"""
+        root = str(self.image_index.root)
+        if path == root:
+            return ''
+        return path[len(root) + 1:].replace('\\', '/')
+
+    def on_directory_changed(self, path):
+        self.dirty_dirs.add(self.rel_dir(path))
+        # 固定时间窗口：持续拷贝大量文件时也能按批次刷新，而不是等到拷贝结束
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        """刷新一批发生变化的目录并发出变化"""
+        dirty = self.dirty_dirs
+        self.dirty_dirs = set()
+        # 已被删除的目录由其上层目录的刷新处理
+        rel_dirs = [rel for rel in dirty
+                    if rel in self.image_index.dirs
+                    and not any(other != rel and is_under(rel, other) for other in dirty)]
+        if rel_dirs:
+            self.apply(self.image_index.refresh(rel_dirs))
+
+    def poll(self):
+        """轮询模式：按目录修改时间增量刷新整个索引"""
+        self.apply(self.image_index.refresh())
+
+    def apply(self, changes):
+        self.sync_watched_dirs()
+        if changes:
+            self.index_dirty = True
+            self.images_changed.emit(changes)
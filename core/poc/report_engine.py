@@ -0,0 +1,619 @@
+"""
+无界面PPT报告生成引擎
+
+不依赖QApplication，可在无显示环境的Linux服务器上批量生成POC报告：
+    python -m core.poc.report_engine <项目目录> [--template 模板] [--output 输出文件]
+"""
+import os
+import sys
+import re
+import copy
+import time
+import argparse
+import multiprocessing
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches, Pt
+from utils.path_utils import get_resource_path
+from core.poc.image_prep import EmbedPolicy, prepare_images, prune_prepared
+from core.poc.image_index import ImageIndex, CACHE_DIR_NAME
+from core.poc.deck_manifest import DeckManifest
+from core.poc.cache_store import materialize_crop, CROP_DIR_NAME
+from core.poc.annotation_store import load_legacy_records
+from core.poc.annotation_db import AnnotationDB, ANNOTATION_DB_NAME
+from core.poc.template_cache import (get_template_info, template_signature,
+                                     SLIDE_LAYOUT_INDEX)
+
+DEFAULT_COMMENT = "评估结论：1.成像清晰，检测无风险；2.可以通过控制阀值完成允收"
+RECORD_FILE_NAME = 'crop_records.json'
+MANIFEST_FILE_NAME = 'report_manifest.json'
+SHARD_MANIFEST_DIR_NAME = 'shard_manifests'
+PREPARED_DIR_NAME = 'prepared'
+PARTIAL_SUFFIX = '.partial.pptx'
+SPLIT_NONE = 'none'  # 输出单个PPT
+SPLIT_FOLDER = 'folder'  # 每个缺陷文件夹一个PPT
+SPLIT_COUNT = 'count'  # 每N张幻灯片一个PPT
+DEFAULT_SHARD_SIZE = 200
+DEFAULT_CHECKPOINT_INTERVAL = 60  # 两次检查点之间的最短间隔（秒）
+CHECKPOINT_SPACING = 10  # 检查点间隔至少为上一次保存耗时的倍数，保存开销不超过总时间的约1/10
+INDEX_LINKS_PER_SLIDE = 12
+
+
+def scan_image_data(root_path, default_comment=DEFAULT_COMMENT):
+    """扫描项目路径下的所有图片，返回以相对路径为键的image_data
+
+    使用持久化的图片索引，只重新列出发生变化的目录。
+    """
+    index = ImageIndex(root_path).load()
+    index.refresh()
+    index.save()
+    return index.image_data(default_comment)
+
+
+def load_crop_records(record_file):
+    """读取标注记录，文件不存在时返回空字典
+
+    同目录下已有导入完成的annotations.db时以数据库为准，否则读取crop_records.json
+    并重放尚未合并的日志。
+    """
+    db_path = Path(record_file).with_name(ANNOTATION_DB_NAME)
+    if db_path.exists():
+        db = AnnotationDB(db_path).connect()
+        try:
+            if not db.needs_migration():
+                return db.all_records()
+        finally:
+            db.close()
+    return load_legacy_records(record_file)
+
+
+def match_crop_records(image_data, records):
+    """把裁剪记录对应到image_data中的图片，生成 (图片键, 记录)（只包含已扫描到的图片）
+
+    旧版本记录以文件名为键，文件名在项目中唯一时按文件名匹配到相对路径。
+    """
+    by_name = {}
+    for key in image_data:
+        by_name.setdefault(os.path.basename(key), []).append(key)
+    for img_name, data in records.items():
+        if img_name not in image_data:
+            candidates = by_name.get(img_name, [])
+            if len(candidates) != 1 or candidates[0] in records:
+                continue
+            img_name = candidates[0]
+        yield img_name, data
+
+
+def merge_crop_records(image_data, records):
+    """将裁剪记录合并到image_data中（只更新已扫描到的图片）"""
+    for img_name, data in match_crop_records(image_data, records):
+        image_data[img_name].update(data)
+    return image_data
+
+
+def partial_output_path(output_path):
+    """检查点文件路径：<输出文件名>.partial.pptx"""
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.stem + PARTIAL_SUFFIX)
+
+
+def split_image_data(image_data, mode, shard_size=DEFAULT_SHARD_SIZE):
+    """按缺陷文件夹或固定张数把image_data拆分为多个分片，返回 {分片名: 子image_data}"""
+    shards = {}
+    if mode == SPLIT_FOLDER:
+        for key, data in image_data.items():
+            shards.setdefault(data.get('folder_name') or '未分类', {})[key] = data
+    else:
+        items = list(image_data.items())
+        for start in range(0, len(items), shard_size):
+            shards[f"第{start // shard_size + 1}部分"] = dict(items[start:start + shard_size])
+    return shards
+
+
+def safe_file_name(name):
+    """去掉文件名中不允许的字符"""
+    return re.sub(r'[\\/:*?"<>|\s]+', '_', name).strip('_') or 'untitled'
+
+
+def default_output_path(project_root):
+    """生成默认输出文件路径：<项目名>_Report_<时间戳>.pptx"""
+    project_root = Path(project_root)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return project_root / f"{project_root.name}_Report_{timestamp}.pptx"
+
+
+class ReportEngine:
+    """根据image_data和PPT模板生成报告，不依赖任何Qt组件"""
+
+    def __init__(self, template_path, default_comment=DEFAULT_COMMENT,
+                 policy=None, prep_dir=None, max_workers=None, checkpoint_interval=0, crop_dir=None):
+        self.template_path = str(template_path)
+        self.default_comment = default_comment
+        self.policy = policy or EmbedPolicy()  # 图片嵌入策略（分辨率/压缩）
+        self.prep_dir = prep_dir  # 预处理图片目录，None时使用临时目录
+        self.crop_dir = crop_dir  # 裁剪图缓存目录，缺失的裁剪图按crop_area重新生成到这里
+        self.max_workers = max_workers
+        self.checkpoint_interval = checkpoint_interval  # 每隔N秒保存一次检查点，0为只在取消时保存
+        self.template_info = None  # 模板分析结果，随引擎一起传给分片进程
+
+    def load_template(self):
+        """获取模板分析结果，模板文件未变化时复用已有结果"""
+        if not os.path.exists(self.template_path):
+            raise FileNotFoundError(f"未找到模板文件: {self.template_path}")
+        if (self.template_info is None or self.template_info.signature
+                != template_signature(self.template_path, SLIDE_LAYOUT_INDEX)):
+            self.template_info = get_template_info(self.template_path, SLIDE_LAYOUT_INDEX)
+        return self.template_info
+
+    def restore_crops(self, image_data):
+        """裁剪图文件缺失（被淘汰或删除）但记录了crop_area时，从原图重新生成"""
+        if not self.crop_dir:
+            return
+        missing = [data for data in image_data.values()
+                   if data.get('crop_area') and not (data.get('cache_path')
+                                                     and os.path.exists(data['cache_path']))]
+        if not missing:
+            return
+
+        def restore(data):
+            try:
+                data['cache_path'] = materialize_crop(data['full_path'], data['crop_area'], self.crop_dir)
+            except Exception as e:
+                print(f"Error restoring crop for {data['full_path']}: {str(e)}")
+                data['cache_path'] = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(restore, missing))
+        print(f"Restored {len(missing)} crops from crop_area")
+
+    def prepare_jobs(self, image_data):
+        """预处理任务：(源路径, 是否无损)，包括原图和裁剪图"""
+        jobs = []
+        for data in image_data.values():
+            jobs.append((data['full_path'], False))
+            cache_path = data.get('cache_path')
+            if cache_path and os.path.exists(cache_path):
+                jobs.append((cache_path, self.policy.lossless_crops))
+        return jobs
+
+    def prepare(self, image_data, prep_dir, progress_callback=None, cancel_check=None):
+        """并行预处理所有原图和裁剪图，返回 {源路径: PreparedImage}"""
+        return prepare_images(self.prepare_jobs(image_data), prep_dir, self.policy,
+                              max_workers=self.max_workers,
+                              progress_callback=progress_callback, cancel_check=cancel_check)
+
+    def prune_prepared(self, image_data):
+        """生成完成后删除本次报告不再引用的预处理图片（使用持久化的预处理目录时）"""
+        if self.prep_dir and os.path.isdir(self.prep_dir):
+            return prune_prepared(self.prep_dir, self.prepare_jobs(image_data), self.policy)
+        return 0
+
+    def generate(self, image_data, output_path, progress_callback=None, manifest_path=None,
+                 prepare_callback=None, cancel_check=None):
+        """生成PPT并保存到output_path，返回输出路径
+
+        progress_callback(done, total) 在每张幻灯片完成后调用，
+        prepare_callback(done, total) 在每张图片预处理完成后调用。
+        指定manifest_path时增量生成：以上一次的PPT（或中断时的检查点）为基础，
+        只重建输入变化的幻灯片。cancel_check() 返回True时保存检查点并抛出GenerationCancelled。
+        """
+        template = self.load_template()
+        self.restore_crops(image_data)
+        manifest = DeckManifest.load(manifest_path) if manifest_path else None
+        plan = self.plan_slides(image_data, manifest)
+        base_deck = manifest.deck_path if plan.reusable else None
+        checkpoint_path = partial_output_path(output_path)
+
+        if plan.reusable:
+            prs = Presentation(base_deck)
+            # 清单之外的幻灯片（例如上一次生成失败残留的半成品）直接删除，模板自带的幻灯片保留
+            known = {entry['slide_id'] for entry in manifest.slides.values()}
+            known.update(template.slide_ids)
+            for slide in list(prs.slides):
+                if slide.slide_id not in known:
+                    remove_slide(prs, slide)
+            slides_by_id = {slide.slide_id: slide for slide in prs.slides}
+            # 旧PPT中已找不到的幻灯片需要重建
+            for key, entry in plan.items():
+                if entry is not None and entry['slide_id'] not in slides_by_id:
+                    plan[key] = None
+        else:
+            prs = template.open()
+            slides_by_id = {}
+
+        with tempfile.TemporaryDirectory(prefix='vsa_prep_') as tmp_dir:
+            # 先并行完成需要重建的图片预处理，再串行组装幻灯片
+            to_build = {key: image_data[key] for key, entry in plan.items() if entry is None}
+            prepared = self.prepare(to_build, self.prep_dir or tmp_dir,
+                                    progress_callback=prepare_callback, cancel_check=cancel_check)
+            if cancel_check and cancel_check():
+                raise GenerationCancelled("PPT生成已取消")
+
+            # 删除已不存在或需要重建的旧幻灯片
+            for key, entry in plan.stale.items():
+                if entry['slide_id'] in slides_by_id:
+                    remove_slide(prs, slides_by_id.pop(entry['slide_id']))
+
+            records = {}
+            total = len(image_data)
+            # 每次检查点都要完整保存一遍PPT，耗时随幻灯片数增加；按时间间隔保存，
+            # 且间隔不短于上一次保存耗时的CHECKPOINT_SPACING倍，总开销随PPT大小线性增长
+            last_checkpoint = time.monotonic()
+            checkpoint_wait = self.checkpoint_interval
+            for done, (img_name, data) in enumerate(image_data.items(), start=1):
+                try:
+                    entry = plan[img_name]
+                    if entry is None:
+                        slide, title_shape, comment_shape = self.add_image_slide(prs, data, prepared)
+                        entry = {
+                            'slide_id': slide.slide_id,
+                            'title_shape': title_shape.shape_id,
+                            'comment_shape': comment_shape.shape_id
+                        }
+                    else:
+                        self.update_slide_text(slides_by_id[entry['slide_id']], entry, data)
+                    entry.update(plan.fingerprints.get(img_name, {}))
+                    records[img_name] = entry
+                except Exception as e:
+                    print(f"Error processing {img_name}: {str(e)}")
+                if progress_callback:
+                    progress_callback(done, total)
+
+                cancelled = bool(cancel_check and cancel_check())
+                if cancelled or (self.checkpoint_interval and done < total
+                                 and time.monotonic() - last_checkpoint >= checkpoint_wait):
+                    started = time.monotonic()
+                    self.save_checkpoint(prs, checkpoint_path, manifest, plan, records)
+                    last_checkpoint = time.monotonic()
+                    checkpoint_wait = max(self.checkpoint_interval,
+                                          (last_checkpoint - started) * CHECKPOINT_SPACING)
+                if cancelled:
+                    raise GenerationCancelled(f"PPT生成已取消，检查点保存至：{checkpoint_path}")
+
+            reorder_slides(prs, [entry['slide_id'] for entry in records.values()])
+            prs.save(str(output_path))
+
+        if manifest:
+            manifest.deck_path = str(output_path)
+            manifest.slides = records
+            manifest.save()
+        # 生成完成后清理检查点（包括上一次中断留下的检查点）
+        for path in {str(checkpoint_path), base_deck}:
+            if path and path.endswith(PARTIAL_SUFFIX) and os.path.exists(path):
+                os.remove(path)
+        return Path(output_path)
+
+    def save_checkpoint(self, prs, checkpoint_path, manifest, plan, records):
+        """保存检查点PPT；有清单时同时记录检查点，下次增量生成从检查点继续"""
+        prs.save(str(checkpoint_path))
+        if manifest:
+            # 尚未处理的复用幻灯片仍保持旧内容，一并记录
+            slides = {key: entry for key, entry in plan.items()
+                      if entry is not None and key not in records}
+            slides.update(records)
+            manifest.deck_path = str(checkpoint_path)
+            manifest.slides = slides
+            manifest.save()
+        print(f"Checkpoint saved: {checkpoint_path} ({len(records)} slides)")
+
+    def generate_sharded(self, image_data, output_dir, mode=SPLIT_FOLDER,
+                         shard_size=DEFAULT_SHARD_SIZE, progress_callback=None, manifest_dir=None,
+                         prepare_callback=None, cancel_check=None):
+        """分片输出：每个缺陷文件夹或每N张幻灯片生成一个PPT，并生成带链接的目录PPT
+
+        各分片在独立进程中并行生成，返回目录PPT路径。
+        progress_callback(done, total) 在每个分片完成后以累计幻灯片数调用。
+        指定manifest_dir时每个分片单独增量生成。
+        """
+        self.load_template()  # 只解析一次，分析结果随引擎副本传给分片进程
+        self.restore_crops(image_data)
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        shards = split_image_data(image_data, mode, shard_size)
+        total = len(image_data)
+
+        with tempfile.TemporaryDirectory(prefix='vsa_prep_') as tmp_dir:
+            # 先统一并行预处理全部图片，分片进程只读取预处理结果，不再嵌套进程池
+            shard_engine = copy.copy(self)
+            shard_engine.prep_dir = self.prep_dir or tmp_dir
+            shard_engine.max_workers = 1
+            shard_engine.checkpoint_interval = 0
+            self.prepare(image_data, shard_engine.prep_dir,
+                         progress_callback=prepare_callback, cancel_check=cancel_check)
+            if cancel_check and cancel_check():
+                raise GenerationCancelled("PPT生成已取消")
+
+            shard_paths = {}
+            done = 0
+            # 与预处理进程池相同，在多线程的GUI进程中不能使用fork
+            with ProcessPoolExecutor(max_workers=self.max_workers,
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                futures = {}
+                for idx, (name, shard_data) in enumerate(shards.items(), start=1):
+                    file_stem = f"{idx:02d}_{safe_file_name(name)}"
+                    manifest_path = None
+                    if manifest_dir:
+                        manifest_path = Path(manifest_dir) / f"{safe_file_name(name)}.json"
+                    future = executor.submit(shard_engine.generate, shard_data,
+                                             output_dir / f"{file_stem}.pptx", None, manifest_path)
+                    futures[future] = name
+                for future in as_completed(futures):
+                    name = futures[future]
+                    try:
+                        shard_paths[name] = future.result()
+                    except Exception as e:
+                        print(f"Error generating shard {name}: {str(e)}")
+                    done += len(shards[name])
+                    if progress_callback:
+                        progress_callback(done, total)
+                    if cancel_check and cancel_check():
+                        for pending in futures:
+                            pending.cancel()
+                        raise GenerationCancelled("PPT生成已取消，已完成的分片保留在输出目录中")
+
+        return self.build_index(shards, shard_paths, output_dir / "00_目录.pptx")
+
+    def build_index(self, shards, shard_paths, index_path):
+        """生成目录PPT，每个分片一条链接（相对路径，整个目录可一起拷贝）"""
+        template = self.load_template()
+        prs = template.open()
+        names = [name for name in shards if name in shard_paths]
+        for start in range(0, len(names), INDEX_LINKS_PER_SLIDE):
+            slide = prs.slides.add_slide(prs.slide_layouts[template.layout_index])
+            if template.title_idx is not None:
+                title_shape = slide.placeholders[template.title_idx]
+            else:
+                title_shape = slide.shapes.add_textbox(
+                    Inches(2.3), Inches(0.5),
+                    prs.slide_width - Inches(3), Inches(0.5)
+                )
+            self.set_title_text(title_shape, "报告目录")
+
+            link_box = slide.shapes.add_textbox(
+                Inches(0.5), Inches(1.5),
+                prs.slide_width - Inches(1), Inches(4.5)
+            )
+            text_frame = link_box.text_frame
+            for i, name in enumerate(names[start:start + INDEX_LINKS_PER_SLIDE]):
+                paragraph = text_frame.paragraphs[0] if i == 0 else text_frame.add_paragraph()
+                run = paragraph.add_run()
+                run.text = f"{name}（{len(shards[name])}张）"
+                run.font.size = Pt(18)
+                run.hyperlink.address = Path(shard_paths[name]).name
+
+        prs.save(str(index_path))
+        return Path(index_path)
+
+    def plan_slides(self, image_data, manifest):
+        """对比清单，确定哪些幻灯片可以复用
+
+        返回SlidePlan：{图片键: 可复用的旧记录或None(需新建)}。
+        """
+        plan = SlidePlan((key, None) for key in image_data)
+        if manifest is None:
+            return plan
+
+        template = self.load_template().signature
+        policy = self.policy.signature()
+        paths = []
+        for data in image_data.values():
+            paths.append(data['full_path'])
+            if data.get('cache_path'):
+                paths.append(data['cache_path'])
+        manifest.update_digests(paths, max_workers=self.max_workers)
+
+        for key, data in image_data.items():
+            cache_path = data.get('cache_path')
+            plan.fingerprints[key] = {
+                'image': manifest.digest(data['full_path']),
+                'crop': manifest.digest(cache_path) if cache_path and os.path.exists(cache_path) else None,
+                'crop_area': list(data['crop_area']) if data.get('crop_area') else None,
+                'title': data.get('folder', ''),
+                'comment': data.get('comment', self.default_comment)
+            }
+
+        if not manifest.is_compatible(template, policy):
+            manifest.template = template
+            manifest.policy = policy
+            return plan
+
+        plan.reusable = True
+        for key, old in manifest.slides.items():
+            fingerprint = plan.fingerprints.get(key)
+            if (fingerprint and old.get('image') == fingerprint['image']
+                    and old.get('crop') == fingerprint['crop']
+                    and old.get('crop_area') == fingerprint['crop_area']):
+                plan[key] = dict(old)
+            else:
+                plan.stale[key] = old
+        return plan
+
+    def update_slide_text(self, slide, entry, data):
+        """原地更新复用幻灯片的标题和评估意见"""
+        title = data.get('folder', '')
+        comment = data.get('comment', self.default_comment)
+        shapes = {shape.shape_id: shape for shape in slide.shapes}
+        if entry.get('title') != title and entry.get('title_shape') in shapes:
+            self.set_title_text(shapes[entry['title_shape']], title)
+        if entry.get('comment') != comment and entry.get('comment_shape') in shapes:
+            shapes[entry['comment_shape']].text_frame.text = comment
+
+    def set_title_text(self, shape, text, bold=None):
+        """设置标题文字和字号"""
+        if bold is None:
+            bold = shape.is_placeholder
+        shape.text_frame.text = text
+        shape.text_frame.paragraphs[0].font.size = Pt(28)
+        shape.text_frame.paragraphs[0].font.bold = bold
+
+    def add_image_slide(self, prs, data, prepared=None):
+        """为一张图片添加幻灯片：标题、原图、裁剪图和评估意见
+
+        prepared为预处理结果，缺失时直接嵌入源文件。
+        返回 (幻灯片, 标题形状, 评估意见形状)。
+        """
+        prepared = prepared or {}
+        template = self.load_template()
+        slide_width = prs.slide_width
+        slide = prs.slides.add_slide(prs.slide_layouts[template.layout_index])
+
+        try:
+            # 添加标题（按模板分析得到的占位符idx直接获取）
+            if template.title_idx is not None:
+                title_shape = slide.placeholders[template.title_idx]
+            else:
+                title_shape = slide.shapes.add_textbox(
+                    Inches(2.3), Inches(0.5),
+                    slide_width - Inches(3), Inches(0.5)
+                )
+            self.set_title_text(title_shape, data.get('folder', ''))
+
+            # 添加原图
+            top = Inches(1.8)
+            original = prepared.get(data['full_path'])
+            slide.shapes.add_picture(
+                original.path if original else data['full_path'],
+                Inches(0.5), top,
+                height=Inches(3)
+            )
+
+            # 添加裁剪图
+            cache_path = data.get('cache_path')
+            if cache_path and os.path.exists(cache_path):
+                cropped = prepared.get(cache_path)
+                if cropped and not cropped.error:
+                    crop_width, crop_height = cropped.size
+                else:
+                    with Image.open(cache_path) as img:
+                        crop_width, crop_height = img.size
+                crop_target_height = Inches(3)  # 与原图高度一致
+                crop_target_width = crop_target_height * (crop_width / crop_height)
+                slide.shapes.add_picture(
+                    cropped.path if cropped else cache_path,
+                    slide_width - crop_target_width - Inches(1.5), top,
+                    height=crop_target_height
+                )
+
+            # 添加评估意见
+            comment = data.get('comment', self.default_comment)
+            if template.comment_idx is not None:
+                comment_shape = slide.placeholders[template.comment_idx]
+                comment_shape.text_frame.text = comment
+                return slide, title_shape, comment_shape
+
+            comment_box = slide.shapes.add_textbox(
+                Inches(0.5), Inches(5.2),
+                slide_width - Inches(1), Inches(0.3)
+            )
+            comment_box.text_frame.text = comment
+            return slide, title_shape, comment_box
+        except Exception:
+            # 半成品幻灯片不在清单中，不能留在PPT里
+            remove_slide(prs, slide)
+            raise
+
+
+class GenerationCancelled(Exception):
+    """PPT生成被用户取消"""
+
+
+class SlidePlan(dict):
+    """增量生成计划：{图片键: 可复用的旧记录或None}"""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.reusable = False  # 上一次的PPT能否作为基础
+        self.stale = {}  # 需要删除的旧幻灯片记录
+        self.fingerprints = {}  # 本次每张幻灯片的输入指纹
+
+
+def remove_slide(prs, slide):
+    """从演示文稿中删除幻灯片"""
+    sld_id_lst = prs.slides._sldIdLst
+    for sld_id in list(sld_id_lst):
+        if sld_id.id == slide.slide_id:
+            prs.part.drop_rel(sld_id.rId)
+            sld_id_lst.remove(sld_id)
+            break
+    # 重新编号幻灯片部件名，避免新增幻灯片时部件名冲突
+    prs.part.rename_slide_parts([sld_id.rId for sld_id in sld_id_lst])
+
+
+def reorder_slides(prs, slide_ids):
+    """按slide_ids顺序排列生成的幻灯片，模板自带的幻灯片保持在前面"""
+    sld_id_lst = prs.slides._sldIdLst
+    elements = {sld_id.id: sld_id for sld_id in sld_id_lst}
+    for slide_id in slide_ids:
+        element = elements.get(slide_id)
+        if element is not None:
+            sld_id_lst.remove(element)
+            sld_id_lst.append(element)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="无界面生成POC报告PPT")
+    parser.add_argument('project_root', help="图片项目目录（包含.vsa_cache/crop_records.json）")
+    parser.add_argument('--template', default=None, help="PPT模板路径，默认src/template.pptx")
+    parser.add_argument('--output', default=None, help="输出文件路径，默认保存到项目目录")
+    parser.add_argument('--records', default=None, help="裁剪记录JSON路径，默认.vsa_cache/crop_records.json")
+    parser.add_argument('--workers', type=int, default=None, help="图片预处理进程数，默认CPU核数")
+    parser.add_argument('--dpi', type=int, default=EmbedPolicy.target_dpi, help="嵌入图片的目标DPI")
+    parser.add_argument('--format', choices=['JPEG', 'PNG'], default=EmbedPolicy.image_format,
+                        help="原图嵌入格式，PNG为无损")
+    parser.add_argument('--quality', type=int, default=EmbedPolicy.quality, help="JPEG压缩质量(1-95)")
+    parser.add_argument('--lossy-crops', action='store_true', help="裁剪图也使用有损压缩")
+    parser.add_argument('--incremental', action='store_true',
+                        help="增量生成：只重建输入变化的幻灯片（清单保存在.vsa_cache）")
+    parser.add_argument('--split', choices=[SPLIT_NONE, SPLIT_FOLDER, SPLIT_COUNT], default=SPLIT_NONE,
+                        help="分片输出：folder按缺陷文件夹，count按--shard-size张数")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help="count模式下每个PPT的幻灯片数")
+    parser.add_argument('--checkpoint-interval', type=int, default=0,
+                        help="每隔N秒保存一次检查点（PPT越大间隔越长），配合--incremental可在中断后继续")
+    args = parser.parse_args(argv)
+
+    project_root = Path(args.project_root)
+    if not project_root.is_dir():
+        print(f"项目目录不存在: {project_root}")
+        return 1
+
+    template_path = args.template or get_resource_path('src/template.pptx')
+
+    image_data = scan_image_data(project_root)
+    record_file = args.records or project_root / CACHE_DIR_NAME / RECORD_FILE_NAME
+    merge_crop_records(image_data, load_crop_records(record_file))
+    output_path = args.output or default_output_path(project_root)
+
+    def report_progress(done, total):
+        print(f"[{done}/{total}] 幻灯片已生成")
+
+    policy = EmbedPolicy(target_dpi=args.dpi, image_format=args.format,
+                         quality=args.quality, lossless_crops=not args.lossy_crops)
+    # 增量模式下预处理图片和清单保存在.vsa_cache中，供下次复用
+    cache_dir = project_root / CACHE_DIR_NAME
+    prep_dir = cache_dir / PREPARED_DIR_NAME if args.incremental else None
+    manifest_path = cache_dir / MANIFEST_FILE_NAME if args.incremental else None
+    engine = ReportEngine(template_path, policy=policy, max_workers=args.workers,
+                          prep_dir=prep_dir, checkpoint_interval=args.checkpoint_interval,
+                          crop_dir=cache_dir / CROP_DIR_NAME)
+    if args.split == SPLIT_NONE:
+        output_path = engine.generate(image_data, output_path, progress_callback=report_progress,
+                                      manifest_path=manifest_path)
+    else:
+        # 分片模式：输出到同名目录，--output指定目录
+        output_dir = args.output or Path(output_path).with_suffix('')
+        manifest_dir = cache_dir / SHARD_MANIFEST_DIR_NAME if args.incremental else None
+        output_path = engine.generate_sharded(image_data, output_dir, mode=args.split,
+                                              shard_size=args.shard_size,
+                                              progress_callback=report_progress,
+                                              manifest_dir=manifest_dir)
+    engine.prune_prepared(image_data)
+    print(f"PPT生成完成！保存至：{output_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
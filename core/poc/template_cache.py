@@ -0,0 +1,70 @@
+"""
+PPT模板分析缓存
+
+每个模板文件只解析一次（按路径、大小和修改时间缓存）：预先确定使用的版式、
+标题占位符和“评估意见”占位符的idx，生成每张幻灯片时直接按idx取占位符。
+"""
+import os
+import io
+from dataclasses import dataclass
+from pptx import Presentation
+from pptx.enum.shapes import PP_PLACEHOLDER
+
+SLIDE_LAYOUT_INDEX = 10
+COMMENT_PLACEHOLDER_TEXT = "评估意见"
+
+_template_cache = {}
+
+
+@dataclass
+class TemplateInfo:
+    path: str = ""
+    signature: str = ""  # 模板签名：路径|大小|修改时间|版式
+    blob: bytes = b""  # 模板文件内容，重复生成时不再读盘
+    layout_index: int = SLIDE_LAYOUT_INDEX
+    title_idx: int = None  # 标题占位符idx，None表示版式没有标题
+    comment_idx: int = None  # 评估意见占位符idx，None表示需要添加文本框
+    slide_ids: tuple = ()  # 模板自带幻灯片的id
+
+    def open(self):
+        """基于模板内容新建演示文稿"""
+        return Presentation(io.BytesIO(self.blob))
+
+
+def template_signature(template_path, layout_index=SLIDE_LAYOUT_INDEX):
+    """模板签名：模板文件大小、修改时间和使用的版式"""
+    stat = os.stat(template_path)
+    return f"{os.path.abspath(template_path)}|{stat.st_size}|{stat.st_mtime_ns}|{layout_index}"
+
+
+def analyze_template(template_path, layout_index=SLIDE_LAYOUT_INDEX):
+    """解析模板版式，找出标题和评估意见占位符"""
+    with open(template_path, 'rb') as f:
+        blob = f.read()
+    info = TemplateInfo(
+        path=os.path.abspath(template_path),
+        signature=template_signature(template_path, layout_index),
+        blob=blob,
+        layout_index=layout_index
+    )
+    prs = Presentation(io.BytesIO(blob))
+    info.slide_ids = tuple(slide.slide_id for slide in prs.slides)
+    layout = prs.slide_layouts[layout_index]
+    for placeholder in layout.placeholders:
+        ph_type = placeholder.placeholder_format.type
+        if ph_type in (PP_PLACEHOLDER.TITLE, PP_PLACEHOLDER.CENTER_TITLE) and info.title_idx is None:
+            info.title_idx = placeholder.placeholder_format.idx
+        elif (placeholder.has_text_frame
+              and placeholder.text_frame.text.strip() == COMMENT_PLACEHOLDER_TEXT):
+            info.comment_idx = placeholder.placeholder_format.idx
+    return info
+
+
+def get_template_info(template_path, layout_index=SLIDE_LAYOUT_INDEX):
+    """获取模板分析结果，模板文件未变化时直接返回缓存"""
+    signature = template_signature(template_path, layout_index)
+    info = _template_cache.get(signature)
+    if info is None:
+        info = analyze_template(template_path, layout_index)
+        _template_cache[signature] = info
+    return info
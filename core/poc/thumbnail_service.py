@@ -0,0 +1,176 @@
+"""
+项目级缩略图服务
+
+图片列表、工位图片预览等只需要小图的地方共用一个缩略图服务：缩略图按几档
+固定尺寸生成，在后台线程池中缩小解码（JPEG使用DCT缩放，不解码整图），保存到
+项目的.vsa_cache/thumbnails下，文件名由路径、修改时间、文件大小和尺寸决定，
+原图被覆盖后自动失效。磁盘缓存由CacheStore按大小限制LRU淘汰，内存中再保留
+一份最近使用的缩略图，第一次生成之后的请求只需毫秒级。
+"""
+import os
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QSize, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter
+
+from .image_cache import decode_image
+from .cache_store import CacheStore, source_signature
+
+THUMBNAIL_DIR_NAME = 'thumbnails'
+THUMBNAIL_SIZES = (128, 256, 640)  # 缩略图长边的几档尺寸
+DEFAULT_THUMBNAIL_CACHE_MB = 256  # 磁盘缓存预算
+THUMBNAIL_MEMORY_MB = 64  # 内存缓存预算
+
+
+def thumbnail_bucket(size):
+    """请求尺寸向上取整到固定档位，超过最大档位时使用最大档位"""
+    for bucket in THUMBNAIL_SIZES:
+        if size <= bucket:
+            return bucket
+    return THUMBNAIL_SIZES[-1]
+
+
+def thumbnail_name(path, bucket):
+    return hashlib.sha1(f"{source_signature(path)}|{bucket}".encode('utf-8')).hexdigest() + '.jpg'
+
+
+def render_thumbnail(path, bucket, thumb_dir):
+    """读取磁盘缓存的缩略图，不存在时缩小解码原图并写入缓存
+
+    返回 (QImage, 缓存文件路径或None, 是否新生成)。
+    """
+    thumb_path = Path(thumb_dir) / thumbnail_name(path, bucket)
+    if thumb_path.exists():
+        image = QImage(str(thumb_path))
+        if not image.isNull():
+            return image, str(thumb_path), False
+    image = decode_image(path, QSize(bucket, bucket)).image
+    if image.isNull():
+        return image, None, False
+    if image.hasAlphaChannel():
+        # 缩略图统一保存为JPEG，透明部分合成到白底
+        opaque = QImage(image.size(), QImage.Format_RGB32)
+        opaque.fill(Qt.white)
+        painter = QPainter(opaque)
+        painter.drawImage(0, 0, image)
+        painter.end()
+        image = opaque
+    try:
+        thumb_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = thumb_path.with_name(thumb_path.name + '.tmp')
+        if not image.save(str(tmp_path), 'JPG', 90):
+            print(f"Error writing thumbnail: {tmp_path}")
+            return image, None, False
+        os.replace(tmp_path, thumb_path)
+    except OSError as e:
+        print(f"Error writing thumbnail: {str(e)}")
+        return image, None, False
+    return image, str(thumb_path), True
+
+
+class ThumbnailSignals(QObject):
+    done = pyqtSignal(object, object, object, bool)  # 缓存键, QImage, 缓存文件路径, 是否新生成
+
+
+class ThumbnailTask(QRunnable):
+    def __init__(self, service, key):
+        super().__init__()
+        self.service = service
+        self.key = key
+        self.signals = service.signals
+
+    def run(self):
+        if self.service.closed:
+            self.signals.done.emit(self.key, None, None, False)
+            return
+        path, bucket = self.key
+        try:
+            # 原图的stat在这里（后台线程）进行，缩略图文件名由修改时间和大小决定
+            image, thumb_path, created = render_thumbnail(path, bucket, self.service.thumb_dir)
+        except OSError:
+            image, thumb_path, created = QImage(), None, False  # 原图已被删除或无法读取
+        except Exception as e:
+            print(f"Error rendering thumbnail for {path}: {str(e)}")
+            image, thumb_path, created = QImage(), None, False
+        self.signals.done.emit(self.key, image, thumb_path, created)
+
+
+class ThumbnailService(QObject):
+    thumbnail_ready = pyqtSignal(str, int, object)  # 原图路径, 档位尺寸, QImage
+
+    def __init__(self, cache_dir, parent=None, max_threads=None,
+                 budget_mb=DEFAULT_THUMBNAIL_CACHE_MB, memory_mb=THUMBNAIL_MEMORY_MB):
+        super().__init__(parent)
+        self.thumb_dir = Path(cache_dir) / THUMBNAIL_DIR_NAME
+        self.store = CacheStore(self.thumb_dir, budget_mb * 1024 * 1024).load()
+        self.memory_budget = memory_mb * 1024 * 1024
+        self.used = 0
+        self.images = OrderedDict()  # {(路径, 档位): QImage}
+        self.pending = set()
+        self.failed = set()  # {路径}，解码失败的图片，invalidate之前不再重试
+        self.closed = False
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads or max(2, min(4, os.cpu_count() or 1)))
+        self.signals = ThumbnailSignals()
+        self.signals.done.connect(self.on_done)
+
+    def request(self, path, size):
+        """命中内存缓存时直接返回QImage；否则返回None，在后台生成后发出thumbnail_ready
+
+        视图重绘时每个可见行都会调用，这里不访问文件系统：内存缓存按路径和档位
+        查找，原图被覆盖后由调用方通过invalidate()丢弃旧的缩略图。
+        解码失败的图片在invalidate之前直接返回None，不再重新排队。
+        """
+        path = str(path)
+        if path in self.failed:
+            return None
+        key = (path, thumbnail_bucket(size))
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+            return image
+        if key not in self.pending and not self.closed:
+            self.pending.add(key)
+            self.pool.start(ThumbnailTask(self, key))
+        return None
+
+    def invalidate(self, path):
+        """原图被修改或删除后丢弃内存中的缩略图和失败记录，下次请求时重新生成"""
+        path = str(path)
+        self.failed.discard(path)
+        for key in [key for key in self.images if key[0] == path]:
+            self.used -= self.images.pop(key).sizeInBytes()
+
+    def on_done(self, key, image, thumb_path, created):
+        self.pending.discard(key)
+        if image is None or self.closed:
+            return
+        if created:
+            self.store.add(thumb_path)
+        elif thumb_path:
+            self.store.touch(thumb_path)
+        if image.isNull():
+            # 记录解码失败，避免视图重绘时反复请求同一张损坏的图片
+            self.failed.add(key[0])
+            return
+        self.images[key] = image
+        self.used += image.sizeInBytes()
+        while self.used > self.memory_budget and len(self.images) > 1:
+            _, evicted = self.images.popitem(last=False)
+            self.used -= evicted.sizeInBytes()
+        self.thumbnail_ready.emit(key[0], key[1], image)
+
+    def cancel(self):
+        """放弃尚未开始的任务（切换列表内容时调用）"""
+        self.pool.clear()
+        self.pending.clear()
+
+    def shutdown(self):
+        """等待正在生成的缩略图并保存缓存索引"""
+        self.closed = True
+        self.pool.clear()
+        self.pool.waitForDone()
+        self.images.clear()
+        self.used = 0
+        self.store.save()
@@ -0,0 +1,610 @@
+"""
+超大图片的分块金字塔
+
+拼接线扫图可达16k x 60k像素，无法整张解码为QPixmap。这里把图片按多级分辨率
+切成固定大小的瓦片：瓦片在第一次显示时才生成并缓存到磁盘，视图只加载当前缩放
+级别下可见的瓦片，内存占用与图片大小无关。
+
+支持区域解码的格式（JPEG）逐块读取原图；其他格式（线扫常用的PNG、BMP、TIFF）
+第一次访问时按行带顺序读取原图生成最细一级的瓦片，再由下一级瓦片逐级缩小生成
+更粗的级别，内存中最多只有一个行带。
+"""
+import io
+import os
+import math
+import zlib
+import struct
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QRect, QRectF, QSize, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader, QImageIOHandler, QColor, QPainter
+from PyQt5.QtWidgets import QGraphicsObject, QGraphicsItem, QStyleOptionGraphicsItem
+from PIL import Image, BmpImagePlugin, TiffImagePlugin
+
+TILE_SIZE = 512
+TILE_DIR_NAME = 'tiles'  # 项目.vsa_cache下的瓦片缓存目录
+TILED_PIXEL_THRESHOLD = 64 * 1000 * 1000  # 超过6400万像素的图片使用分块显示
+TILED_MAX_DIMENSION = 16384  # 单边超过该尺寸时使用分块显示
+TILE_MEMORY_MB = 128  # 内存中缓存的瓦片预算
+DEFAULT_TILE_CACHE_MB = 2048  # 磁盘瓦片缓存预算，按金字塔整体淘汰
+COMPLETE_MARKER = 'complete'
+FAILED_MARKER = 'failed'  # 生成失败，原图变化前不再重试
+FULL_DECODE_MAX_PIXELS = 128 * 1000 * 1000  # 无法按行带读取的格式允许整图解码的上限
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # 颜色类型 -> 通道数
+# 复制到行带TIFF中的图像结构标签
+TIFF_LAYOUT_TAGS = (256, 258, 259, 262, 266, 277, 284, 317, 320, 338, 339, 347, 530, 532)
+
+
+class BandReadError(Exception):
+    """原图的格式或编码方式不支持按行带读取"""
+
+
+def needs_tiling(size):
+    """根据原图尺寸判断是否需要分块显示"""
+    if not size.isValid():
+        return False
+    return (size.width() * size.height() > TILED_PIXEL_THRESHOLD
+            or max(size.width(), size.height()) > TILED_MAX_DIMENSION)
+
+
+def directory_size(path):
+    total = 0
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                total += directory_size(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                total += entry.stat().st_size
+    return total
+
+
+def prune_tile_cache(cache_dir, max_bytes=DEFAULT_TILE_CACHE_MB * 1024 * 1024):
+    """瓦片缓存超出预算时按最近使用时间整体删除最久未用的金字塔，返回删除的数量"""
+    try:
+        with os.scandir(cache_dir) as it:
+            pyramids = [(entry.stat().st_mtime, entry.path) for entry in it if entry.is_dir()]
+        sizes = {path: directory_size(path) for _, path in pyramids}
+    except FileNotFoundError:
+        return 0  # 项目第一次打开，还没有生成过瓦片
+    except OSError as e:
+        print(f"Error scanning tile cache: {str(e)}")
+        return 0
+    total = sum(sizes.values())
+    removed = 0
+    for _, path in sorted(pyramids):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= sizes[path]
+        removed += 1
+    return removed
+
+
+def png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def png_bands(path, band_height):
+    """按行带顺序解码PNG（8位、非隔行），依次返回 (起始行, PIL图片)
+
+    IDAT数据分段读取、限量解压；每个行带连同上一行带最后一行（不带滤波）组成一张
+    小PNG交给PIL解码，滤波所需的上一行因此总是可用，内存中只有一个行带。
+    """
+    with open(path, 'rb') as f:
+        if f.read(8) != PNG_SIGNATURE:
+            raise BandReadError("not a PNG file")
+        header = None
+        extra = b''  # 调色板和透明度块
+        inflater = zlib.decompressobj()
+        pending = bytearray()
+        prev_row = None
+        y = height = stride = 0
+        while True:
+            head = f.read(8)
+            if len(head) < 8:
+                break
+            length, chunk_type = struct.unpack('>I4s', head)
+            if chunk_type == b'IDAT' and header is not None:
+                remaining = length
+                while remaining:
+                    data = f.read(min(remaining, 1 << 20))
+                    if not data:
+                        raise BandReadError("truncated PNG data")
+                    remaining -= len(data)
+                    while data:
+                        pending += inflater.decompress(data, band_height * stride)
+                        data = inflater.unconsumed_tail
+                        while y < height and len(pending) >= min(band_height, height - y) * stride:
+                            rows = min(band_height, height - y)
+                            band, prev_row = decode_png_band(header, extra, prev_row, pending[:rows * stride], rows)
+                            del pending[:rows * stride]
+                            yield y, band
+                            y += rows
+                f.read(4)
+                continue
+            data = f.read(length)
+            f.read(4)
+            if chunk_type == b'IHDR':
+                width, height, depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', data)
+                if depth != 8 or interlace or color_type not in PNG_CHANNELS:
+                    raise BandReadError(f"unsupported PNG layout (depth {depth}, interlace {interlace})")
+                header = data
+                stride = width * PNG_CHANNELS[color_type] + 1
+            elif chunk_type in (b'PLTE', b'tRNS'):
+                extra += png_chunk(chunk_type, data)
+            elif chunk_type == b'IEND':
+                break
+        if header is None or y < height:
+            raise BandReadError("truncated PNG data")
+
+
+def decode_png_band(header, extra, prev_row, filtered, rows):
+    """解码一个行带，返回 (PIL图片, 最后一行的原始数据)"""
+    skip = 1 if prev_row is not None else 0
+    data = (b'\x00' + prev_row if skip else b'') + bytes(filtered)
+    header = header[:4] + struct.pack('>I', rows + skip) + header[8:]
+    png = (PNG_SIGNATURE + png_chunk(b'IHDR', header) + extra
+           + png_chunk(b'IDAT', zlib.compress(data, 0)) + png_chunk(b'IEND', b''))
+    image = Image.open(io.BytesIO(png))
+    image.load()
+    width = image.width
+    last_row = image.crop((0, rows + skip - 1, width, rows + skip)).tobytes()
+    if skip:
+        image = image.crop((0, 1, width, rows + 1))
+    return image, last_row
+
+
+def bmp_bands(path, band_height):
+    """按行带读取未压缩的BMP：直接按偏移读取行带覆盖的行"""
+    bmp = BmpImagePlugin.BmpImageFile(path)
+    try:
+        if len(bmp.tile) != 1 or bmp.tile[0][0] != 'raw':
+            raise BandReadError("compressed BMP")
+        _, _, offset, (rawmode, stride, orientation) = bmp.tile[0]
+        width, height = bmp.size
+        mode = bmp.mode
+        palette = bmp.palette
+    finally:
+        bmp.close()
+    for y in range(0, height, band_height):
+        rows = min(band_height, height - y)
+        # 自下而上存储时，行带的最后一行在文件中最靠前
+        start = offset + (height - y - rows if orientation < 0 else y) * stride
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read(rows * stride)
+        band = Image.frombuffer(mode, (width, rows), data, 'raw', rawmode, stride, orientation)
+        if palette is not None and mode == 'P':
+            band.putpalette(palette)
+        yield y, band
+
+
+def tiff_bands(path, band_height):
+    """按行带读取TIFF：只取出覆盖行带的条带（或分块），组成一个小TIFF交给PIL解码"""
+    tiff = TiffImagePlugin.TiffImageFile(path)
+    try:
+        tags = tiff.tag_v2
+        width, height = tiff.size
+        if tags.get(284, 1) != 1:
+            raise BandReadError("planar TIFF")
+        if 322 in tags:
+            unit_height = tags[323]
+            across = -(-width // tags[322])
+            offset_tag, count_tag = 324, 325
+        else:
+            unit_height = min(tags.get(278, height), height)
+            across = 1
+            offset_tag, count_tag = 273, 279
+        offsets, counts = tags[offset_tag], tags[count_tag]
+        layout = {tag: (tags[tag], tags.tagtype.get(tag)) for tag in TIFF_LAYOUT_TAGS + (322, 323) if tag in tags}
+        bits_per_sample = tags.get(258, 1)
+        bits = sum(bits_per_sample) if isinstance(bits_per_sample, tuple) else bits_per_sample
+    finally:
+        tiff.close()
+    uncompressed = layout.get(259, (1,))[0] == 1 and across == 1
+    row_bytes = -(-width * bits // 8)
+    with open(path, 'rb') as f:
+        for y in range(0, height, band_height):
+            y_end = min(height, y + band_height)
+            if uncompressed:
+                # 未压缩的条带可以只读取需要的行（每行作为一个条带）
+                top, rows, unit_rows = y, y_end - y, 1
+                spans = [(offsets[row // unit_height] + (row % unit_height) * row_bytes, row_bytes)
+                         for row in range(y, y_end)]
+            else:
+                first, last = y // unit_height, -(-y_end // unit_height)
+                top, unit_rows = first * unit_height, unit_height
+                rows = min(height, last * unit_height) - top
+                spans = [(offsets[index], counts[index])
+                         for index in range(first * across, last * across)]
+            blocks = []
+            for start, length in spans:
+                f.seek(start)
+                blocks.append(f.read(length))
+            band = decode_tiff_band(layout, width, rows, unit_rows, offset_tag, count_tag, blocks)
+            if top != y or rows != y_end - y:
+                band = band.crop((0, y - top, width, y_end - top))
+            yield y, band
+
+
+def decode_tiff_band(layout, width, rows, unit_rows, offset_tag, count_tag, blocks):
+    ifd = TiffImagePlugin.ImageFileDirectory_v2(prefix=b'II')
+    for tag, (value, tag_type) in layout.items():
+        ifd[tag] = value
+        if tag_type is not None:
+            ifd.tagtype[tag] = tag_type
+    ifd[256] = width
+    ifd[257] = rows
+    if offset_tag == 273:
+        ifd[278] = unit_rows
+    ifd[count_tag] = tuple(len(block) for block in blocks)
+    for tag in (256, 257, 278, offset_tag, count_tag):
+        ifd.tagtype[tag] = 4  # LONG
+    positions = []
+    start = 0
+    for block in blocks:
+        positions.append(start)
+        start += len(block)
+    if offset_tag == 273:
+        # PIL写出条带偏移时会加上目录及附加数据的长度，这里给出相对数据区的偏移
+        ifd[offset_tag] = tuple(positions)
+    else:
+        # 分块偏移按原样写出：先用占位偏移确定目录长度，再写入绝对偏移
+        ifd[offset_tag] = tuple(positions)
+        base = 8 + len(ifd.tobytes(8))
+        ifd[offset_tag] = tuple(base + position for position in positions)
+    data = b'II*\x00' + struct.pack('<I', 8) + ifd.tobytes(8) + b''.join(blocks)
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+def pil_to_qimage(image):
+    """PIL图片 -> QImage（复制数据）"""
+    if image.mode in ('I;16', 'I;16B', 'I;16L', 'I'):
+        image = image.convert('I').point(lambda v: v * (1 / 256)).convert('L')
+    elif image.mode not in ('L', 'RGB', 'RGBA'):
+        has_alpha = 'A' in image.mode or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    formats = {'L': (QImage.Format_Grayscale8, 1), 'RGB': (QImage.Format_RGB888, 3),
+               'RGBA': (QImage.Format_RGBA8888, 4)}
+    fmt, channels = formats[image.mode]
+    data = image.tobytes()
+    return QImage(data, image.width, image.height, image.width * channels, fmt).copy()
+
+
+def image_bands(path, band_height):
+    """按格式选择行带读取方式，不支持时抛出BandReadError"""
+    with open(path, 'rb') as f:
+        head = f.read(8)
+    if head.startswith(PNG_SIGNATURE):
+        return png_bands(path, band_height)
+    if head.startswith(b'BM'):
+        return bmp_bands(path, band_height)
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return tiff_bands(path, band_height)
+    raise BandReadError("format does not support band reading")
+
+
+class TilePyramid:
+    def __init__(self, source, cache_dir, tile_size=TILE_SIZE):
+        self.source = str(source)
+        self.tile_size = tile_size
+        reader = QImageReader(self.source)
+        self.size = reader.size()
+        # 能否只解码指定区域（否则整图解码一次并生成全部瓦片）
+        self.region_decode = (reader.supportsOption(QImageIOHandler.ClipRect)
+                              and reader.supportsOption(QImageIOHandler.ScaledSize))
+        self.suffix = '.jpg' if bytes(reader.format()).lower() in (b'jpg', b'jpeg') else '.png'
+        stat = os.stat(self.source)
+        key = f"{os.path.abspath(self.source)}|{stat.st_size}|{stat.st_mtime_ns}|{tile_size}"
+        self.key = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        self.tile_dir = Path(cache_dir) / self.key
+        if self.tile_dir.exists():
+            # 目录修改时间作为最近使用时间，供prune_tile_cache淘汰
+            os.utime(self.tile_dir)
+        longest = max(self.size.width(), self.size.height(), 1)
+        self.max_level = max(0, math.ceil(math.log2(longest / tile_size)))
+        self._build_lock = threading.Lock()
+
+    def level_size(self, level):
+        """指定级别的图片尺寸（级别L缩小2^L倍）"""
+        scale = 1 << level
+        return QSize(max(1, -(-self.size.width() // scale)), max(1, -(-self.size.height() // scale)))
+
+    def tile_span(self, level):
+        """指定级别的一个瓦片覆盖的原图像素数"""
+        return self.tile_size << level
+
+    def tile_count(self, level):
+        span = self.tile_span(level)
+        return -(-self.size.width() // span), -(-self.size.height() // span)
+
+    def tile_rect(self, level, tx, ty):
+        """瓦片在原图坐标中的区域"""
+        span = self.tile_span(level)
+        return QRect(tx * span, ty * span, span, span).intersected(
+            QRect(0, 0, self.size.width(), self.size.height()))
+
+    def tile_path(self, level, tx, ty):
+        return self.tile_dir / str(level) / f"{tx}_{ty}{self.suffix}"
+
+    def is_complete(self):
+        """全部瓦片是否已经生成（无法区域解码的格式）"""
+        return (self.tile_dir / COMPLETE_MARKER).exists()
+
+    def has_failed(self):
+        """生成瓦片是否失败过（原图变化后key随之变化）"""
+        return (self.tile_dir / FAILED_MARKER).exists()
+
+    def load_tile(self, level, tx, ty):
+        """读取磁盘缓存中的瓦片，不存在时生成（在后台线程中调用）"""
+        path = self.tile_path(level, tx, ty)
+        if path.exists():
+            image = QImage(str(path))
+            if not image.isNull():
+                return image
+        if self.has_failed():
+            return QImage()
+        if self.region_decode:
+            image = self.render_tile(level, tx, ty)
+            if image.isNull():
+                self.mark_failed()
+            self.save_tile(image, path)
+            return image
+        with self._build_lock:
+            if not self.is_complete() and not self.has_failed():
+                try:
+                    self.build_all()
+                except Exception as e:
+                    print(f"Error building tiles for {self.source}: {str(e)}")
+                    self.mark_failed()
+        return QImage(str(path))
+
+    def mark_failed(self):
+        try:
+            self.tile_dir.mkdir(parents=True, exist_ok=True)
+            (self.tile_dir / FAILED_MARKER).touch()
+        except OSError as e:
+            print(f"Error marking tiles as failed: {str(e)}")
+
+    def render_tile(self, level, tx, ty):
+        """只解码瓦片覆盖的原图区域，并按级别缩小"""
+        rect = self.tile_rect(level, tx, ty)
+        scale = 1 << level
+        reader = QImageReader(self.source)
+        reader.setClipRect(rect)
+        reader.setScaledSize(QSize(max(1, -(-rect.width() // scale)), max(1, -(-rect.height() // scale))))
+        image = reader.read()
+        if image.isNull():
+            print(f"Error rendering tile {level}/{tx}_{ty} of {self.source}: {reader.errorString()}")
+        return image
+
+    def build_all(self):
+        """按行带读取原图生成最细一级瓦片，再逐级缩小生成其余级别"""
+        self.build_base_level()
+        for level in range(1, self.max_level + 1):
+            self.build_level(level)
+        (self.tile_dir / COMPLETE_MARKER).touch()
+
+    def build_base_level(self):
+        """生成第0级瓦片：每次只读取一行瓦片高度的行带"""
+        try:
+            bands = image_bands(self.source, self.tile_size)
+            for y, band in bands:
+                self.save_band(pil_to_qimage(band), y)
+            return
+        except BandReadError as e:
+            print(f"Band reading unavailable for {self.source} ({str(e)}), decoding whole image")
+        if self.size.width() * self.size.height() > FULL_DECODE_MAX_PIXELS:
+            raise MemoryError(f"image too large to decode at once: {self.size.width()}x{self.size.height()}")
+        image = QImage(self.source)
+        if image.isNull():
+            raise IOError(f"cannot decode image: {self.source}")
+        for y in range(0, image.height(), self.tile_size):
+            self.save_band(image.copy(0, y, image.width(), min(self.tile_size, image.height() - y)), y)
+
+    def save_band(self, band, y):
+        """把一个行带切成第0级瓦片"""
+        ty = y // self.tile_size
+        for tx in range(self.tile_count(0)[0]):
+            x = tx * self.tile_size
+            tile = band.copy(x, 0, min(self.tile_size, band.width() - x), band.height())
+            self.save_tile(tile, self.tile_path(0, tx, ty))
+
+    def build_level(self, level):
+        """由上一级的2x2个瓦片缩小生成本级瓦片"""
+        child_size = self.level_size(level - 1)
+        size = self.level_size(level)
+        cols, rows = self.tile_count(level)
+        ts = self.tile_size
+        for ty in range(rows):
+            for tx in range(cols):
+                canvas = QImage(min(2 * ts, child_size.width() - 2 * tx * ts),
+                                min(2 * ts, child_size.height() - 2 * ty * ts), QImage.Format_RGB32)
+                canvas.fill(Qt.white)
+                painter = QPainter(canvas)
+                for cy in range(2 * ty, 2 * ty + 2):
+                    for cx in range(2 * tx, 2 * tx + 2):
+                        path = self.tile_path(level - 1, cx, cy)
+                        if path.exists():
+                            painter.drawImage((cx - 2 * tx) * ts, (cy - 2 * ty) * ts, QImage(str(path)))
+                painter.end()
+                tile = canvas.scaled(min(ts, size.width() - tx * ts), min(ts, size.height() - ty * ts),
+                                     Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+                self.save_tile(tile, self.tile_path(level, tx, ty))
+
+    def save_tile(self, image, path):
+        """原子写入瓦片文件"""
+        if image.isNull():
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + '.tmp')
+            image.save(str(tmp_path), 'JPG' if self.suffix == '.jpg' else 'PNG', 90)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error saving tile {path}: {str(e)}")
+
+
+class TileSignals(QObject):
+    tile_loaded = pyqtSignal(object, object)  # (金字塔key, 级别, x, y), QImage
+
+
+class TileTask(QRunnable):
+    def __init__(self, loader, pyramid, tile_key):
+        super().__init__()
+        self.loader = loader
+        self.pyramid = pyramid
+        self.tile_key = tile_key
+        self.signals = loader.signals
+
+    def run(self):
+        if not self.loader.is_wanted(self.tile_key):
+            self.signals.tile_loaded.emit(self.tile_key, None)
+            return
+        _, level, tx, ty = self.tile_key
+        self.signals.tile_loaded.emit(self.tile_key, self.pyramid.load_tile(level, tx, ty))
+
+
+class TileLoader(QObject):
+    """后台加载瓦片，结果放入按内存预算限制的LRU缓存"""
+    tile_ready = pyqtSignal(object)  # (金字塔key, 级别, x, y)
+
+    def __init__(self, parent=None, budget_mb=TILE_MEMORY_MB, max_threads=None):
+        super().__init__(parent)
+        self.budget = budget_mb * 1024 * 1024
+        self.used = 0
+        self.tiles = OrderedDict()  # {(金字塔key, 级别, x, y): QImage}
+        self.pending = set()
+        self.failed = set()  # 加载失败的瓦片，不再重复请求
+        self.wanted = set()
+        self.closed = False
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads or max(2, min(4, os.cpu_count() or 1)))
+        self.signals = TileSignals()
+        self.signals.tile_loaded.connect(self.on_tile_loaded)
+
+    def is_wanted(self, tile_key):
+        return not self.closed and tile_key in self.wanted
+
+    def cached(self, tile_key):
+        image = self.tiles.get(tile_key)
+        if image is not None:
+            self.tiles.move_to_end(tile_key)
+        return image
+
+    def request(self, pyramid, tile_keys):
+        """设置当前可见的瓦片，加载其中尚未缓存的部分"""
+        self.wanted = set(tile_keys)
+        for tile_key in tile_keys:
+            if (tile_key not in self.tiles and tile_key not in self.pending
+                    and tile_key not in self.failed and not self.closed):
+                self.pending.add(tile_key)
+                self.pool.start(TileTask(self, pyramid, tile_key))
+
+    def on_tile_loaded(self, tile_key, image):
+        self.pending.discard(tile_key)
+        if image is None or self.closed:
+            return
+        if image.isNull():
+            self.failed.add(tile_key)
+            return
+        self.tiles[tile_key] = image
+        self.used += image.sizeInBytes()
+        while self.used > self.budget and len(self.tiles) > 1:
+            _, evicted = self.tiles.popitem(last=False)
+            self.used -= evicted.sizeInBytes()
+        self.tile_ready.emit(tile_key)
+
+    def cancel(self):
+        """放弃尚未开始的瓦片任务（切换图片时调用）"""
+        self.wanted = set()
+        self.pool.clear()
+
+    def shutdown(self):
+        self.closed = True
+        self.pool.clear()
+        self.pool.waitForDone()
+        self.tiles.clear()
+        self.used = 0
+
+
+class TiledImageItem(QGraphicsObject):
+    """按当前缩放级别绘制可见瓦片的图元，场景坐标为原图像素坐标"""
+
+    def __init__(self, pyramid, loader):
+        super().__init__()
+        self.pyramid = pyramid
+        self.loader = loader
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        self.loader.tile_ready.connect(self.on_tile_ready)
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.pyramid.size.width(), self.pyramid.size.height())
+
+    def level_for(self, painter):
+        """选择分辨率不低于屏幕的最粗级别"""
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        if lod <= 0 or lod >= 1:
+            return 0
+        return min(self.pyramid.max_level, int(math.floor(math.log2(1 / lod))))
+
+    def tiles_in(self, level, rect):
+        """与rect（原图坐标）相交的瓦片坐标"""
+        rect = rect.intersected(self.boundingRect())
+        if rect.isEmpty():
+            return []
+        span = self.pyramid.tile_span(level)
+        cols, rows = self.pyramid.tile_count(level)
+        x0, y0 = int(rect.left() // span), int(rect.top() // span)
+        x1, y1 = min(cols - 1, int(rect.right() // span)), min(rows - 1, int(rect.bottom() // span))
+        return [(tx, ty) for ty in range(y0, y1 + 1) for tx in range(x0, x1 + 1)]
+
+    def paint(self, painter, option, widget=None):
+        pyramid = self.pyramid
+        level = self.level_for(painter)
+        for tx, ty in self.tiles_in(level, option.exposedRect):
+            target = QRectF(pyramid.tile_rect(level, tx, ty))
+            image = self.loader.cached((pyramid.key, level, tx, ty))
+            if image is not None:
+                painter.drawImage(target, image)
+            elif not self.draw_fallback(painter, level, target):
+                painter.fillRect(target, QColor(235, 235, 235))
+
+        # 按整个视口（而不只是本次重绘的区域）确定需要加载的瓦片
+        view_rect = option.exposedRect
+        if widget is not None:
+            inverted, ok = painter.worldTransform().inverted()
+            if ok:
+                view_rect = inverted.mapRect(QRectF(widget.rect()))
+        # 最粗一级的瓦片最先加载并始终保留，作为加载过程中的占位
+        visible = [(pyramid.key, pyramid.max_level, 0, 0)]
+        visible.extend((pyramid.key, level, tx, ty) for tx, ty in self.tiles_in(level, view_rect))
+        self.loader.request(pyramid, visible)
+
+    def draw_fallback(self, painter, level, target):
+        """用已缓存的更粗级别瓦片暂时填充尚未加载的区域"""
+        pyramid = self.pyramid
+        for coarse in range(level + 1, pyramid.max_level + 1):
+            span = pyramid.tile_span(coarse)
+            tx, ty = int(target.left() // span), int(target.top() // span)
+            image = self.loader.cached((pyramid.key, coarse, tx, ty))
+            if image is None:
+                continue
+            scale = 1 << coarse
+            origin = pyramid.tile_rect(coarse, tx, ty).topLeft()
+            source = QRectF((target.left() - origin.x()) / scale, (target.top() - origin.y()) / scale,
+                            target.width() / scale, target.height() / scale)
+            painter.drawImage(target, image, source)
+            return True
+        return False
+
+    def on_tile_ready(self, tile_key):
+        if tile_key[0] == self.pyramid.key:
+            _, level, tx, ty = tile_key
+            self.update(QRectF(self.pyramid.tile_rect(level, tx, ty)))
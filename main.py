@@ -1,20 +1,24 @@
 import sys
 import os
 import time  # 导入time模块
+import multiprocessing
 
 # 添加项目根目录到Python路径
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
-from PyQt5.QtWidgets import QApplication, QProgressBar
-from PyQt5.QtGui import QIcon
-from UI.UI_App_Root import MainWindow
-from utils.db_manager import DBManager
-from utils.logger import Logger
-from splash_screen import CustomSplashScreen  # 修复导入路径
-
 
 def main():
+    # 界面相关的模块在这里导入：PPT图片预处理和分片生成的进程池使用spawn方式启动，
+    # 子进程会重新导入本文件（作为__mp_main__），模块级只保留标准库导入，
+    # 子进程就不会加载PyQt和整个界面
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QIcon
+    from UI.UI_App_Root import MainWindow
+    from utils.db_manager import DBManager
+    from utils.logger import Logger
+    from splash_screen import CustomSplashScreen  # 修复导入路径
+
     # 初始化日志记录器
     logger = Logger()
     logger.info("启动视觉方案助手应用程序")
@@ -66,4 +70,5 @@ def main():
         raise
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # 打包后PPT图片预处理进程池需要
     main() 
\ No newline at end of file
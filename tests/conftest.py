@@ -0,0 +1,13 @@
+import os
+
+import pytest
+
+# 测试在无显示器的环境下运行
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
@@ -0,0 +1,12 @@
+"""测试共用的辅助函数"""
+
+
+def qimage_to_pil(image):
+    """QImage -> RGBA的PIL图片，用于逐像素比较"""
+    from PyQt5.QtGui import QImage
+    from PIL import Image
+    image = image.convertToFormat(QImage.Format_RGBA8888)
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    return Image.frombuffer('RGBA', (image.width(), image.height()), bytes(bits),
+                            'raw', 'RGBA', image.bytesPerLine(), 1).copy()
@@ -0,0 +1,121 @@
+"""标注数据库：读写、按缺陷文件夹查询、重新打开和旧记录导入"""
+import json
+
+from core.poc.annotation_db import AnnotationDB, ANNOTATION_DB_NAME
+
+
+def record(comment='OK', crop_area=None, folder_name='划伤'):
+    return {'crop_area': crop_area, 'comment': comment, 'folder': folder_name,
+            'folder_name': folder_name, 'cache_path': None}
+
+
+def open_db(tmp_path):
+    return AnnotationDB(tmp_path / ANNOTATION_DB_NAME).connect()
+
+
+def test_round_trip_comment_and_crop_area(tmp_path):
+    db = open_db(tmp_path)
+    db.put('划伤/1.png', record('边缘划伤', [10, 20, 30, 40]))
+    db.put('脏污/2.png', record('无', None, '脏污'))
+    # 写入前后读取结果一致
+    assert db.get('划伤/1.png')['crop_area'] == [10, 20, 30, 40]
+    db.flush()
+    assert not db.dirty
+    assert db.get('划伤/1.png') == record('边缘划伤', [10, 20, 30, 40])
+    assert db.get('脏污/2.png') == record('无', None, '脏污')
+    assert db.get('missing.png') is None
+    db.delete('脏污/2.png')
+    db.flush()
+    assert db.get('脏污/2.png') is None
+    db.close()
+
+
+def test_paths_with_crops(tmp_path):
+    db = open_db(tmp_path)
+    db.put('划伤/b.png', record(crop_area=[0, 0, 5, 5]))
+    db.put('划伤/a.png', record(crop_area=[1, 1, 5, 5]))
+    db.put('划伤/c.png', record())
+    db.put('脏污/d.png', record(crop_area=[2, 2, 5, 5], folder_name='脏污'))
+    # 尚未写入的修改也参与查询
+    assert db.paths_with_crops() == ['划伤/a.png', '划伤/b.png', '脏污/d.png']
+    assert db.paths_with_crops('划伤') == ['划伤/a.png', '划伤/b.png']
+    assert db.paths_with_crops('其他') == []
+    db.close()
+
+
+def test_close_writes_pending_edits(tmp_path):
+    db = open_db(tmp_path)
+    db.put('a.png', record('第一次', [1, 2, 3, 4]))
+    db.close()
+    reopened = open_db(tmp_path)
+    assert reopened.get('a.png') == record('第一次', [1, 2, 3, 4])
+    assert reopened.all_records() == {'a.png': record('第一次', [1, 2, 3, 4])}
+    reopened.close()
+
+
+def write_legacy(tmp_path, records):
+    record_file = tmp_path / 'crop_records.json'
+    record_file.write_text(json.dumps(records, ensure_ascii=False), encoding='utf-8')
+    return record_file
+
+
+def test_migration_keeps_records_for_missing_images(tmp_path):
+    legacy = {
+        '划伤/1.png': record('存在', [1, 1, 2, 2]),
+        '已删除/2.png': record('图片已不存在', [3, 3, 4, 4]),
+        'old_name.png': record('旧版本文件名键'),
+    }
+    record_file = write_legacy(tmp_path, legacy)
+    db = open_db(tmp_path)
+    assert db.needs_migration()
+    assert db.migrate(record_file) == 3
+    # 全部记录按原来的键导入，不依赖导入时扫描到的图片
+    assert db.all_records() == legacy
+    db.close()
+
+
+def test_migration_runs_once(tmp_path):
+    record_file = write_legacy(tmp_path, {'a.png': record('旧')})
+    db = open_db(tmp_path)
+    assert db.migrate(record_file) == 1
+    db.put('a.png', record('新'))
+    db.close()
+    # 旧文件之后被修改也不会再次导入覆盖数据库中的编辑
+    record_file = write_legacy(tmp_path, {'a.png': record('旧'), 'b.png': record('旧')})
+    reopened = open_db(tmp_path)
+    assert not reopened.needs_migration()
+    assert reopened.migrate(record_file) == 0
+    assert reopened.all_records() == {'a.png': record('新')}
+    reopened.close()
+
+
+def test_migration_without_legacy_file(tmp_path):
+    db = open_db(tmp_path)
+    assert db.migrate(tmp_path / 'crop_records.json') == 0
+    assert not db.needs_migration()
+    db.close()
+
+
+def test_lookup_matches_legacy_file_name_keys(tmp_path):
+    db = open_db(tmp_path)
+    db.import_records([('1.png', record('按文件名保存')), ('dup.png', record('重名'))])
+    keys = ['划伤/1.png', '划伤/dup.png', '脏污/dup.png']
+    assert db.lookup('划伤/1.png', keys) == record('按文件名保存')
+    # 文件名在项目中不唯一时不匹配
+    assert db.lookup('划伤/dup.png', keys) is None
+    # 按相对路径保存的记录优先
+    db.put('划伤/1.png', record('按路径保存'))
+    assert db.lookup('划伤/1.png', keys) == record('按路径保存')
+    db.close()
+
+
+def test_migration_replays_legacy_journal(tmp_path):
+    record_file = write_legacy(tmp_path, {'a.png': record('快照'), 'b.png': record('快照')})
+    journal = [{'key': 'a.png', 'record': record('日志')}, {'key': 'b.png', 'record': None}]
+    lines = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in journal)
+    # 最后一行在崩溃时只写了一半
+    (tmp_path / 'crop_records.json.journal').write_text(lines + '{"key": "c.p', encoding='utf-8')
+    db = open_db(tmp_path)
+    assert db.migrate(record_file) == 1
+    assert db.all_records() == {'a.png': record('日志')}
+    db.close()
@@ -0,0 +1,52 @@
+"""裁剪图缓存写入：按项目标记的结果、同一图片的合并和内容复用"""
+from PIL import Image
+from PyQt5.QtGui import QImage
+
+from core.poc.crop_cache import CropCacheWriter
+
+
+def crop_image(color):
+    image = QImage(20, 20, QImage.Format_RGB32)
+    image.fill(color)
+    return image
+
+
+def test_results_are_tagged_with_project(qapp, tmp_path):
+    source = tmp_path / 'a.png'
+    Image.new('RGB', (40, 40), 'red').save(source)
+    writer = CropCacheWriter(tmp_path / 'cache')
+    # 两个项目中相同的图片键不互相覆盖
+    writer.put('/project/a', '1.png', source, [0, 0, 20, 20], crop_image(0xff0000))
+    writer.put('/project/b', '1.png', source, [5, 5, 20, 20], crop_image(0x00ff00))
+    results = sorted(writer.flush())
+    assert [(project, key, crop_area) for project, key, crop_area, _ in results] == [
+        ('/project/a', '1.png', (0, 0, 20, 20)),
+        ('/project/b', '1.png', (5, 5, 20, 20)),
+    ]
+    assert results[0][3] != results[1][3]
+
+
+def test_later_crop_replaces_pending_one(qapp, tmp_path):
+    source = tmp_path / 'a.png'
+    Image.new('RGB', (40, 40), 'red').save(source)
+    writer = CropCacheWriter(tmp_path / 'cache')
+    writer.put('/project', '1.png', source, [0, 0, 10, 10], crop_image(0xff0000))
+    writer.put('/project', '1.png', source, [0, 0, 20, 20], crop_image(0x0000ff))
+    [(_, _, crop_area, path)] = writer.flush()
+    assert crop_area == (0, 0, 20, 20)
+    # 相同原图和裁剪区域直接复用已有文件
+    writer.put('/project', '2.png', source, [0, 0, 20, 20], crop_image(0x0000ff))
+    assert writer.flush()[0][3] == path
+
+
+def test_background_thread_emits_tagged_results(qapp, tmp_path):
+    source = tmp_path / 'a.png'
+    Image.new('RGB', (40, 40), 'red').save(source)
+    writer = CropCacheWriter(tmp_path / 'cache', coalesce_seconds=0)
+    saved = []
+    writer.crop_saved.connect(lambda *args: saved.append(args))
+    writer.start()
+    writer.put('/project', '1.png', source, [0, 0, 20, 20], crop_image(0xff0000))
+    writer.stop()
+    qapp.processEvents()  # 线程中发出的信号排队送达
+    assert [args[:3] for args in saved] == [('/project', '1.png', (0, 0, 20, 20))]
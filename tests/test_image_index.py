@@ -0,0 +1,154 @@
+"""项目图片索引：增量刷新检测新增、删除、修改和重命名"""
+import os
+import shutil
+
+from core.poc.image_index import ImageIndex, CACHE_DIR_NAME, INDEX_FILE_NAME
+
+
+def write(path, data=b'image'):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def touch_dir(path):
+    """保证目录修改时间变化（文件系统的时间精度可能较粗）"""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def make_project(root):
+    write(root / '划伤' / '1.png', b'one')
+    write(root / '划伤' / '2.jpg', b'two')
+    write(root / '脏污' / 'deep' / '3.bmp', b'three')
+    write(root / '说明.txt', b'not an image')
+    write(root / CACHE_DIR_NAME / 'crops' / 'x.png', b'cached crop')
+    write(root / '.hidden' / 'y.png', b'hidden')
+
+
+def open_index(root):
+    index = ImageIndex(root).load()
+    index.refresh()
+    return index
+
+
+def test_full_scan_lists_images_only(tmp_path):
+    make_project(tmp_path)
+    index = open_index(tmp_path)
+    assert list(index.files()) == ['划伤/1.png', '划伤/2.jpg', '脏污/deep/3.bmp']
+    data = index.image_data('OK')
+    assert data['脏污/deep/3.bmp']['folder_name'] == 'deep'
+    assert data['划伤/1.png']['full_path'] == str(tmp_path / '划伤' / '1.png')
+
+
+def test_refresh_detects_added_and_removed(tmp_path):
+    make_project(tmp_path)
+    index = open_index(tmp_path)
+    write(tmp_path / '划伤' / 'new.png', b'new image')
+    os.remove(tmp_path / '划伤' / '2.jpg')
+    touch_dir(tmp_path / '划伤')
+    changes = index.refresh()
+    assert changes.added == ['划伤/new.png']
+    assert changes.removed == ['划伤/2.jpg']
+    assert not changes.modified and not changes.renamed
+
+
+def test_refresh_detects_removed_directory(tmp_path):
+    make_project(tmp_path)
+    index = open_index(tmp_path)
+    shutil.rmtree(tmp_path / '脏污')
+    touch_dir(tmp_path)
+    changes = index.refresh()
+    assert changes.removed == ['脏污/deep/3.bmp']
+    assert list(index.files()) == ['划伤/1.png', '划伤/2.jpg']
+
+
+def test_forced_directory_detects_in_place_modification(tmp_path):
+    make_project(tmp_path)
+    index = open_index(tmp_path)
+    path = tmp_path / '划伤' / '1.png'
+    stat = os.stat(tmp_path / '划伤')
+    write(path, b'overwritten with more data')
+    # 原地覆盖不改变目录修改时间，由监视器指定需要重新列出的目录
+    os.utime(tmp_path / '划伤', ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert not index.refresh()
+    changes = index.refresh(['划伤'])
+    assert changes.modified == ['划伤/1.png']
+    assert not changes.added and not changes.removed
+
+
+def test_rename_and_move_are_paired(tmp_path):
+    make_project(tmp_path)
+    index = open_index(tmp_path)
+    os.rename(tmp_path / '划伤' / '1.png', tmp_path / '划伤' / 'renamed.png')
+    os.rename(tmp_path / '脏污' / 'deep' / '3.bmp', tmp_path / '划伤' / '3.bmp')
+    touch_dir(tmp_path / '划伤')
+    touch_dir(tmp_path / '脏污' / 'deep')
+    changes = index.refresh()
+    assert sorted(changes.renamed) == [('划伤/1.png', '划伤/renamed.png'), ('脏污/deep/3.bmp', '划伤/3.bmp')]
+    assert not changes.added and not changes.removed
+
+
+def test_ambiguous_rename_is_reported_as_add_and_remove(tmp_path):
+    mtime = 1_700_000_000 * 10 ** 9
+    for name in ('1.png', '2.png'):
+        os.utime(write(tmp_path / 'a' / name, b'same'), ns=(mtime, mtime))
+    index = open_index(tmp_path)
+    os.remove(tmp_path / 'a' / '1.png')
+    os.remove(tmp_path / 'a' / '2.png')
+    os.utime(write(tmp_path / 'a' / '3.png', b'same'), ns=(mtime, mtime))
+    touch_dir(tmp_path / 'a')
+    changes = index.refresh()
+    # 大小和修改时间相同的候选不止一个时无法确定来源
+    assert changes.added == ['a/3.png']
+    assert changes.removed == ['a/1.png', 'a/2.png']
+    assert not changes.renamed
+
+
+def test_stale_index_file_is_refreshed_on_open(tmp_path):
+    make_project(tmp_path)
+    index = open_index(tmp_path)
+    index.save()
+    assert (tmp_path / CACHE_DIR_NAME / INDEX_FILE_NAME).exists()
+
+    # 项目关闭期间在外部修改文件
+    write(tmp_path / '脏污' / 'deep' / 'added.png', b'added')
+    os.remove(tmp_path / '划伤' / '1.png')
+    write(tmp_path / '新目录' / '4.png', b'four')
+    for path in (tmp_path / '脏污' / 'deep', tmp_path / '划伤', tmp_path):
+        touch_dir(path)
+
+    reopened = ImageIndex(tmp_path).load()
+    assert list(reopened.files()) == list(index.files())  # 读取的是过期的索引
+    changes = reopened.refresh()
+    assert changes.added == ['新目录/4.png', '脏污/deep/added.png']
+    assert changes.removed == ['划伤/1.png']
+    assert list(reopened.files()) == ['划伤/2.jpg', '新目录/4.png', '脏污/deep/3.bmp', '脏污/deep/added.png']
+
+
+def test_index_for_other_root_is_ignored(tmp_path):
+    make_project(tmp_path / 'a')
+    index = open_index(tmp_path / 'a')
+    index.save()
+    # 复制到其他位置的项目不使用原位置的索引
+    shutil.copytree(tmp_path / 'a', tmp_path / 'b')
+    copied = ImageIndex(tmp_path / 'b').load()
+    assert copied.dirs == {}
+    assert list(open_index(tmp_path / 'b').files()) == list(index.files())
+
+
+def test_unreadable_forced_directory_keeps_records(tmp_path, monkeypatch):
+    make_project(tmp_path)
+    index = open_index(tmp_path)
+    real_scandir = os.scandir
+
+    def failing_scandir(path):
+        if str(path).endswith('划伤'):
+            raise PermissionError(13, 'denied', str(path))
+        return real_scandir(path)
+
+    # 网络盘断开等暂时性错误不会让索引丢失已有的图片
+    monkeypatch.setattr(os, 'scandir', failing_scandir)
+    changes = index.refresh(['划伤'])
+    assert not changes
+    assert '划伤/1.png' in index.files()
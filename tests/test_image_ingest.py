@@ -0,0 +1,184 @@
+"""图片导入：文件复制、按内容去重的BlobStore、工位映射和后台导入线程"""
+import os
+import errno
+import threading
+
+import pytest
+
+from core.poc import image_ingest
+from core.poc.image_ingest import (BlobStore, IngestWorker, IngestCancelled, station_import_jobs, copy_file,
+                                   PART_SUFFIX)
+
+
+def write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def edit_in_place(path, data):
+    with open(path, 'r+b') as f:
+        f.write(data)
+
+
+@pytest.fixture
+def project(tmp_path):
+    source = write(tmp_path / 'usb' / 'cam1' / 'a.png', b'A' * 1000)
+    stations = tmp_path / 'project' / 'station_images'
+    store = BlobStore(tmp_path / 'project' / 'blobs')
+    return source, stations, store
+
+
+def ingest(store, source, stations, station, name=None):
+    target = stations / station / (name or os.path.basename(source))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    return store.ingest(str(source), str(target), station), target
+
+
+def test_ingest_copies_and_records_digest(project):
+    source, stations, store = project
+    (digest, reused), target = ingest(store, source, stations, '工位1')
+    assert not reused
+    assert target.read_bytes() == source.read_bytes()
+    assert store.stations == {'工位1': {'a.png': digest}}
+    assert store.blob_path(digest, '.png').read_bytes() == source.read_bytes()
+    assert not list(store.root.glob('*' + PART_SUFFIX))
+
+
+def test_same_content_is_stored_once(project, tmp_path):
+    source, stations, store = project
+    (digest, _), _ = ingest(store, source, stations, '工位1')
+    (again, reused), target = ingest(store, source, stations, '工位2')
+    assert reused and again == digest
+    # 内容相同的另一个文件也复用已有内容
+    other = write(tmp_path / 'usb' / 'cam2' / 'copy.png', source.read_bytes())
+    (same, reused), _ = ingest(store, other, stations, '工位2')
+    assert reused and same == digest
+    assert len(list(store.root.glob('??/*'))) == 1
+    assert target.read_bytes() == source.read_bytes()
+
+
+def test_station_copies_are_independent(project):
+    source, stations, store = project
+    (digest, _), first = ingest(store, source, stations, '工位1')
+    _, second = ingest(store, source, stations, '工位2')
+    blob = store.blob_path(digest, '.png')
+    # 修改某个工位中的图片不影响其他工位和已保存的内容
+    edit_in_place(first, b'EDITED')
+    assert second.read_bytes() == b'A' * 1000
+    assert blob.read_bytes() == b'A' * 1000
+    assert os.stat(first).st_ino != os.stat(blob).st_ino
+    # 导入后修改源文件也不影响项目中的图片
+    edit_in_place(source, b'SOURCE')
+    assert second.read_bytes() == b'A' * 1000
+
+
+def test_reimport_restores_edited_station_file(project):
+    source, stations, store = project
+    _, target = ingest(store, source, stations, '工位1')
+    ingest(store, source, stations, '工位1')
+    assert target.read_bytes() == b'A' * 1000
+    edit_in_place(target, b'EDITED')
+    ingest(store, source, stations, '工位1')
+    assert target.read_bytes() == b'A' * 1000
+
+
+def test_manifest_round_trip_and_remove_station(project):
+    source, stations, store = project
+    (digest, _), _ = ingest(store, source, stations, '工位1')
+    store.save()
+    loaded = BlobStore(store.root).load()
+    assert loaded.stations == store.stations
+    assert loaded.sources == store.sources
+    loaded.remove_station('工位1')
+    assert not loaded.blob_path(digest, '.png').exists()
+    assert BlobStore(store.root).load().stations == {}
+
+
+def test_cancelled_ingest_leaves_no_partial_files(project):
+    source, stations, store = project
+    cancel = threading.Event()
+    cancel.set()
+    target = stations / '工位1' / 'a.png'
+    target.parent.mkdir(parents=True)
+    with pytest.raises(IngestCancelled):
+        store.ingest(str(source), str(target), '工位1', cancel_event=cancel)
+    assert not target.exists()
+    assert not list(store.root.glob('*' + PART_SUFFIX))
+
+
+def test_station_import_jobs_maps_folders_to_stations(tmp_path):
+    write(tmp_path / 'drop' / '工位1' / 'x.png', b'1')
+    write(tmp_path / 'drop' / '工位1' / 'sub' / 'x.png', b'2')
+    write(tmp_path / 'drop' / 'new' / 'y.jpg', b'3')
+    write(tmp_path / 'drop' / 'new' / 'notes.txt', b'4')
+    single = write(tmp_path / 'z.bmp', b'5')
+    jobs = list(station_import_jobs([tmp_path / 'drop', single], 'root', '当前工位', ['工位1']))
+    assert sorted((os.path.relpath(target, 'root'), station) for _, target, station in jobs) == sorted([
+        (os.path.join('工位1', 'x.png'), '工位1'),
+        (os.path.join('工位1', 'sub_x.png'), '工位1'),  # 工位目录下更深层的图片以子目录名为前缀
+        (os.path.join('new', 'y.jpg'), 'new'),  # 没有同名工位时使用所在目录名
+        (os.path.join('当前工位', 'z.bmp'), '当前工位'),  # 单独的文件导入当前工位
+    ])
+
+
+def test_worker_imports_through_blob_store(project, tmp_path):
+    source, stations, store = project
+    second = write(tmp_path / 'usb' / 'cam1' / 'b.png', b'B' * 10)
+    jobs = [(str(path), str(stations / '工位1' / path.name), '工位1') for path in (source, second)]
+    worker = IngestWorker(iter(jobs), max_workers=2, blob_store=store)
+    finished = []
+    worker.ingest_finished.connect(lambda *args: finished.append(args))
+    worker.run()
+    assert finished == [(2, 0, False)]
+    assert (stations / '工位1' / 'b.png').read_bytes() == b'B' * 10
+    assert set(BlobStore(store.root).load().stations['工位1']) == {'a.png', 'b.png'}
+
+
+def test_copy_file_preserves_content_and_mtime(tmp_path):
+    source = write(tmp_path / 'src.png', os.urandom(3 * 1024 * 1024 + 7))
+    os.utime(source, ns=(1_600_000_000 * 10 ** 9, 1_600_000_000 * 10 ** 9))
+    target = tmp_path / 'dst.png'
+    progress = []
+    assert copy_file(str(source), str(target), progress.append) == source.stat().st_size
+    assert target.read_bytes() == source.read_bytes()
+    assert target.stat().st_mtime_ns == source.stat().st_mtime_ns
+    assert progress[-1] == source.stat().st_size
+    assert not (tmp_path / ('dst.png' + PART_SUFFIX)).exists()
+
+
+def test_copy_file_falls_back_to_buffered_copy(tmp_path, monkeypatch):
+    def unsupported(*args):
+        raise OSError(errno.EXDEV, 'cross-device')
+
+    # 跨文件系统等内核复制不可用的情况
+    monkeypatch.setattr(os, 'copy_file_range', unsupported, raising=False)
+    monkeypatch.setattr(os, 'sendfile', unsupported, raising=False)
+    source = write(tmp_path / 'src.png', b'X' * 5000)
+    copy_file(str(source), str(tmp_path / 'dst.png'))
+    assert (tmp_path / 'dst.png').read_bytes() == b'X' * 5000
+
+
+def test_copy_file_cancel_removes_partial_file(tmp_path):
+    source = write(tmp_path / 'src.png', b'X' * 5000)
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(IngestCancelled):
+        copy_file(str(source), str(tmp_path / 'dst.png'), cancel_event=cancel)
+    assert os.listdir(tmp_path) == ['src.png']
+
+
+def test_station_copy_uses_kernel_copy_without_reflink(project, monkeypatch):
+    source, stations, store = project
+    calls = []
+    real_copy_file = image_ingest.copy_file
+
+    def tracking_copy_file(*args, **kwargs):
+        calls.append(args[1])
+        return real_copy_file(*args, **kwargs)
+
+    monkeypatch.setattr(image_ingest, 'reflink', lambda source, target: False)
+    monkeypatch.setattr(image_ingest, 'copy_file', tracking_copy_file)
+    _, target = ingest(store, source, stations, '工位1')
+    assert calls == [str(target)]
+    assert target.read_bytes() == source.read_bytes()
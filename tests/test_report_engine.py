@@ -0,0 +1,203 @@
+"""报告引擎：检查点和增量生成（复用、原地更新、重建和失效）"""
+import pytest
+from PIL import Image
+from pptx import Presentation
+
+from core.poc import report_engine
+from core.poc.report_engine import ReportEngine, GenerationCancelled, scan_image_data, partial_output_path
+
+
+@pytest.fixture
+def template(tmp_path):
+    path = tmp_path / 'template.pptx'
+    Presentation().save(path)  # 默认模板包含第10个版式
+    return path
+
+
+def make_project(root, folders):
+    """folders: {缺陷文件夹: 图片数}"""
+    for folder, count in folders.items():
+        (root / folder).mkdir(parents=True, exist_ok=True)
+        for i in range(count):
+            Image.new('RGB', (64, 48), (i * 20 % 256, 0, 0)).save(root / folder / f'{i:03d}.png')
+    return scan_image_data(root)
+
+
+def test_checkpoints_back_off_as_deck_grows(tmp_path, template, monkeypatch):
+    image_data = make_project(tmp_path / 'project', {'划伤': 60})
+    clock = [0.0]
+    monkeypatch.setattr(report_engine.time, 'monotonic', lambda: clock[0])
+    checkpoints = []
+
+    def save_checkpoint(prs, checkpoint_path, manifest, plan, records):
+        checkpoints.append(len(records))
+        clock[0] += 0.1 * len(records)  # 保存耗时随幻灯片数增加
+
+    def tick(done, total):
+        clock[0] += 1  # 每张幻灯片1秒
+
+    engine = ReportEngine(template, max_workers=1, checkpoint_interval=5)
+    monkeypatch.setattr(engine, 'save_checkpoint', save_checkpoint)
+    engine.generate(image_data, tmp_path / 'out.pptx', progress_callback=tick)
+    # 间隔不短于上一次保存耗时的CHECKPOINT_SPACING倍，保存次数随幻灯片数按对数增长
+    assert checkpoints == [5, 10, 20, 40]
+
+
+def test_no_periodic_checkpoints_without_interval(tmp_path, template, monkeypatch):
+    image_data = make_project(tmp_path / 'project', {'划伤': 5})
+    engine = ReportEngine(template, max_workers=1)
+    monkeypatch.setattr(engine, 'save_checkpoint', lambda *args: pytest.fail("unexpected checkpoint"))
+    engine.generate(image_data, tmp_path / 'out.pptx')
+    assert len(Presentation(tmp_path / 'out.pptx').slides) == 5
+
+
+def test_cancel_saves_checkpoint_and_resume_reuses_it(tmp_path, template):
+    image_data = make_project(tmp_path / 'project', {'划伤': 6})
+    output_path = tmp_path / 'out.pptx'
+    manifest_path = tmp_path / 'manifest.json'
+    progress = []
+    engine = ReportEngine(template, max_workers=1)
+    with pytest.raises(GenerationCancelled):
+        engine.generate(image_data, output_path, manifest_path=manifest_path,
+                        progress_callback=lambda done, total: progress.append(done),
+                        cancel_check=lambda: len(progress) >= 3)
+    checkpoint = partial_output_path(output_path)
+    assert len(Presentation(checkpoint).slides) == 3
+
+    built = []
+    original = engine.add_image_slide
+
+    def add_image_slide(prs, data, prepared=None):
+        built.append(data['full_path'])
+        return original(prs, data, prepared)
+
+    engine.add_image_slide = add_image_slide
+    engine.generate(image_data, output_path, manifest_path=manifest_path)
+    # 从检查点继续，只生成剩下的3张，完成后删除检查点
+    assert len(built) == 3
+    assert len(Presentation(output_path).slides) == 6
+    assert not checkpoint.exists()
+
+
+def track_builds(engine):
+    """记录引擎新建幻灯片的图片"""
+    built = []
+    original = engine.add_image_slide
+
+    def add_image_slide(prs, data, prepared=None):
+        built.append(data['full_path'])
+        return original(prs, data, prepared)
+
+    engine.add_image_slide = add_image_slide
+    return built
+
+
+def titled_project(tmp_path, count=4):
+    image_data = make_project(tmp_path / 'project', {'划伤': count})
+    for i, data in enumerate(image_data.values()):
+        data['folder'] = f'标题{i}'
+    return image_data
+
+
+def slide_texts(path):
+    return [[shape.text_frame.text for shape in slide.shapes if shape.has_text_frame]
+            for slide in Presentation(path).slides]
+
+
+def generate(engine, image_data, tmp_path):
+    output_path = tmp_path / 'out.pptx'
+    engine.generate(image_data, output_path, manifest_path=tmp_path / 'manifest.json')
+    return output_path
+
+
+def test_unchanged_slides_are_reused(tmp_path, template):
+    image_data = titled_project(tmp_path)
+    engine = ReportEngine(template, max_workers=1)
+    built = track_builds(engine)
+    output_path = generate(engine, image_data, tmp_path)
+    assert len(built) == 4
+    first_ids = [slide.slide_id for slide in Presentation(output_path).slides]
+    built.clear()
+    generate(engine, image_data, tmp_path)
+    assert built == []
+    assert [slide.slide_id for slide in Presentation(output_path).slides] == first_ids
+
+
+def test_text_changes_update_slides_in_place(tmp_path, template):
+    image_data = titled_project(tmp_path)
+    engine = ReportEngine(template, max_workers=1)
+    built = track_builds(engine)
+    output_path = generate(engine, image_data, tmp_path)
+    built.clear()
+    key = list(image_data)[1]
+    image_data[key]['folder'] = '新标题'
+    image_data[key]['comment'] = '新的评估意见'
+    generate(engine, image_data, tmp_path)
+    assert built == []
+    texts = slide_texts(output_path)[1]
+    assert '新标题' in texts and '新的评估意见' in texts
+
+
+def test_crop_change_rebuilds_only_that_slide(tmp_path, template):
+    image_data = titled_project(tmp_path)
+    key = list(image_data)[2]
+    crops = tmp_path / 'crops'
+    crops.mkdir()
+    for name, color in (('a.png', 'blue'), ('b.png', 'green')):
+        Image.new('RGB', (20, 20), color).save(crops / name)
+    image_data[key].update(crop_area=[0, 0, 20, 20], cache_path=str(crops / 'a.png'))
+    engine = ReportEngine(template, max_workers=1)
+    built = track_builds(engine)
+    output_path = generate(engine, image_data, tmp_path)
+    built.clear()
+
+    image_data[key].update(crop_area=[5, 5, 20, 20], cache_path=str(crops / 'b.png'))
+    generate(engine, image_data, tmp_path)
+    assert built == [image_data[key]['full_path']]
+    # 裁剪图内容变化（crop_area不变）也会重建
+    built.clear()
+    Image.new('RGB', (20, 20), 'yellow').save(crops / 'b.png')
+    generate(engine, image_data, tmp_path)
+    assert built == [image_data[key]['full_path']]
+    assert [texts[0] for texts in slide_texts(output_path)] == ['标题0', '标题1', '标题2', '标题3']
+
+
+def test_removed_and_reordered_images(tmp_path, template):
+    image_data = titled_project(tmp_path)
+    engine = ReportEngine(template, max_workers=1)
+    built = track_builds(engine)
+    output_path = generate(engine, image_data, tmp_path)
+    built.clear()
+    keys = list(image_data)
+    reordered = {key: image_data[key] for key in reversed(keys) if key != keys[1]}
+    generate(engine, reordered, tmp_path)
+    assert built == []
+    assert [texts[0] for texts in slide_texts(output_path)] == ['标题3', '标题2', '标题0']
+
+
+def test_template_change_invalidates_manifest(tmp_path, template):
+    image_data = titled_project(tmp_path)
+    engine = ReportEngine(template, max_workers=1)
+    built = track_builds(engine)
+    generate(engine, image_data, tmp_path)
+    built.clear()
+    prs = Presentation(template)
+    prs.core_properties.title = '新模板'
+    prs.save(template)
+    generate(engine, image_data, tmp_path)
+    assert len(built) == 4
+    # 清单记录了新模板，之后的生成又可以复用
+    built.clear()
+    generate(engine, image_data, tmp_path)
+    assert built == []
+
+
+def test_policy_change_invalidates_manifest(tmp_path, template):
+    image_data = titled_project(tmp_path)
+    engine = ReportEngine(template, max_workers=1)
+    built = track_builds(engine)
+    generate(engine, image_data, tmp_path)
+    built.clear()
+    engine.policy.quality = 50
+    generate(engine, image_data, tmp_path)
+    assert len(built) == 4
@@ -0,0 +1,77 @@
+"""缩略图服务：请求不访问文件系统，原图被覆盖后通过invalidate重新生成"""
+import os
+
+from PIL import Image
+
+from core.poc.thumbnail_service import ThumbnailService
+
+
+def wait(qapp, service):
+    service.pool.waitForDone()
+    qapp.processEvents()  # 后台任务的结果通过排队的信号送回
+
+
+def test_request_does_not_stat_on_caller_thread(qapp, tmp_path, monkeypatch):
+    path = tmp_path / 'a.png'
+    Image.new('RGB', (400, 300), 'red').save(path)
+    service = ThumbnailService(tmp_path / 'cache')
+    ready = []
+    service.thumbnail_ready.connect(lambda *args: ready.append(args))
+    assert service.request(path, 100) is None
+    wait(qapp, service)
+    assert ready and ready[0][:2] == (str(path), 128)
+
+    def no_stat(*args, **kwargs):
+        raise AssertionError("stat on the GUI thread")
+
+    # 命中内存缓存的请求（视图重绘）不调用os.stat
+    monkeypatch.setattr(os, 'stat', no_stat)
+    image = service.request(path, 100)
+    monkeypatch.undo()
+    assert image is not None and image.width() == 128
+    service.shutdown()
+
+
+def test_invalidate_regenerates_overwritten_image(qapp, tmp_path):
+    path = tmp_path / 'a.png'
+    Image.new('RGB', (400, 300), 'red').save(path)
+    service = ThumbnailService(tmp_path / 'cache')
+    service.request(path, 100)
+    wait(qapp, service)
+    assert service.request(path, 100).pixelColor(10, 10).red() > 200
+
+    Image.new('RGB', (300, 400), 'blue').save(path)
+    # 未失效前仍返回内存中的旧缩略图
+    assert service.request(path, 100).width() == 128
+    service.invalidate(path)
+    assert service.request(path, 100) is None
+    wait(qapp, service)
+    image = service.request(path, 100)
+    assert image.height() == 128 and image.pixelColor(10, 10).blue() > 200
+    service.shutdown()
+
+
+def test_failed_image_is_not_retried_until_invalidated(qapp, tmp_path):
+    path = tmp_path / 'broken.png'
+    path.write_bytes(b'not an image')
+    service = ThumbnailService(tmp_path / 'cache')
+    service.request(path, 100)
+    wait(qapp, service)
+    assert service.failed == {str(path)}
+    assert service.request(path, 100) is None
+    assert not service.pending
+
+    Image.new('RGB', (40, 30), 'green').save(path)
+    service.invalidate(path)
+    service.request(path, 100)
+    wait(qapp, service)
+    assert service.request(path, 100) is not None
+    service.shutdown()
+
+
+def test_missing_image_fails_quietly(qapp, tmp_path):
+    service = ThumbnailService(tmp_path / 'cache')
+    assert service.request(tmp_path / 'missing.png', 100) is None
+    wait(qapp, service)
+    assert service.failed == {str(tmp_path / 'missing.png')}
+    service.shutdown()
@@ -0,0 +1,254 @@
+"""瓦片金字塔：按行带解码PNG/BMP/TIFF、逐级生成瓦片和从瓦片拼接裁剪区域"""
+import os
+import struct
+import zlib
+
+import pytest
+from PIL import Image, TiffImagePlugin
+
+from core.poc.tile_pyramid import (TilePyramid, BandReadError, image_bands, pil_to_qimage,
+                                   prune_tile_cache, COMPLETE_MARKER)
+from core.poc.image_index import ImageIndex
+from tests.helpers import qimage_to_pil
+
+WIDTH, HEIGHT = 301, 203  # 宽度不是4的倍数（BMP行填充），高度不是行带高度的倍数
+BAND_HEIGHT = 64
+
+
+def sample_image(mode, size=(WIDTH, HEIGHT)):
+    """带噪声和渐变的样图，PNG编码时各种行滤波都会用到"""
+    width, height = size
+    noise = Image.effect_noise(size, 60)
+    gradient = Image.linear_gradient('L').resize(size)
+    rgb = Image.merge('RGB', (noise, gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    if mode == 'P':
+        return rgb.convert('P', palette=Image.ADAPTIVE)
+    if mode in ('RGBA', 'LA'):
+        image = rgb.convert(mode[:-1])
+        image.putalpha(gradient.transpose(Image.FLIP_TOP_BOTTOM))
+        return image
+    return rgb.convert(mode)
+
+
+def assert_bands_match(path):
+    with Image.open(path) as ref:
+        ref.load()
+        compare_mode = 'RGBA' if 'A' in ref.mode else 'RGB'
+        bands = list(image_bands(str(path), BAND_HEIGHT))
+        assert [y for y, _ in bands] == list(range(0, ref.height, BAND_HEIGHT))
+        for y, band in bands:
+            rows = min(BAND_HEIGHT, ref.height - y)
+            assert band.size == (ref.width, rows)
+            expected = ref.crop((0, y, ref.width, y + rows)).convert(compare_mode)
+            assert band.convert(compare_mode).tobytes() == expected.tobytes()
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'RGBA', 'L', 'P', 'LA'])
+def test_png_bands_match_pil(tmp_path, mode):
+    path = tmp_path / f'{mode}.png'
+    sample_image(mode).save(path)
+    assert_bands_match(path)
+
+
+def test_png_bands_across_split_idat_chunks(tmp_path):
+    path = tmp_path / 'chunks.png'
+    sample_image('RGB').save(path)
+    # 很小的IDAT块：一个行带跨越多个块
+    path.write_bytes(split_idat(path.read_bytes(), 997))
+    assert_bands_match(path)
+
+
+def split_idat(data, chunk_size):
+    """把PNG的IDAT数据重新切分成指定大小的多个块"""
+    pos = 8
+    head, idat, tail = [], b'', []
+    while pos < len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        chunk = data[pos:pos + 12 + length]
+        if chunk_type == b'IDAT':
+            idat += data[pos + 8:pos + 8 + length]
+        elif idat:
+            tail.append(chunk)
+        else:
+            head.append(chunk)
+        pos += 12 + length
+    chunks = []
+    for start in range(0, len(idat), chunk_size):
+        part = idat[start:start + chunk_size]
+        chunks.append(struct.pack('>I', len(part)) + b'IDAT' + part
+                      + struct.pack('>I', zlib.crc32(b'IDAT' + part)))
+    return data[:8] + b''.join(head) + b''.join(chunks) + b''.join(tail)
+
+
+def test_png_unsupported_layout_raises(tmp_path):
+    path = tmp_path / 'deep.png'
+    Image.new('I;16', (WIDTH, HEIGHT), 1000).save(path)  # 16位灰度
+    with pytest.raises(BandReadError):
+        list(image_bands(str(path), BAND_HEIGHT))
+
+
+@pytest.mark.parametrize('mode', ['RGB', 'L', 'P', 'RGBA'])
+def test_bmp_bands_match_pil(tmp_path, mode):
+    path = tmp_path / f'{mode}.bmp'
+    sample_image(mode).save(path)
+    assert_bands_match(path)
+
+
+@pytest.mark.parametrize('compression, rows_per_strip', [
+    (None, None),  # 单条带
+    (None, 37),
+    ('tiff_lzw', 50),
+    ('tiff_adobe_deflate', 50),
+    ('packbits', 50),
+])
+def test_tiff_bands_match_pil(tmp_path, compression, rows_per_strip):
+    path = tmp_path / f'{compression}.tif'
+    options = {}
+    if compression:
+        options['compression'] = compression
+    if rows_per_strip:
+        options['tiffinfo'] = {278: rows_per_strip}
+    sample_image('RGB').save(path, **options)
+    assert_bands_match(path)
+
+
+def write_tiled_tiff(path, image, tile_size, compression):
+    """写出分块存储的RGB TIFF（Pillow只能写条带），compression为1（不压缩）或8（deflate）"""
+    blocks = []
+    for top in range(0, image.height, tile_size):
+        for left in range(0, image.width, tile_size):
+            tile = Image.new('RGB', (tile_size, tile_size))
+            tile.paste(image.crop((left, top, left + tile_size, top + tile_size)))
+            data = tile.tobytes()
+            blocks.append(zlib.compress(data) if compression == 8 else data)
+    ifd = TiffImagePlugin.ImageFileDirectory_v2(prefix=b'II')
+    for tag, value in ((256, image.width), (257, image.height), (258, (8, 8, 8)), (259, compression),
+                       (262, 2), (277, 3), (284, 1), (322, tile_size), (323, tile_size),
+                       (325, tuple(len(block) for block in blocks)), (324, (0,) * len(blocks))):
+        ifd[tag] = value
+        if tag in (256, 257, 322, 323, 324, 325):
+            ifd.tagtype[tag] = 4  # LONG
+    offset = 8 + len(ifd.tobytes(8))
+    offsets = []
+    for block in blocks:
+        offsets.append(offset)
+        offset += len(block)
+    ifd[324] = tuple(offsets)
+    path.write_bytes(b'II*\x00' + struct.pack('<I', 8) + ifd.tobytes(8) + b''.join(blocks))
+
+
+@pytest.mark.parametrize('compression', [1, 8])
+def test_tiled_tiff_bands_match_pil(tmp_path, compression):
+    path = tmp_path / 'tiled.tif'
+    source = sample_image('RGB')
+    write_tiled_tiff(path, source, 48, compression)  # 瓦片与行带边界错开
+    with Image.open(path) as image:
+        assert 322 in image.tag_v2
+        assert image.convert('RGB').tobytes() == source.tobytes()
+    assert_bands_match(path)
+
+
+def test_tiff_sources_are_indexed(tmp_path):
+    sample_image('RGB').save(tmp_path / 'a.tif')
+    sample_image('RGB').save(tmp_path / 'b.tiff')
+    index = ImageIndex(tmp_path)
+    index.refresh()
+    assert list(index.files()) == ['a.tif', 'b.tiff']
+
+
+def test_pil_to_qimage_preserves_pixels(qapp):
+    image = sample_image('RGBA')
+    assert qimage_to_pil(pil_to_qimage(image)).tobytes() == image.tobytes()
+
+
+def build_pyramid(qapp, tmp_path, name, image, tile_size=64):
+    path = tmp_path / name
+    image.save(path)
+    pyramid = TilePyramid(path, tmp_path / 'tiles', tile_size=tile_size)
+    assert not pyramid.region_decode
+    assert not pyramid.load_tile(0, 0, 0).isNull()
+    return pyramid
+
+
+@pytest.mark.parametrize('name', ['source.png', 'source.tif'])
+def test_pyramid_builds_every_level(qapp, tmp_path, name):
+    image = sample_image('RGB')
+    pyramid = build_pyramid(qapp, tmp_path, name, image)
+    assert pyramid.is_complete()
+    assert (pyramid.tile_dir / COMPLETE_MARKER).exists()
+    assert pyramid.max_level == 3  # 301 / 64 -> 4.7 -> 2^3
+    for level in range(pyramid.max_level + 1):
+        cols, rows = pyramid.tile_count(level)
+        size = pyramid.level_size(level)
+        for ty in range(rows):
+            for tx in range(cols):
+                tile = pyramid.load_tile(level, tx, ty)
+                assert tile.width() == min(64, size.width() - tx * 64)
+                assert tile.height() == min(64, size.height() - ty * 64)
+    # 第0级瓦片与原图逐像素一致
+    for tx, ty in ((0, 0), (4, 3)):
+        rect = pyramid.tile_rect(0, tx, ty)
+        expected = image.crop((rect.left(), rect.top(), rect.right() + 1, rect.bottom() + 1))
+        tile = qimage_to_pil(pyramid.load_tile(0, tx, ty)).convert('RGB')
+        assert tile.tobytes() == expected.tobytes()
+
+
+def test_coarse_levels_are_downscaled_from_tiles(qapp, tmp_path):
+    # 四个纯色象限，缩小后每个象限的中心颜色不变
+    image = Image.new('RGB', (256, 256), 'red')
+    image.paste((0, 0, 255), (128, 0, 256, 128))
+    image.paste((0, 255, 0), (0, 128, 128, 256))
+    image.paste((255, 255, 255), (128, 128, 256, 256))
+    pyramid = build_pyramid(qapp, tmp_path, 'quadrants.png', image)
+    top = qimage_to_pil(pyramid.load_tile(pyramid.max_level, 0, 0)).convert('RGB')
+    assert top.size == (64, 64)
+    assert top.getpixel((16, 16)) == (255, 0, 0)
+    assert top.getpixel((48, 16)) == (0, 0, 255)
+    assert top.getpixel((16, 48)) == (0, 255, 0)
+    assert top.getpixel((48, 48)) == (255, 255, 255)
+
+
+def test_compose_from_tiles_across_tile_boundaries(qapp, tmp_path):
+    from PyQt5.QtCore import QRect
+    from core.poc.crop_service import compose_from_tiles, read_crop
+
+    image = sample_image('RGB')
+    pyramid = build_pyramid(qapp, tmp_path, 'crop.png', image)
+    # 横跨3x2个瓦片的区域
+    x, y, w, h = 50, 40, 100, 60
+    expected = image.crop((x, y, x + w, y + h)).tobytes()
+    composed = compose_from_tiles(pyramid, QRect(x, y, w, h))
+    assert (composed.width(), composed.height()) == (w, h)
+    assert qimage_to_pil(composed).convert('RGB').tobytes() == expected
+    assert qimage_to_pil(read_crop(str(tmp_path / 'crop.png'), (x, y, w, h), pyramid)).convert('RGB').tobytes() \
+        == expected
+    # 超出原图的部分被裁掉
+    edge = compose_from_tiles(pyramid, QRect(WIDTH - 20, HEIGHT - 10, 50, 50))
+    assert (edge.width(), edge.height()) == (20, 10)
+
+
+def test_failed_build_is_remembered(qapp, tmp_path):
+    path = tmp_path / 'broken.png'
+    sample_image('RGB').save(path)
+    data = bytearray(path.read_bytes())
+    data[len(data) // 2:len(data) // 2 + 64] = b'\xff' * 64
+    path.write_bytes(bytes(data))
+    pyramid = TilePyramid(path, tmp_path / 'tiles', tile_size=64)
+    last_row = pyramid.tile_count(0)[1] - 1
+    assert pyramid.load_tile(0, 0, last_row).isNull()
+    assert pyramid.has_failed()
+    # 原图不变时不再重新生成
+    reopened = TilePyramid(path, tmp_path / 'tiles', tile_size=64)
+    reopened.build_all = lambda: pytest.fail("failed pyramid rebuilt")
+    assert reopened.load_tile(pyramid.max_level, 0, 0).isNull()
+
+
+def test_prune_tile_cache_removes_least_recent(tmp_path):
+    for i in range(4):
+        level = tmp_path / f'k{i}' / '0'
+        level.mkdir(parents=True)
+        (level / '0_0.png').write_bytes(b'x' * 1000)
+        os.utime(tmp_path / f'k{i}', (i, i))
+    assert prune_tile_cache(tmp_path, 2500) == 2
+    assert sorted(os.listdir(tmp_path)) == ['k2', 'k3']
+    assert prune_tile_cache(tmp_path, 2500) == 0
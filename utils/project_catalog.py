@@ -0,0 +1,138 @@
+import os
+import json
+import sqlite3
+from pathlib import Path
+
+
+def project_dirs(folder_path):
+    """项目的信息文件和三个步骤目录"""
+    name = os.path.basename(folder_path)
+    config_folder = os.path.join(folder_path, f"{name}_config")
+    return {
+        'info': os.path.join(config_folder, "project_info.json"),
+        'image': os.path.join(folder_path, f"{name}_image"),
+        'config': config_folder,
+        'defect': os.path.join(folder_path, f"{name}_Defectmatrix"),
+    }
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def project_signature(folder_path):
+    """项目签名：信息文件和各步骤目录的修改时间，目录内增删文件时随之变化"""
+    dirs = project_dirs(folder_path)
+    return json.dumps([_mtime(dirs['info']), _mtime(dirs['image']),
+                       _mtime(dirs['config']), _mtime(dirs['defect'])])
+
+
+def _has_entries(path, minimum=1):
+    try:
+        with os.scandir(path) as it:
+            for count, _ in enumerate(it, start=1):
+                if count >= minimum:
+                    return True
+    except OSError:
+        pass
+    return False
+
+
+def project_progress(folder_path):
+    """计算项目进度（图片、配置、缺陷矩阵三个步骤）"""
+    dirs = project_dirs(folder_path)
+    progress = 0
+    total_steps = 3  # 总步骤数
+    # 检查image文件夹
+    if _has_entries(dirs['image']):
+        progress += 1
+    # 检查config文件夹（不只包含project_info.json）
+    if _has_entries(dirs['config'], minimum=2):
+        progress += 1
+    # 检查Defectmatrix文件夹
+    if _has_entries(dirs['defect']):
+        progress += 1
+    return int((progress / total_steps) * 100)
+
+
+class ProjectCatalog:
+    """项目目录索引：保存每个项目的信息、进度和目录修改时间，只重新读取有变化的项目"""
+
+    def __init__(self, db_path=None):
+        home_dir = str(Path.home())
+        self.db_path = Path(db_path) if db_path else Path(home_dir) / '.vsa' / 'data' / 'vsa.db'
+        self.connection = None
+
+    def connect(self):
+        """连接数据库并创建索引表"""
+        if not self.db_path.parent.exists():
+            self.db_path.parent.mkdir(parents=True)
+        self.connection = sqlite3.connect(str(self.db_path))
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS project_catalog (
+                    folder_path TEXT PRIMARY KEY,
+                    base_path TEXT NOT NULL,
+                    signature TEXT NOT NULL,
+                    create_date TEXT,
+                    info TEXT NOT NULL
+                )
+            ''')
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS idx_project_catalog_base ON project_catalog(base_path, create_date)')
+        return self
+
+    def disconnect(self):
+        """断开数据库连接"""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def projects(self, base_path):
+        """从索引读取项目列表（含进度），按创建时间倒序"""
+        rows = self.connection.execute(
+            'SELECT info FROM project_catalog WHERE base_path = ? ORDER BY create_date DESC',
+            (os.path.abspath(base_path),))
+        return [json.loads(row[0]) for row in rows]
+
+    def revalidate(self, base_path, logger=None):
+        """对比目录修改时间，只重新读取新增或有变化的项目，返回索引是否有变化"""
+        base_path = os.path.abspath(base_path)
+        known = dict(self.connection.execute(
+            'SELECT folder_path, signature FROM project_catalog WHERE base_path = ?', (base_path,)))
+        updates = []
+        seen = set()
+        with os.scandir(base_path) as it:
+            folders = [entry.path for entry in it if entry.is_dir()]
+        for folder_path in folders:
+            signature = project_signature(folder_path)
+            if known.get(folder_path) == signature:
+                seen.add(folder_path)
+                continue
+            # 信息文件缺失或无法读取的项目不加入seen，其旧记录随后删除
+            info_file = project_dirs(folder_path)['info']
+            if not os.path.exists(info_file):
+                continue
+            try:
+                with open(info_file, 'r', encoding='utf-8') as f:
+                    project_info = json.load(f)
+                project_info['progress'] = project_progress(folder_path)
+            except Exception as e:
+                if logger:
+                    logger.error(f"[主窗口] 读取项目信息失败: {str(e)}")
+                continue
+            seen.add(folder_path)
+            updates.append((folder_path, base_path, signature, str(project_info.get('create_date', '')),
+                            json.dumps(project_info, ensure_ascii=False)))
+        removed = [(folder_path,) for folder_path in known if folder_path not in seen]
+        if not updates and not removed:
+            return False
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO project_catalog VALUES (?, ?, ?, ?, ?)', updates)
+            self.connection.executemany('DELETE FROM project_catalog WHERE folder_path = ?', removed)
+        return True